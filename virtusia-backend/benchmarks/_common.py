@@ -0,0 +1,23 @@
+"""
+Utilitários compartilhados pelos benchmarks. Importar este módulo coloca
+virtusia-backend/ no sys.path, para os scripts importarem `src` quando rodados
+como `python benchmarks/<nome>.py`.
+"""
+import os
+import statistics
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+def percentile(samples, fraction):
+    """Percentil pela posição na amostra ordenada"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def report(label, samples, width=12):
+    """Imprime mediana, p95 e p99 de latências medidas em segundos"""
+    print(f'{label:<{width}} mediana {statistics.median(samples) * 1000:8.3f} ms   '
+          f'p95 {percentile(samples, 0.95) * 1000:8.3f} ms   '
+          f'p99 {percentile(samples, 0.99) * 1000:8.3f} ms')
@@ -0,0 +1,84 @@
+"""
+Benchmark do recomendador de exercícios: pontuação vetorizada do catálogo inteiro.
+
+Uso (a partir de virtusia-backend/):
+    python benchmarks/exercise_recommender.py --exercises 20000 --users 2000
+
+O catálogo sintético é montado em memória (sem banco); mede-se a passada de
+pontuação + top-k por usuário, que é o que roda a cada requisição.
+"""
+import argparse
+import importlib
+import json
+import random
+import time
+from datetime import datetime, timezone
+
+from _common import report
+
+MUSCLE_GROUPS = [
+    'quadríceps', 'glúteos', 'isquiotibiais', 'panturrilhas', 'peitoral', 'ombros', 'tríceps', 'bíceps',
+    'costas', 'lombar', 'core', 'oblíquos', 'antebraços', 'trapézio', 'adutores', 'corpo todo'
+]
+
+def synthetic_catalog(count, rng):
+    from src.models.exercise import Exercise, DifficultyLevel
+
+    created_at = datetime.now(timezone.utc)
+    levels = list(DifficultyLevel)
+    for index in range(count):
+        yield Exercise(
+            id=index + 1,
+            name=f'Exercício {index}',
+            description='Exercício sintético',
+            muscle_groups=json.dumps(rng.sample(MUSCLE_GROUPS, rng.randint(1, 4)), ensure_ascii=False),
+            difficulty_level=rng.choice(levels),
+            calories_per_minute=rng.uniform(3, 14),
+            created_at=created_at
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--exercises', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=60, help='sessões recentes por usuário')
+    parser.add_argument('--k', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    # Sem a aplicação, o modelo Recommendation precisa ser registrado para o
+    # relacionamento User.recommendations resolver
+    importlib.import_module('src.models.recommendation')
+    from src.services.exercise_catalog import CatalogSnapshot
+    from src.services.exercise_recommender import CatalogFeatures, UserSignals, score_exercises, top_k
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    snapshot = CatalogSnapshot(list(synthetic_catalog(args.exercises, rng)))
+    features = CatalogFeatures(snapshot)
+    print(f'Catálogo de {snapshot.size} exercícios e {len(features.groups)} grupos '
+          f'preparado em {time.perf_counter() - started:.2f} s')
+
+    users = [
+        UserSignals(
+            [rng.randint(1, args.exercises) for _ in range(args.history)],
+            [rng.uniform(0, 28) for _ in range(args.history)],
+            [rng.choice([0, 10, 20, 45]) for _ in range(args.history)],
+            rng.uniform(0, 2),
+            rng.choice([0.1, 0.3, 1.0])
+        )
+        for _ in range(args.users)
+    ]
+
+    samples = []
+    for signals in users:
+        started = time.perf_counter()
+        scores, _ = score_exercises(features, signals)
+        top_k(scores, args.k)
+        samples.append(time.perf_counter() - started)
+
+    print(f'Pontuação + top-{args.k} por usuário ({args.history} sessões no histórico):')
+    report('vetorizado', samples, width=14)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark da busca de alimentos: índice em memória vs. ILIKE no banco.
+
+Uso (a partir de virtusia-backend/):
+    python benchmarks/food_search.py --foods 500000 --queries 2000
+
+Por padrão usa um SQLite temporário; para medir contra o PostgreSQL, aponte
+BENCH_DATABASE_URL para um banco descartável (a tabela foods é populada).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _common import report
+
+BASES = [
+    'Arroz', 'Feijão', 'Brócolis', 'Frango', 'Carne', 'Peixe', 'Ovo', 'Pão', 'Queijo', 'Leite',
+    'Iogurte', 'Maçã', 'Banana', 'Mamão', 'Açaí', 'Batata', 'Mandioca', 'Abóbora', 'Cenoura', 'Tomate',
+    'Alface', 'Espinafre', 'Lentilha', 'Grão-de-bico', 'Aveia', 'Macarrão', 'Cuscuz', 'Tapioca', 'Café', 'Suco'
+]
+VARIANTS = [
+    'Cozido', 'Grelhado', 'Assado', 'Integral', 'Branco', 'Preto', 'Carioca', 'Light', 'Orgânico', 'Caseiro',
+    'Temperado', 'Refogado', 'Cru', 'Desnatado', 'Natural', 'com Sal', 'sem Açúcar', 'à Milanesa', 'ao Forno', 'Frito'
+]
+QUERIES = ['arroz', 'feijao', 'brócolis', 'frango grel', 'maca', 'acai', 'integral', 'pao', 'ov', 'ba', 'assado', 'milanesa']
+
+def synthetic_names(count, rng):
+    for index in range(count):
+        base = rng.choice(BASES)
+        variant = rng.choice(VARIANTS)
+        yield f'{base} {variant} {index}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--foods', type=int, default=500000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = os.environ.get(
+        'BENCH_DATABASE_URL', f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    )
+
+    from src.main import create_app
+    from src.models.user import db
+    from src.models.meal import Food
+    from src.services.food_search import FoodSearchIndex
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        print(f'Populando {args.foods} alimentos...')
+        chunk = []
+        for name in synthetic_names(args.foods, rng):
+            chunk.append({'name': name, 'calories_per_100g': 100, 'protein_per_100g': 1,
+                          'carbs_per_100g': 1, 'fat_per_100g': 1, 'source_api': 'bench'})
+            if len(chunk) >= 10000:
+                db.session.execute(Food.__table__.insert(), chunk)
+                chunk = []
+        if chunk:
+            db.session.execute(Food.__table__.insert(), chunk)
+        db.session.commit()
+
+        index = FoodSearchIndex()
+        started = time.perf_counter()
+        index.build()
+        print(f'Índice construído em {time.perf_counter() - started:.2f} s ({len(index)} alimentos)')
+
+        queries = [rng.choice(QUERIES) for _ in range(args.queries)]
+
+        cold_samples = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, args.limit, use_cache=False)
+            cold_samples.append(time.perf_counter() - started)
+
+        warm_samples = []
+        for query in queries:
+            started = time.perf_counter()
+            index.search(query, args.limit)
+            warm_samples.append(time.perf_counter() - started)
+
+        ilike_samples = []
+        for query in queries[:max(1, args.queries // 10)]:
+            started = time.perf_counter()
+            Food.query.filter(Food.name.ilike(f'%{query}%')).limit(args.limit).all()
+            ilike_samples.append(time.perf_counter() - started)
+
+        print('Consulta por termo (limite %d):' % args.limit)
+        report('sem cache', cold_samples)
+        report('com cache', warm_samples)
+        report('ILIKE', ilike_samples)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark da importação em lote de refeições (POST /api/meals/batch).
+
+Uso (a partir de virtusia-backend/):
+    python benchmarks/meal_import.py --meals 10000 --foods-per-meal 3 --batch 2000
+
+Compara o endpoint de lote com o envio uma refeição por vez (POST /api/meals/)
+sobre a mesma aplicação. Por padrão usa um SQLite temporário; para medir contra
+o PostgreSQL, aponte BENCH_DATABASE_URL para um banco descartável.
+
+Referência (padrões acima, --single 100, 1 vCPU, servidor na mesma máquina,
+banco recriado a cada execução; mediana de 4 execuções):
+    SQLite:          ~10.000 refeições/s no lote (~40.000 linhas/s)
+    PostgreSQL 16:   ~4.650 refeições/s no lote (~18.600 linhas/s), ~75/s uma por vez
+No PostgreSQL os itens entram por COPY (sql.copy_rows); com o executemany a
+mediana era ~4.100 refeições/s (~16.400 linhas/s). O resto do tempo fica no
+servidor (chaves estrangeiras e índices de meals e meal_foods).
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import _common  # noqa: F401  (coloca virtusia-backend/ no sys.path)
+
+FOOD_NAMES = [
+    'Arroz Integral', 'Feijão Carioca', 'Brócolis Cozido', 'Frango Grelhado', 'Carne Assada', 'Peixe ao Forno',
+    'Ovo Cozido', 'Pão Francês', 'Queijo Minas', 'Leite Desnatado', 'Iogurte Natural', 'Maçã', 'Banana',
+    'Mamão', 'Açaí', 'Batata Doce', 'Mandioca', 'Abóbora', 'Cenoura', 'Tomate', 'Alface', 'Espinafre',
+    'Lentilha', 'Grão-de-bico', 'Aveia', 'Macarrão', 'Cuscuz', 'Tapioca', 'Café', 'Suco de Laranja'
+]
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snack']
+
+def synthetic_meals(count, foods_per_meal, rng):
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    for index in range(count):
+        yield {
+            'meal_type': rng.choice(MEAL_TYPES),
+            'created_at': (start + timedelta(minutes=index * 5)).isoformat(),
+            'total_calories': rng.uniform(150, 900),
+            'total_protein': rng.uniform(5, 60),
+            'total_carbs': rng.uniform(10, 120),
+            'total_fat': rng.uniform(2, 40),
+            'total_fiber': rng.uniform(0, 15),
+            'health_score': rng.uniform(30, 95),
+            'foods': [
+                {'name': rng.choice(FOOD_NAMES), 'quantity': rng.randint(30, 300), 'unit': 'g'}
+                for _ in range(foods_per_meal)
+            ]
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--meals', type=int, default=10000)
+    parser.add_argument('--foods-per-meal', type=int, default=3)
+    parser.add_argument('--batch', type=int, default=2000)
+    parser.add_argument('--single', type=int, default=500, help='refeições enviadas uma a uma (referência)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = os.environ.get(
+        'BENCH_DATABASE_URL', f'sqlite:///{os.path.join(workdir, "bench.db")}'
+    )
+
+    from flask_jwt_extended import create_access_token
+    from src.main import create_app
+    from src.models.user import db, User
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        user = User(email=f'bench-{time.time_ns()}@virtusia.app', first_name='Bench', last_name='Mark')
+        user.set_password('benchmark')
+        db.session.add(user)
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    client = app.test_client()
+    meals = list(synthetic_meals(args.meals, args.foods_per_meal, rng))
+
+    started = time.perf_counter()
+    for start in range(0, len(meals), args.batch):
+        response = client.post('/api/meals/batch', json={'meals': meals[start:start + args.batch]}, headers=headers)
+        assert response.status_code == 200 and response.json['failed'] == 0, response.json
+    elapsed = time.perf_counter() - started
+    lines = args.meals * (1 + args.foods_per_meal)
+    print(f'Lote ({args.batch}/requisição): {args.meals} refeições em {elapsed:.2f} s   '
+          f'{args.meals / elapsed:8.0f} refeições/s   {lines / elapsed:8.0f} linhas/s')
+
+    single = meals[:args.single]
+    started = time.perf_counter()
+    for meal in single:
+        response = client.post('/api/meals/', json=meal, headers=headers)
+        assert response.status_code == 201, response.json
+    elapsed = time.perf_counter() - started
+    lines = len(single) * (1 + args.foods_per_meal)
+    print(f'Uma por vez:            {len(single)} refeições em {elapsed:.2f} s   '
+          f'{len(single) / elapsed:8.0f} refeições/s   {lines / elapsed:8.0f} linhas/s')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark do hashing de senha: rajada de logins concorrentes no pool de processos.
+
+Uso (a partir de virtusia-backend/):
+    python benchmarks/password_hashing.py --clients 32 --requests 200 --processes 2 --max-pending 8
+
+Compara o pool com admissão limitada ao cálculo na própria thread (--processes 0
+desativa o pool) e mostra latência, recusas (503) e as métricas do pool.
+"""
+import argparse
+import statistics
+import threading
+import time
+
+from _common import percentile
+
+PASSWORD = 'Senha-de-teste-1'
+
+def burst(pool, task, stored, clients, requests):
+    from src.services.passwords import HashingBusy
+
+    samples = []
+    rejected = [0]
+    lock = threading.Lock()
+    remaining = iter(range(requests))
+
+    def client():
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            started = time.perf_counter()
+            try:
+                pool.run(task, stored, PASSWORD)
+            except HashingBusy:
+                with lock:
+                    rejected[0] += 1
+                continue
+            with lock:
+                samples.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, rejected[0], time.perf_counter() - started
+
+def report(label, samples, rejected, elapsed):
+    if not samples:
+        print(f'{label:<10} nenhuma verificação concluída, {rejected} recusadas')
+        return
+    print(f'{label:<10} {len(samples) / elapsed:7.1f} verificações/s   '
+          f'mediana {statistics.median(samples) * 1000:8.1f} ms   '
+          f'p95 {percentile(samples, 0.95) * 1000:8.1f} ms   recusadas {rejected}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--processes', type=int, default=2)
+    parser.add_argument('--max-pending', type=int, default=8)
+    args = parser.parse_args()
+
+    from src.services import passwords
+
+    stored = passwords.SCHEMES[passwords.DEFAULT_SCHEME].hash(PASSWORD)
+    print(f'Esquema {passwords.DEFAULT_SCHEME}: {stored.split("$")[3] if stored.startswith("$argon2") else stored[:7]}')
+
+    inline = passwords.HashPool(processes=0, max_pending=args.clients)
+    report('na thread', *burst(inline, passwords._check_task, stored, args.clients, args.requests))
+
+    pool = passwords.HashPool(processes=args.processes, max_pending=args.max_pending)
+    pool.run(passwords._check_task, stored, PASSWORD)  # aquece os processos
+    report('pool', *burst(pool, passwords._check_task, stored, args.clients, args.requests))
+    print(pool.metrics())
+
+if __name__ == '__main__':
+    main()
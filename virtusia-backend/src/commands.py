@@ -0,0 +1,112 @@
+import click
+
+from src.models.user import db
+
+def register_commands(app):
+    """Registra os comandos de manutenção no CLI do Flask"""
+
+    @app.cli.command('rebuild-daily-stats')
+    @click.option('--user-id', type=int, default=None, help='Reconstrói apenas um usuário')
+    def rebuild_daily_stats_command(user_id):
+        """Reconstrói o consolidado diário de nutrição e atividade a partir do histórico"""
+        from src.services.daily_stats import rebuild_daily_stats
+
+        total = rebuild_daily_stats(user_id)
+        db.session.commit()
+        click.echo(f'{total} linhas diárias reconstruídas')
+
+    @app.cli.command('upgrade-db')
+    def upgrade_db_command():
+        """
+        Migrações de esquema e de dados, idempotentes (roda no release do Procfile,
+        uma vez por deploy, e não em cada worker)
+        """
+        from src.services import daily_stats, exercise_catalog
+        from src.services.foods import backfill_normalized_names
+
+        added = daily_stats.ensure_columns()
+        if exercise_catalog.ensure_columns():
+            click.echo('Coluna exercises.updated_at criada')
+        db.session.commit()
+
+        filled, merged = backfill_normalized_names()
+        db.session.commit()
+        click.echo(f'{filled} alimentos normalizados, {merged} duplicatas mescladas')
+
+        # Consolidado vazio (tabela recém-criada sobre um histórico existente) ou com
+        # colunas recém-criadas, que nascem zeradas: recalcula a partir do histórico
+        if added or daily_stats.is_empty():
+            total = daily_stats.rebuild_daily_stats()
+            db.session.commit()
+            if added:
+                click.echo(f"Colunas {', '.join(added)} criadas no consolidado diário")
+            click.echo(f'{total} linhas diárias reconstruídas')
+
+    @app.cli.command('normalize-food-names')
+    def normalize_food_names_command():
+        """Preenche o nome normalizado dos alimentos e cria o índice único (também roda no upgrade-db)"""
+        from src.services.foods import backfill_normalized_names
+
+        filled, merged = backfill_normalized_names()
+        db.session.commit()
+        click.echo(f'{filled} alimentos normalizados, {merged} duplicatas mescladas')
+
+    @app.cli.command('analysis-worker')
+    @click.option('--processes', type=int, default=None, help='Processos de análise em paralelo')
+    @click.option('--burst', is_flag=True, help='Processa a fila atual e termina')
+    def analysis_worker_command(processes, burst):
+        """Consome a fila de análises de refeição (POST /api/meals/analyze?async=1)"""
+        from src.services import analysis_jobs
+
+        processes = processes or analysis_jobs.WORKER_PROCESSES
+        click.echo(f'Worker de análise com {processes} processos')
+        processed = analysis_jobs.run_worker(processes, burst=burst, log=click.echo)
+        click.echo(f'{processed} análises processadas')
+
+    @app.cli.command('export-user')
+    @click.argument('user_id', type=int)
+    @click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+    @click.option('--entity', default=None, help='Exporta só uma entidade (obrigatório para CSV)')
+    @click.option('--output', type=click.Path(dir_okay=False), default=None, help='Arquivo .gz de saída')
+    def export_user_command(user_id, fmt, entity, output):
+        """Exporta o histórico completo de um usuário (gzip) com memória constante"""
+        from src.services import export
+
+        try:
+            entities = export.resolve_entities(fmt, entity)
+        except export.InvalidExport as e:
+            raise click.BadParameter(str(e))
+
+        output = output or export.export_filename(fmt, entities)
+        written = 0
+        with open(output, 'wb') as target:
+            for chunk in export.export_user(user_id, fmt, entities):
+                target.write(chunk)
+                written += len(chunk)
+        click.echo(f'{output}: {written} bytes')
+
+    @app.cli.command('train-recommendations')
+    @click.option('--components', type=int, default=None, help='Componentes do SVD truncado')
+    @click.option('--top-k', type=int, default=None, help='Recomendações por tipo e usuário')
+    @click.option('--ttl-hours', type=int, default=None, help='Validade das recomendações geradas')
+    def train_recommendations_command(components, top_k, ttl_hours):
+        """Treina o modelo colaborativo e grava as recomendações (rodar diariamente)"""
+        from src.services import recommendation_training
+
+        stats = recommendation_training.train_recommendations(
+            components=components or recommendation_training.DEFAULT_COMPONENTS,
+            top_k=top_k or recommendation_training.DEFAULT_TOP_K,
+            ttl_hours=ttl_hours or recommendation_training.DEFAULT_TTL_HOURS,
+            log=click.echo
+        )
+        click.echo(f"{stats['written']} recomendações gravadas para {stats['users']} usuários "
+                   f"({stats['exercises']} exercícios, {stats['foods']} alimentos no modelo)")
+
+    @app.cli.command('purge-revoked-tokens')
+    def purge_revoked_tokens_command():
+        """Remove revogações de tokens que já expiraram"""
+        from src.services.revocation import purge_expired_tokens
+
+        deleted = purge_expired_tokens()
+        db.session.commit()
+        click.echo(f'{deleted} revogações expiradas removidas')
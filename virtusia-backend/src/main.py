@@ -1,35 +1,58 @@
+import hmac
 import os
 import sys
 from datetime import timedelta
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory, jsonify
+from flask import Flask, send_from_directory, jsonify, request
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.exceptions import NotFound
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
+HASHED_ASSETS_PREFIX = 'assets/'
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
 def create_app():
     app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
-    
+
+    # Atrás do roteador da plataforma, remote_addr é o IP do proxy: confia no
+    # X-Forwarded-For/-Proto dos TRUSTED_PROXY_HOPS proxies à frente. O padrão é 0
+    # (sem proxy, cabeçalhos ignorados); o Procfile define 1 para o roteador
+    trusted_hops = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+    if trusted_hops > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_hops, x_proto=trusted_hops)
+
     # Configurações
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'virtusia-secret-key-2024')
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-virtusia')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = timedelta(days=30)
     
+    # Métricas internas (GET /api/metrics) só com este token; sem ele, a rota não existe
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    
+    # Limite do corpo das requisições (uploads de imagem)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+    
+    # Armazenamento das fotos de refeição (endereçado por SHA-256)
+    app.config['IMAGE_STORE_DIR'] = os.path.abspath(
+        os.getenv('IMAGE_STORE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'instance', 'images'))
+    )
+    
     # Configuração do banco de dados
     database_url = os.environ.get("DATABASE_URL")
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
     # Importar e inicializar extensões
-    from src.models.user import db, bcrypt
+    from src.models.user import db
     db.init_app(app)
-    bcrypt.init_app(app)
     jwt = JWTManager(app)
     
     # Configurar 
@@ -50,6 +73,10 @@ def create_app():
     app.register_blueprint(goals_bp, url_prefix='/api/goals')
     app.register_blueprint(ai_bp, url_prefix='/api/ai')
     
+    # Limites de requisições por blueprint, compartilhados entre os workers da máquina
+    from src.services import rate_limit
+    rate_limit.init_app(app)
+    
     # Criar tabelas do banco de dados
     with app.app_context():
         # Importar todos os modelos para garantir que as tabelas sejam criadas
@@ -57,12 +84,43 @@ def create_app():
         from src.models.exercise import Exercise, UserExercise
         from src.models.goal import Goal, BodyMeasurement
         from src.models.recommendation import Recommendation
+        from src.models.stats import UserDailyStats, UserDataVersion
+        from src.models.analysis import AnalysisJob
+        from src.models.token import RevokedToken
         
+        # Colunas novas em tabelas existentes ficam para o `flask upgrade-db` (release)
         db.create_all()
         
         # Criar dados iniciais se necessário
         create_initial_data()
     
+    # Registrar comandos de manutenção
+    from src.commands import register_commands
+    register_commands(app)
+    
+    # Tokens revogados (logout): espelho em memória por worker, sem consulta por requisição
+    from src.services import revocation
+    revocation.init_app(app)
+    
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocation.is_revoked(jwt_payload['jti'])
+    
+    @jwt.revoked_token_loader
+    def revoked_token_callback(jwt_header, jwt_payload):
+        return jsonify({'message': 'Token revogado'}), 401
+    
+    # Usuário do token com perfil, em cache por worker (flask_jwt_extended.current_user)
+    from src.services.current_user import load_current_user
+    
+    @jwt.user_lookup_loader
+    def user_lookup_callback(jwt_header, jwt_payload):
+        return load_current_user(jwt_payload['sub'])
+    
+    @jwt.user_lookup_error_loader
+    def user_lookup_error_callback(jwt_header, jwt_payload):
+        return jsonify({'message': 'Usuário não encontrado'}), 404
+    
     # Handler para tokens JWT expirados
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -79,26 +137,57 @@ def create_app():
         return jsonify({'message': 'Token de autorização necessário'}), 401
     
     # Rota para servir arquivos estáticos
+    static_folder_path = app.static_folder
+    index_exists = static_folder_path is not None and os.path.isfile(os.path.join(static_folder_path, 'index.html'))
+    
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
     def serve(path):
-        static_folder_path = app.static_folder
         if static_folder_path is None:
             return "Static folder not configured", 404
 
-        if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-            return send_from_directory(static_folder_path, path)
-        else:
-            index_path = os.path.join(static_folder_path, 'index.html')
-            if os.path.exists(index_path):
-                return send_from_directory(static_folder_path, 'index.html')
+        if path != "":
+            # send_from_directory já responde 404 se o arquivo não existe; sem os.path.exists por requisição
+            try:
+                response = send_from_directory(static_folder_path, path)
+            except NotFound:
+                pass
             else:
-                return jsonify({'message': 'Virtusia API está funcionando!', 'version': '1.0.0'}), 200
+                if path.startswith(HASHED_ASSETS_PREFIX):
+                    # Build do Vite: nomes com hash de conteúdo nunca mudam
+                    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+                    response.cache_control.public = True
+                    response.cache_control.immutable = True
+                    response.cache_control.no_cache = None
+                return response
+
+        if index_exists:
+            # index.html sempre revalida (ETag/Last-Modified) para pegar novos deploys
+            return send_from_directory(static_folder_path, 'index.html')
+        return jsonify({'message': 'Virtusia API está funcionando!', 'version': '1.0.0'}), 200
     
-    # Rota de health check
+    # Rota de health check (pública: só o estado)
     @app.route('/api/health')
     def health_check():
-        return jsonify({'status': 'healthy', 'message': 'Virtusia API está funcionando!'}), 200
+        return jsonify({
+            'status': 'healthy',
+            'message': 'Virtusia API está funcionando!'
+        }), 200
+    
+    # Métricas dos pools e caches deste worker, para o monitoramento interno
+    @app.route('/api/metrics')
+    def metrics():
+        token = app.config['METRICS_TOKEN']
+        if not token:
+            return jsonify({'message': 'Não encontrado'}), 404
+        if not hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), token):
+            return jsonify({'message': 'Token de métricas inválido'}), 401
+        
+        from src.services import diet_plans, passwords
+        return jsonify({
+            'password_hashing': passwords.metrics(),
+            'diet_plan_cache': diet_plans.cache_stats()
+        }), 200
     
     return app
 
@@ -107,8 +196,9 @@ def create_initial_data():
     from src.models.exercise import Exercise, DifficultyLevel
     from src.models.user import db
     
-    # Verificar se já existem exercícios
-    if Exercise.query.count() == 0:
+    # Verificar se já existem exercícios (só pelo id: colunas novas podem não ter
+    # sido criadas ainda quando o release roda o upgrade-db)
+    if db.session.query(db.func.count(Exercise.id)).scalar() == 0:
         # Criar exercícios básicos
         exercises = [
             {
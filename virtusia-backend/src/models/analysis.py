@@ -0,0 +1,51 @@
+from src.models.user import db
+from datetime import datetime, timezone
+import enum
+import json
+import uuid
+
+class AnalysisJobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+class AnalysisJob(db.Model):
+    """Análise de refeição enfileirada, processada pelo pool de workers (flask analysis-worker)"""
+    __tablename__ = 'analysis_jobs'
+    __table_args__ = (
+        # Índice para a fila: próximos jobs por status e ordem de chegada
+        db.Index('ix_analysis_jobs_status_created_at', 'status', 'created_at'),
+        db.Index('ix_analysis_jobs_user_status', 'user_id', 'status'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    status = db.Column(db.Enum(AnalysisJobStatus), nullable=False, default=AnalysisJobStatus.QUEUED)
+    meal_type = db.Column(db.String(20), nullable=False)
+    image_data = db.Column(db.LargeBinary, nullable=True)  # JPEG na resolução de trabalho; apagado ao concluir
+    result = db.Column(db.Text, nullable=True)  # JSON string
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<AnalysisJob {self.id} - {self.status.value}>'
+
+    @property
+    def is_finished(self):
+        return self.status in (AnalysisJobStatus.DONE, AnalysisJobStatus.FAILED)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status.value,
+            'meal_type': self.meal_type,
+            'analysis': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -19,6 +19,11 @@ class Exercise(db.Model):
     instructions = db.Column(db.Text, nullable=True)
     image_url = db.Column(db.String(255), nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Entra na impressão do catálogo em memória: edições no lugar também a mudam
+    updated_at = db.Column(
+        db.DateTime, nullable=True,
+        default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc)
+    )
     
     # Relacionamentos
     user_exercises = db.relationship('UserExercise', backref='exercise', lazy='dynamic')
@@ -41,6 +46,10 @@ class Exercise(db.Model):
 
 class UserExercise(db.Model):
     __tablename__ = 'user_exercises'
+    __table_args__ = (
+        # Índice para paginação por cursor e filtros por período do usuário
+        db.Index('ix_user_exercises_user_completed_at_id', 'user_id', 'completed_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -17,6 +17,10 @@ class GoalStatus(enum.Enum):
 
 class Goal(db.Model):
     __tablename__ = 'goals'
+    __table_args__ = (
+        # Índice para paginação por cursor e filtros por período do usuário
+        db.Index('ix_goals_user_created_at_id', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -68,6 +72,10 @@ class Goal(db.Model):
 
 class BodyMeasurement(db.Model):
     __tablename__ = 'body_measurements'
+    __table_args__ = (
+        # Índice para paginação por cursor e filtros por período do usuário
+        db.Index('ix_body_measurements_user_measured_at_id', 'user_id', 'measured_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
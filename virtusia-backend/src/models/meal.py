@@ -1,6 +1,23 @@
 from src.models.user import db
+from sqlalchemy.orm import joinedload
+from collections import defaultdict
 from datetime import datetime, timezone
+from functools import lru_cache
 import enum
+import re
+import unicodedata
+
+_NON_ALNUM = re.compile(r'[^a-z0-9]+')
+
+@lru_cache(maxsize=8192)
+def normalize_food_name(name):
+    """Normaliza um nome de alimento: sem acentos, minúsculo e só letras/dígitos"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', stripped.casefold()).strip()
+
+def _default_normalized_name(context):
+    return normalize_food_name(context.get_current_parameters().get('name'))
 
 class MealType(enum.Enum):
     BREAKFAST = "breakfast"
@@ -10,6 +27,10 @@ class MealType(enum.Enum):
 
 class Meal(db.Model):
     __tablename__ = 'meals'
+    __table_args__ = (
+        # Índice para paginação por cursor e filtros por período do usuário
+        db.Index('ix_meals_user_created_at_id', 'user_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -30,7 +51,9 @@ class Meal(db.Model):
     def __repr__(self):
         return f'<Meal {self.id} - {self.meal_type.value}>'
 
-    def to_dict(self):
+    def to_dict(self, meal_foods=None):
+        if meal_foods is None:
+            meal_foods = self.meal_foods
         return {
             'id': self.id,
             'user_id': self.user_id,
@@ -44,14 +67,19 @@ class Meal(db.Model):
             'ai_analysis_result': self.ai_analysis_result,
             'health_score': self.health_score,
             'created_at': self.created_at.isoformat(),
-            'foods': [meal_food.to_dict() for meal_food in self.meal_foods]
+            'foods': [meal_food.to_dict() for meal_food in meal_foods]
         }
 
 class Food(db.Model):
     __tablename__ = 'foods'
+    __table_args__ = (
+        # Chave única para resolver alimentos por nome sem depender de acentos/caixa
+        db.Index('uq_foods_normalized_name', 'normalized_name', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, index=True)
+    normalized_name = db.Column(db.String(200), nullable=True, default=_default_normalized_name)
     calories_per_100g = db.Column(db.Float, nullable=False)
     protein_per_100g = db.Column(db.Float, nullable=False)
     carbs_per_100g = db.Column(db.Float, nullable=False)
@@ -106,3 +134,24 @@ class MealFood(db.Model):
             'calculated_fat': (self.food.fat_per_100g * self.quantity / 100) if self.food else 0
         }
 
+
+def load_meal_foods(meal_ids):
+    """Carrega os alimentos de várias refeições numa única consulta (com o Food junto)"""
+    meal_foods_by_meal = defaultdict(list)
+    if not meal_ids:
+        return meal_foods_by_meal
+
+    meal_foods = MealFood.query.options(
+        joinedload(MealFood.food)
+    ).filter(
+        MealFood.meal_id.in_(meal_ids)
+    ).order_by(MealFood.id).all()
+
+    for meal_food in meal_foods:
+        meal_foods_by_meal[meal_food.meal_id].append(meal_food)
+    return meal_foods_by_meal
+
+def serialize_meals(meals):
+    """Serializa uma lista de refeições sem N+1: número fixo de consultas por página"""
+    meal_foods_by_meal = load_meal_foods([meal.id for meal in meals])
+    return [meal.to_dict(meal_foods=meal_foods_by_meal[meal.id]) for meal in meals]
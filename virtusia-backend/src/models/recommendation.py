@@ -17,6 +17,10 @@ class RecommendationStatus(enum.Enum):
 
 class Recommendation(db.Model):
     __tablename__ = 'recommendations'
+    __table_args__ = (
+        # Índice para servir as recomendações válidas do usuário (pendentes, não expiradas)
+        db.Index('ix_recommendations_user_status_expires_at', 'user_id', 'status', 'expires_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
@@ -38,7 +42,11 @@ class Recommendation(db.Model):
         """Verifica se a recomendação expirou"""
         if not self.expires_at:
             return False
-        return datetime.now(timezone.utc) > self.expires_at
+        expires_at = self.expires_at
+        if expires_at.tzinfo is None:
+            # O banco devolve o horário sem fuso; é gravado em UTC
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        return datetime.now(timezone.utc) > expires_at
 
     def to_dict(self):
         return {
@@ -0,0 +1,67 @@
+from src.models.user import db
+from datetime import datetime, timezone
+
+class UserDailyStats(db.Model):
+    """Consolidado diário por usuário, mantido a cada escrita de refeição e exercício"""
+    __tablename__ = 'user_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', name='uq_user_daily_stats_user_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False)
+    total_calories = db.Column(db.Float, nullable=False, default=0)
+    total_protein = db.Column(db.Float, nullable=False, default=0)  # em gramas
+    total_carbs = db.Column(db.Float, nullable=False, default=0)    # em gramas
+    total_fat = db.Column(db.Float, nullable=False, default=0)      # em gramas
+    total_fiber = db.Column(db.Float, nullable=False, default=0)    # em gramas
+    health_score_sum = db.Column(db.Float, nullable=False, default=0)
+    health_score_count = db.Column(db.Integer, nullable=False, default=0)  # refeições com nota
+    meals_count = db.Column(db.Integer, nullable=False, default=0)
+    breakfast_count = db.Column(db.Integer, nullable=False, default=0)
+    lunch_count = db.Column(db.Integer, nullable=False, default=0)
+    dinner_count = db.Column(db.Integer, nullable=False, default=0)
+    snack_count = db.Column(db.Integer, nullable=False, default=0)
+    exercise_minutes = db.Column(db.Float, nullable=False, default=0)
+    calories_burned = db.Column(db.Float, nullable=False, default=0)
+    exercises_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<UserDailyStats {self.user_id} - {self.date}>'
+
+    def to_dict(self):
+        return {
+            'date': self.date.isoformat(),
+            'total_calories': self.total_calories,
+            'total_protein': self.total_protein,
+            'total_carbs': self.total_carbs,
+            'total_fat': self.total_fat,
+            'total_fiber': self.total_fiber,
+            'health_score_sum': self.health_score_sum,
+            'health_score_count': self.health_score_count,
+            'meals_count': self.meals_count,
+            'breakfast_count': self.breakfast_count,
+            'lunch_count': self.lunch_count,
+            'dinner_count': self.dinner_count,
+            'snack_count': self.snack_count,
+            'exercise_minutes': self.exercise_minutes,
+            'calories_burned': self.calories_burned,
+            'exercises_count': self.exercises_count
+        }
+
+class UserDataVersion(db.Model):
+    """
+    Versão dos dados de um usuário exibidos no dashboard. É incrementada na mesma
+    transação de cada escrita (refeições, exercícios, metas, medidas e perfil);
+    caches em qualquer processo comparam com ela para saber se estão válidos.
+    """
+    __tablename__ = 'user_data_versions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<UserDataVersion {self.user_id} - {self.version}>'
@@ -0,0 +1,20 @@
+from src.models.user import db
+from datetime import datetime, timezone
+
+class RevokedToken(db.Model):
+    """
+    Token JWT revogado (logout), identificado pelo jti. A linha só precisa existir
+    até o token expirar; o id crescente serve de marca d'água para os workers
+    carregarem apenas as revogações novas.
+    """
+    __tablename__ = 'revoked_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    token_type = db.Column(db.String(10), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True, index=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<RevokedToken {self.jti} - {self.token_type}>'
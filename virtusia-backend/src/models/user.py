@@ -1,10 +1,10 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_bcrypt import Bcrypt
 from datetime import datetime, timezone
 import enum
 
+from src.services import passwords
+
 db = SQLAlchemy()
-bcrypt = Bcrypt()
 
 class ActivityLevel(enum.Enum):
     SEDENTARY = "sedentary"
@@ -42,12 +42,18 @@ class User(db.Model):
     recommendations = db.relationship('Recommendation', backref='user', lazy='dynamic', cascade='all, delete-orphan')
 
     def set_password(self, password):
-        """Hash e define a senha do usuário"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hash e define a senha do usuário (no pool de hashing; pode levantar HashingBusy)"""
+        self.password_hash = passwords.hash_password(password)
 
     def check_password(self, password):
-        """Verifica se a senha fornecida está correta"""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        """
+        Verifica se a senha fornecida está correta. Se o hash armazenado usa um
+        esquema ou parâmetros antigos, troca pelo atual (o chamador faz o commit).
+        """
+        valid, new_hash = passwords.verify_password(self.password_hash, password)
+        if new_hash:
+            self.password_hash = new_hash
+        return valid
 
     def __repr__(self):
         return f'<User {self.email}>'
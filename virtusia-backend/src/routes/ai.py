@@ -1,11 +1,20 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import json
-import random
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from src.services.diet_plans import generate_diet_plan
 
 ai_bp = Blueprint('ai', __name__)
 
+ACTIVITY_MULTIPLIERS = {
+    'sedentary': 1.2,
+    'lightly_active': 1.375,
+    'moderately_active': 1.55,
+    'very_active': 1.725,
+    'extremely_active': 1.9
+}
+
 def calculate_bmr(weight, height, age, gender):
     """Calcula a Taxa Metabólica Basal usando a fórmula de Harris-Benedict"""
     if gender.lower() == 'male':
@@ -16,152 +25,7 @@ def calculate_bmr(weight, height, age, gender):
 
 def calculate_tdee(bmr, activity_level):
     """Calcula o Gasto Energético Total Diário"""
-    activity_multipliers = {
-        'sedentary': 1.2,
-        'lightly_active': 1.375,
-        'moderately_active': 1.55,
-        'very_active': 1.725,
-        'extremely_active': 1.9
-    }
-    return bmr * activity_multipliers.get(activity_level, 1.2)
-
-def generate_diet_plan(calories, goal, dietary_preferences=None):
-    """Gera um plano alimentar personalizado"""
-    
-    # Distribuição de macronutrientes baseada no objetivo
-    if goal == 'weight_loss':
-        protein_ratio = 0.30
-        carb_ratio = 0.35
-        fat_ratio = 0.35
-    elif goal == 'muscle_gain':
-        protein_ratio = 0.25
-        carb_ratio = 0.45
-        fat_ratio = 0.30
-    else:  # maintenance
-        protein_ratio = 0.20
-        carb_ratio = 0.50
-        fat_ratio = 0.30
-    
-    protein_calories = calories * protein_ratio
-    carb_calories = calories * carb_ratio
-    fat_calories = calories * fat_ratio
-    
-    # Converter para gramas
-    protein_grams = protein_calories / 4
-    carb_grams = carb_calories / 4
-    fat_grams = fat_calories / 9
-    
-    # Planos de refeição baseados nas preferências
-    meal_plans = {
-        'omnivore': {
-            'breakfast': [
-                'Ovos mexidos com aveia e frutas vermelhas',
-                'Iogurte grego com granola e banana',
-                'Panqueca de aveia com mel e nozes',
-                'Smoothie de proteína com frutas'
-            ],
-            'lunch': [
-                'Peito de frango grelhado com arroz integral e brócolis',
-                'Salmão assado com batata-doce e aspargos',
-                'Carne magra com quinoa e salada verde',
-                'Peixe grelhado com arroz e legumes'
-            ],
-            'dinner': [
-                'Frango ao curry com arroz integral',
-                'Peixe com purê de batata-doce',
-                'Carne magra com salada e batata',
-                'Omelete com vegetais e queijo'
-            ],
-            'snacks': [
-                'Mix de castanhas',
-                'Iogurte com frutas',
-                'Sanduíche natural',
-                'Shake de proteína'
-            ]
-        },
-        'vegetarian': {
-            'breakfast': [
-                'Aveia com leite vegetal e frutas',
-                'Smoothie verde com espinafre e banana',
-                'Torrada integral com abacate',
-                'Iogurte vegetal com granola'
-            ],
-            'lunch': [
-                'Quinoa com legumes grelhados',
-                'Lentilha com arroz integral',
-                'Tofu grelhado com vegetais',
-                'Salada de grão-de-bico'
-            ],
-            'dinner': [
-                'Curry de grão-de-bico',
-                'Risotto de cogumelos',
-                'Macarrão integral com molho de tomate',
-                'Omelete de vegetais'
-            ],
-            'snacks': [
-                'Hummus com vegetais',
-                'Frutas secas e castanhas',
-                'Smoothie de proteína vegetal',
-                'Iogurte vegetal'
-            ]
-        },
-        'vegan': {
-            'breakfast': [
-                'Aveia com leite de amêndoas e frutas',
-                'Smoothie de proteína vegetal',
-                'Torrada com pasta de amendoim',
-                'Chia pudding com frutas'
-            ],
-            'lunch': [
-                'Bowl de quinoa com vegetais',
-                'Curry de lentilha vermelha',
-                'Salada de grão-de-bico com tahine',
-                'Tofu marinado com arroz'
-            ],
-            'dinner': [
-                'Tempeh refogado com vegetais',
-                'Sopa de feijão com legumes',
-                'Macarrão com molho de castanhas',
-                'Curry de vegetais'
-            ],
-            'snacks': [
-                'Mix de sementes',
-                'Frutas frescas',
-                'Leite vegetal com proteína',
-                'Hummus com vegetais'
-            ]
-        }
-    }
-    
-    preference = dietary_preferences or 'omnivore'
-    meals = meal_plans.get(preference, meal_plans['omnivore'])
-    
-    # Selecionar refeições aleatórias
-    selected_meals = {
-        'breakfast': random.choice(meals['breakfast']),
-        'lunch': random.choice(meals['lunch']),
-        'dinner': random.choice(meals['dinner']),
-        'snack1': random.choice(meals['snacks']),
-        'snack2': random.choice(meals['snacks'])
-    }
-    
-    return {
-        'daily_calories': round(calories),
-        'macronutrients': {
-            'protein': round(protein_grams),
-            'carbohydrates': round(carb_grams),
-            'fat': round(fat_grams)
-        },
-        'meals': selected_meals,
-        'hydration_goal': round(calories * 0.035),  # 35ml por kcal
-        'meal_timing': {
-            'breakfast': '07:00-09:00',
-            'snack1': '10:00-11:00',
-            'lunch': '12:00-14:00',
-            'snack2': '15:00-16:00',
-            'dinner': '18:00-20:00'
-        }
-    }
+    return bmr * ACTIVITY_MULTIPLIERS.get(activity_level, 1.2)
 
 @ai_bp.route('/suggest-diet', methods=['POST'])
 @jwt_required()
@@ -203,7 +67,7 @@ def suggest_diet():
         else:
             target_calories = tdee
         
-        # Gerar plano alimentar
+        # Plano alimentar (memorizado pela faixa de calorias, objetivo e preferência)
         diet_plan = generate_diet_plan(target_calories, goal, dietary_preferences)
         
         # Recomendações personalizadas baseadas no IMC e objetivo
@@ -258,7 +122,7 @@ def suggest_diet():
             'recommendations': recommendations,
             'ai_insights': ai_insights,
             'generated_at': datetime.now().isoformat(),
-            'next_review_date': datetime.now().replace(day=datetime.now().day + 14).isoformat()
+            'next_review_date': (datetime.now() + timedelta(days=14)).isoformat()
         }
         
         return jsonify(response), 200
@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt
+from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity, get_jwt, decode_token, get_current_user as get_token_user
 from datetime import datetime, timezone
 import re
 
 from src.models.user import db, User, UserProfile, Gender, ActivityLevel
+from src.services.passwords import HashingBusy
+from src.services import revocation
+from src.services.current_user import load_user_for_update, invalidate_user
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -24,6 +27,12 @@ def validate_password(password):
         return False, "Senha deve conter pelo menos um número"
     return True, "Senha válida"
 
+def hashing_busy_response(error):
+    """503 com Retry-After quando o pool de hashing recusa a operação"""
+    response = jsonify({'message': str(error), 'retry_after': error.retry_after})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Registra um novo usuário"""
@@ -110,6 +119,9 @@ def register():
             'user': user.to_dict()
         }), 201
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -132,6 +144,10 @@ def login():
         if not user or not user.check_password(password):
             return jsonify({'message': 'Email ou senha incorretos'}), 401
         
+        # Hash em esquema ou parâmetros antigos foi trocado na verificação
+        if db.session.is_modified(user):
+            db.session.commit()
+        
         # Criar tokens
         access_token = create_access_token(identity=user.id)
         refresh_token = create_refresh_token(identity=user.id)
@@ -143,7 +159,11 @@ def login():
             'user': user.to_dict()
         }), 200
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @auth_bp.route('/refresh', methods=['POST'])
@@ -153,8 +173,8 @@ def refresh():
     try:
         current_user_id = get_jwt_identity()
         
-        # Verificar se usuário ainda existe
-        user = User.query.get(current_user_id)
+        # Verificar se usuário ainda existe (carregado pelo token, em cache)
+        user = get_token_user()
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
@@ -171,13 +191,32 @@ def refresh():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    """Logout do usuário (invalidação do token seria implementada com Redis)"""
+    """
+    Logout do usuário: revoga o token de acesso usado e, se enviado no corpo,
+    o refresh_token da mesma sessão
+    """
     try:
-        # Em uma implementação completa, adicionaríamos o token a uma blacklist no Redis
-        # Por enquanto, apenas retornamos sucesso
+        current_user_id = get_jwt_identity()
+        payloads = [get_jwt()]
+        
+        data = request.get_json(silent=True) or {}
+        if data.get('refresh_token'):
+            try:
+                refresh_payload = decode_token(data['refresh_token'])
+            except Exception:
+                return jsonify({'message': 'Refresh token inválido'}), 400
+            if refresh_payload.get('type') != 'refresh' or refresh_payload.get('sub') != current_user_id:
+                return jsonify({'message': 'Refresh token inválido'}), 400
+            payloads.append(refresh_payload)
+        
+        revocation.revoke_tokens(payloads, int(current_user_id))
+        db.session.commit()
+        revocation.remember(payloads)
+        
         return jsonify({'message': 'Logout realizado com sucesso'}), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
 @auth_bp.route('/me', methods=['GET'])
@@ -185,8 +224,7 @@ def logout():
 def get_current_user():
     """Retorna informações do usuário autenticado"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_token_user()
         
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
@@ -213,7 +251,8 @@ def change_password():
         if not data.get('current_password') or not data.get('new_password'):
             return jsonify({'message': 'Senha atual e nova senha são obrigatórias'}), 400
         
-        user = User.query.get(current_user_id)
+        # Relido do banco: a verificação não pode usar um hash em cache
+        user = load_user_for_update(current_user_id)
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
@@ -230,9 +269,13 @@ def change_password():
         user.set_password(data['new_password'])
         user.updated_at = datetime.now(timezone.utc)
         db.session.commit()
+        invalidate_user(user.id)
         
         return jsonify({'message': 'Senha alterada com sucesso'}), 200
         
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
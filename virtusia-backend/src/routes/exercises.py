@@ -1,13 +1,27 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime, timezone, date
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_current_user
+from datetime import datetime, timezone, date, timedelta
 import json
 
-from src.models.user import db, User
+from src.models.user import db
 from src.models.exercise import Exercise, UserExercise, DifficultyLevel
+from src.models.recommendation import RecommendationType
+from src.services.pagination import paginate, InvalidCursor
+from src.services.dashboard import invalidate_dashboard
+from src.services import daily_stats, exercise_recommender
+from src.services.exercise_catalog import catalog
+from src.services.recommendation_training import stored_recommendations
 
 exercises_bp = Blueprint('exercises', __name__)
 
+def catalog_response(payload, snapshot):
+    """Resposta do catálogo com ETag da versão: clientes e proxies revalidam com If-None-Match"""
+    response = jsonify(payload)
+    response.set_etag(snapshot.version)
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 @exercises_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_exercises():
@@ -20,41 +34,29 @@ def get_exercises():
         limit = int(request.args.get('limit', 20))
         offset = int(request.args.get('offset', 0))
         
-        # Construir query
-        query = Exercise.query
+        snapshot = catalog.snapshot()
         
-        # Filtros opcionais
+        # Filtros viram interseções de bitmaps da foto do catálogo (já ordenada por nome)
+        selected = snapshot.all
         if muscle_group:
-            query = query.filter(Exercise.muscle_groups.ilike(f'%{muscle_group}%'))
+            selected = selected & snapshot.muscle(muscle_group)
         
         if difficulty:
             try:
                 difficulty_enum = DifficultyLevel(difficulty)
-                query = query.filter_by(difficulty_level=difficulty_enum)
             except ValueError:
                 return jsonify({'message': 'Nível de dificuldade inválido'}), 400
+            selected = selected & snapshot.difficulty(difficulty_enum)
         
         if search:
-            query = query.filter(
-                db.or_(
-                    Exercise.name.ilike(f'%{search}%'),
-                    Exercise.description.ilike(f'%{search}%')
-                )
-            )
+            selected = selected & snapshot.search(search)
         
-        # Ordenar por nome
-        query = query.order_by(Exercise.name)
-        
-        # Paginação
-        exercises = query.offset(offset).limit(limit).all()
-        total = query.count()
-        
-        return jsonify({
-            'exercises': [exercise.to_dict() for exercise in exercises],
-            'total': total,
+        return catalog_response({
+            'exercises': snapshot.page(selected, offset, limit),
+            'total': len(selected),
             'limit': limit,
             'offset': offset
-        }), 200
+        }, snapshot)
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -64,11 +66,12 @@ def get_exercises():
 def get_exercise(exercise_id):
     """Obtém detalhes de um exercício específico"""
     try:
-        exercise = Exercise.query.get(exercise_id)
+        snapshot = catalog.snapshot()
+        exercise = snapshot.get(exercise_id)
         if not exercise:
             return jsonify({'message': 'Exercício não encontrado'}), 404
         
-        return jsonify({'exercise': exercise.to_dict()}), 200
+        return catalog_response({'exercise': exercise}, snapshot)
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -76,39 +79,18 @@ def get_exercise(exercise_id):
 @exercises_bp.route('/recommendations', methods=['GET'])
 @jwt_required()
 def get_exercise_recommendations():
-    """Obtém exercícios recomendados pela IA"""
+    """Obtém exercícios recomendados, ordenados pela pontuação do recomendador"""
     try:
-        current_user_id = get_jwt_identity()
-        
-        # Buscar usuário e perfil
-        user = User.query.get(current_user_id)
+        # Usuário e perfil já carregados pelo token
+        user = get_current_user()
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
-        # Simular recomendações baseadas no perfil do usuário
-        # Em uma implementação real, aqui seria usado ML para personalizar
-        
-        # Determinar nível de dificuldade baseado na atividade do usuário
         user_activity = user.activity_level.value if user.activity_level else 'moderately_active'
         
-        if user_activity in ['sedentary', 'lightly_active']:
-            recommended_difficulty = DifficultyLevel.BEGINNER
-        elif user_activity == 'moderately_active':
-            recommended_difficulty = DifficultyLevel.INTERMEDIATE
-        else:
-            recommended_difficulty = DifficultyLevel.ADVANCED
-        
-        # Buscar exercícios recomendados
-        recommended_exercises = Exercise.query.filter_by(
-            difficulty_level=recommended_difficulty
-        ).limit(6).all()
-        
-        # Se não houver exercícios suficientes, buscar de outros níveis
-        if len(recommended_exercises) < 4:
-            additional_exercises = Exercise.query.filter(
-                Exercise.difficulty_level != recommended_difficulty
-            ).limit(6 - len(recommended_exercises)).all()
-            recommended_exercises.extend(additional_exercises)
+        # Pontua o catálogo inteiro pelo histórico recente, nível e objetivos do usuário
+        recommended_exercises, signals, undertrained_groups = exercise_recommender.recommend_exercises(user, k=6)
+        recommended_difficulty = signals.target_difficulty
         
         # Criar plano de treino personalizado
         workout_plan = {
@@ -121,8 +103,7 @@ def get_exercise_recommendations():
         }
         
         # Adicionar exercícios ao plano
-        for exercise in recommended_exercises[:4]:  # Limitar a 4 exercícios
-            exercise_data = exercise.to_dict()
+        for exercise_data in recommended_exercises[:4]:  # Limitar a 4 exercícios
             
             # Personalizar séries e repetições baseado no nível
             if recommended_difficulty == DifficultyLevel.BEGINNER:
@@ -140,12 +121,21 @@ def get_exercise_recommendations():
             
             workout_plan['exercises'].append(exercise_data)
         
+        # Exercícios que usuários parecidos fazem (modelo colaborativo pré-calculado)
+        collaborative = [
+            recommendation.to_dict()
+            for recommendation in stored_recommendations(user.id, [RecommendationType.EXERCISE], limit=4)
+        ]
+        
         return jsonify({
             'workout_plan': workout_plan,
+            'similar_users_exercises': collaborative,
             'user_level': recommended_difficulty.value,
             'personalization_factors': {
                 'activity_level': user_activity,
-                'fitness_goals': user.profile.fitness_goals if user.profile else None
+                'fitness_goals': user.profile.fitness_goals if user.profile else None,
+                'recent_sessions': len(signals.exercise_ids),
+                'undertrained_muscle_groups': undertrained_groups
             }
         }), 200
         
@@ -189,6 +179,8 @@ def log_exercise():
         )
         
         db.session.add(user_exercise)
+        daily_stats.record_exercise(user_exercise)
+        invalidate_dashboard(current_user_id)
         db.session.commit()
         
         return jsonify({
@@ -211,8 +203,6 @@ def get_exercise_history():
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         exercise_id = request.args.get('exercise_id')
-        limit = int(request.args.get('limit', 20))
-        offset = int(request.args.get('offset', 0))
         
         # Construir query
         query = UserExercise.query.filter_by(user_id=current_user_id)
@@ -235,20 +225,16 @@ def get_exercise_history():
         if exercise_id:
             query = query.filter_by(exercise_id=exercise_id)
         
-        # Ordenar por data (mais recente primeiro)
-        query = query.order_by(UserExercise.completed_at.desc())
-        
-        # Paginação
-        user_exercises = query.offset(offset).limit(limit).all()
-        total = query.count()
+        # Paginação por cursor em (completed_at, id), mais recente primeiro
+        page = paginate(query, UserExercise.completed_at, UserExercise.id, request.args)
         
         return jsonify({
-            'exercises': [user_exercise.to_dict() for user_exercise in user_exercises],
-            'total': total,
-            'limit': limit,
-            'offset': offset
+            'exercises': [user_exercise.to_dict() for user_exercise in page.items],
+            **page.meta()
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor de paginação inválido'}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -286,35 +272,34 @@ def get_exercise_stats():
         else:
             return jsonify({'message': 'Período inválido. Use: day, week, month'}), 400
         
-        # Buscar exercícios do período
-        user_exercises = UserExercise.query.filter(
+        # Intervalo sobre o timestamp cru [início, fim + 1 dia) para usar o índice (user_id, completed_at)
+        period_filter = (
             UserExercise.user_id == current_user_id,
-            db.func.date(UserExercise.completed_at) >= start_date,
-            db.func.date(UserExercise.completed_at) <= end_date
-        ).all()
+            UserExercise.completed_at >= datetime.combine(start_date, datetime.min.time()),
+            UserExercise.completed_at < datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        )
         
-        # Calcular estatísticas
-        total_exercises = len(user_exercises)
-        total_duration = sum(ex.duration_minutes or 0 for ex in user_exercises)
-        total_calories = sum(ex.calories_burned or 0 for ex in user_exercises)
+        # Totais do período numa única agregação
+        total_exercises, total_duration, total_calories = db.session.query(
+            db.func.count(UserExercise.id),
+            db.func.coalesce(db.func.sum(UserExercise.duration_minutes), 0),
+            db.func.coalesce(db.func.sum(UserExercise.calories_burned), 0)
+        ).filter(*period_filter).one()
         
         # Exercícios por dia
+        day = db.func.date(UserExercise.completed_at)
         exercises_by_day = {}
-        for ex in user_exercises:
-            day = ex.completed_at.date().isoformat()
-            if day not in exercises_by_day:
-                exercises_by_day[day] = 0
-            exercises_by_day[day] += 1
-        
-        # Exercícios mais realizados
-        exercise_counts = {}
-        for ex in user_exercises:
-            exercise_name = ex.exercise.name if ex.exercise else 'Desconhecido'
-            if exercise_name not in exercise_counts:
-                exercise_counts[exercise_name] = 0
-            exercise_counts[exercise_name] += 1
-        
-        most_performed = sorted(exercise_counts.items(), key=lambda x: x[1], reverse=True)[:5]
+        for exercise_day, count in db.session.query(day, db.func.count(UserExercise.id)).filter(
+            *period_filter
+        ).group_by(day).order_by(day):
+            exercises_by_day[exercise_day if isinstance(exercise_day, str) else exercise_day.isoformat()] = count
+        
+        # Exercícios mais realizados (top 5 já ordenado no banco)
+        exercise_name = db.func.coalesce(Exercise.name, 'Desconhecido')
+        usage = db.func.count(UserExercise.id)
+        most_performed = db.session.query(exercise_name, usage).select_from(UserExercise).outerjoin(
+            Exercise, Exercise.id == UserExercise.exercise_id
+        ).filter(*period_filter).group_by(exercise_name).order_by(usage.desc(), exercise_name).limit(5).all()
         
         return jsonify({
             'period': period,
@@ -5,6 +5,12 @@ import json
 
 from src.models.user import db, User
 from src.models.goal import Goal, BodyMeasurement, GoalType, GoalStatus
+from src.services.pagination import paginate, InvalidCursor
+from src.services.measurement_trends import measurement_trends, InvalidTrendRequest, FIELDS as MEASUREMENT_FIELDS
+from src.services.goal_progress import goal_progress_history, apply_measurement, InvalidGranularity, DEFAULT_GRANULARITY
+from src.services.events import emit, goal_completed
+from src.services.goal_forecast import forecast_goals
+from src.services.dashboard import invalidate_dashboard
 
 goals_bp = Blueprint('goals', __name__)
 
@@ -18,8 +24,6 @@ def get_goals():
         # Parâmetros de consulta
         status = request.args.get('status')
         goal_type = request.args.get('goal_type')
-        limit = int(request.args.get('limit', 20))
-        offset = int(request.args.get('offset', 0))
         
         # Construir query
         query = Goal.query.filter_by(user_id=current_user_id)
@@ -39,20 +43,16 @@ def get_goals():
             except ValueError:
                 return jsonify({'message': 'Tipo de meta inválido'}), 400
         
-        # Ordenar por data de criação (mais recente primeiro)
-        query = query.order_by(Goal.created_at.desc())
-        
-        # Paginação
-        goals = query.offset(offset).limit(limit).all()
-        total = query.count()
+        # Paginação por cursor em (created_at, id), mais recente primeiro
+        page = paginate(query, Goal.created_at, Goal.id, request.args)
         
         return jsonify({
-            'goals': [goal.to_dict() for goal in goals],
-            'total': total,
-            'limit': limit,
-            'offset': offset
+            'goals': [goal.to_dict() for goal in page.items],
+            **page.meta()
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor de paginação inválido'}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -99,6 +99,7 @@ def create_goal():
         )
         
         db.session.add(goal)
+        invalidate_dashboard(current_user_id)
         db.session.commit()
         
         return jsonify({
@@ -110,6 +111,23 @@ def create_goal():
         db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
+@goals_bp.route('/forecast', methods=['GET'])
+@jwt_required()
+def get_goals_forecast():
+    """Previsão de conclusão de todas as metas ativas a partir da tendência das medidas"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        forecasts = forecast_goals(current_user_id)
+        
+        return jsonify({
+            'forecasts': forecasts,
+            'on_track': sum(1 for forecast in forecasts if forecast['on_track'])
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
 @goals_bp.route('/<int:goal_id>', methods=['GET'])
 @jwt_required()
 def get_goal(goal_id):
@@ -168,6 +186,7 @@ def update_goal(goal_id):
                 goal.target_date = None
         
         goal.updated_at = datetime.now(timezone.utc)
+        invalidate_dashboard(current_user_id)
         db.session.commit()
         
         return jsonify({
@@ -191,6 +210,7 @@ def delete_goal(goal_id):
             return jsonify({'message': 'Meta não encontrada'}), 404
         
         db.session.delete(goal)
+        invalidate_dashboard(current_user_id)
         db.session.commit()
         
         return jsonify({'message': 'Meta excluída com sucesso'}), 200
@@ -218,25 +238,16 @@ def get_goal_progress(goal_id):
         if goal.target_date:
             days_remaining = (goal.target_date - date.today()).days
         
-        # Histórico de progresso (simulado - em implementação real seria baseado em medidas corporais)
-        progress_history = []
-        if goal.goal_type == GoalType.WEIGHT_LOSS and goal.target_value and goal.current_value:
-            # Simular progresso semanal
-            start_date = goal.created_at.date()
-            current_date = date.today()
-            weeks_passed = (current_date - start_date).days // 7
-            
-            initial_weight = goal.target_value + (goal.target_value - goal.current_value)
-            weight_loss_per_week = (initial_weight - goal.current_value) / max(weeks_passed, 1)
-            
-            for week in range(min(weeks_passed + 1, 12)):  # Máximo 12 semanas
-                week_date = start_date + timedelta(weeks=week)
-                week_weight = initial_weight - (weight_loss_per_week * week)
-                progress_history.append({
-                    'date': week_date.isoformat(),
-                    'value': round(week_weight, 1),
-                    'week': week + 1
-                })
+        # Histórico real a partir das medidas corporais, agrupado no banco por período
+        granularity = request.args.get('granularity', DEFAULT_GRANULARITY)
+        measurement_field, progress_history = goal_progress_history(goal, granularity)
+        if granularity == 'week':
+            # Semana da meta (1 = semana em que foi criada), mesmo com semanas sem medida
+            start_week = goal.created_at.date() - timedelta(days=goal.created_at.weekday())
+            progress_history = [
+                {**entry, 'week': (date.fromisoformat(entry['date']) - start_week).days // 7 + 1}
+                for entry in progress_history
+            ]
         
         return jsonify({
             'goal': goal.to_dict(),
@@ -244,10 +255,14 @@ def get_goal_progress(goal_id):
                 'percentage': progress_percentage,
                 'days_remaining': days_remaining,
                 'is_on_track': progress_percentage >= 50 if days_remaining and days_remaining > 0 else None,
+                'measurement_field': measurement_field,
+                'granularity': granularity,
                 'history': progress_history
             }
         }), 200
         
+    except InvalidGranularity as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -274,27 +289,22 @@ def add_body_measurement():
         
         db.session.add(measurement)
         
-        # Atualizar metas relacionadas ao peso
-        if measurement.weight:
-            weight_goals = Goal.query.filter_by(
-                user_id=current_user_id,
-                goal_type=GoalType.WEIGHT_LOSS,
-                status=GoalStatus.ACTIVE
-            ).all()
-            
-            for goal in weight_goals:
-                goal.current_value = measurement.weight
-                goal.updated_at = datetime.now(timezone.utc)
-                
-                # Verificar se meta foi atingida
-                if goal.target_value and measurement.weight <= goal.target_value:
-                    goal.status = GoalStatus.COMPLETED
+        # Atualizar todas as metas medidas por estes campos num único UPDATE
+        now = datetime.now(timezone.utc)
+        completed_goals = apply_measurement(
+            current_user_id, {field: getattr(measurement, field) for field in MEASUREMENT_FIELDS}, now
+        )
+        invalidate_dashboard(current_user_id)
         
         db.session.commit()
         
+        for goal in completed_goals:
+            emit(goal_completed, int(current_user_id), goal=goal, completed_at=now)
+        
         return jsonify({
             'message': 'Medida corporal adicionada com sucesso',
-            'measurement': measurement.to_dict()
+            'measurement': measurement.to_dict(),
+            'completed_goals': completed_goals
         }), 201
         
     except Exception as e:
@@ -312,8 +322,6 @@ def get_body_measurements():
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         measurement_type = request.args.get('measurement_type')
-        limit = int(request.args.get('limit', 20))
-        offset = int(request.args.get('offset', 0))
         
         # Construir query
         query = BodyMeasurement.query.filter_by(user_id=current_user_id)
@@ -333,20 +341,16 @@ def get_body_measurements():
             except ValueError:
                 return jsonify({'message': 'Data final inválida. Use formato YYYY-MM-DD'}), 400
         
-        # Ordenar por data (mais recente primeiro)
-        query = query.order_by(BodyMeasurement.measured_at.desc())
-        
-        # Paginação
-        measurements = query.offset(offset).limit(limit).all()
-        total = query.count()
+        # Paginação por cursor em (measured_at, id), mais recente primeiro
+        page = paginate(query, BodyMeasurement.measured_at, BodyMeasurement.id, request.args)
         
         return jsonify({
-            'measurements': [measurement.to_dict() for measurement in measurements],
-            'total': total,
-            'limit': limit,
-            'offset': offset
+            'measurements': [measurement.to_dict() for measurement in page.items],
+            **page.meta()
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor de paginação inválido'}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -357,64 +361,27 @@ def get_measurement_trends():
     try:
         current_user_id = get_jwt_identity()
         
-        # Buscar medidas dos últimos 3 meses
-        three_months_ago = date.today() - timedelta(days=90)
-        measurements = BodyMeasurement.query.filter(
-            BodyMeasurement.user_id == current_user_id,
-            BodyMeasurement.measured_at >= three_months_ago
-        ).order_by(BodyMeasurement.measured_at).all()
+        # Janela (30d, 90d, 180d, 1y, 2y, all) e pontos da série para gráficos (opcional)
+        window, total, trends = measurement_trends(
+            current_user_id,
+            window=request.args.get('window'),
+            points=request.args.get('points')
+        )
         
-        if not measurements:
+        if not total:
             return jsonify({
-                'message': 'Nenhuma medida encontrada nos últimos 3 meses',
+                'message': 'Nenhuma medida encontrada no período',
+                'period': window,
                 'trends': {}
             }), 200
         
-        # Calcular tendências
-        trends = {}
-        
-        # Peso
-        weights = [m.weight for m in measurements if m.weight]
-        if len(weights) >= 2:
-            weight_change = weights[-1] - weights[0]
-            trends['weight'] = {
-                'current': weights[-1],
-                'initial': weights[0],
-                'change': weight_change,
-                'trend': 'decreasing' if weight_change < 0 else 'increasing' if weight_change > 0 else 'stable',
-                'data_points': len(weights)
-            }
-        
-        # Percentual de gordura
-        body_fats = [m.body_fat_percentage for m in measurements if m.body_fat_percentage]
-        if len(body_fats) >= 2:
-            bf_change = body_fats[-1] - body_fats[0]
-            trends['body_fat'] = {
-                'current': body_fats[-1],
-                'initial': body_fats[0],
-                'change': bf_change,
-                'trend': 'decreasing' if bf_change < 0 else 'increasing' if bf_change > 0 else 'stable',
-                'data_points': len(body_fats)
-            }
-        
-        # Massa muscular
-        muscle_masses = [m.muscle_mass for m in measurements if m.muscle_mass]
-        if len(muscle_masses) >= 2:
-            mm_change = muscle_masses[-1] - muscle_masses[0]
-            trends['muscle_mass'] = {
-                'current': muscle_masses[-1],
-                'initial': muscle_masses[0],
-                'change': mm_change,
-                'trend': 'increasing' if mm_change > 0 else 'decreasing' if mm_change < 0 else 'stable',
-                'data_points': len(muscle_masses)
-            }
-        
         return jsonify({
-            'period': '3 months',
-            'total_measurements': len(measurements),
+            'period': window,
+            'total_measurements': total,
             'trends': trends
         }), 200
         
+    except InvalidTrendRequest as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
-
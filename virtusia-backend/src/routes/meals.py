@@ -1,105 +1,190 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_current_user
 from datetime import datetime, timezone, date
 import json
+import time
 import base64
 import io
 from PIL import Image
 
-from src.models.user import db, User
-from src.models.meal import Meal, Food, MealFood, MealType
+from src.models.user import db
+from src.models.meal import Meal, MealType, serialize_meals, normalize_food_name
+from src.services import analysis_jobs, daily_stats, food_search, image_store, images
+from src.services.foods import resolve_foods, add_meal_foods
+from src.services.meal_import import import_meals, MAX_BATCH_MEALS
+from src.services.pagination import paginate, InvalidCursor
+from src.services.dashboard import invalidate_dashboard
+from src.services.meal_analysis import analyze_meal_image
 
 meals_bp = Blueprint('meals', __name__)
 
-def analyze_meal_image(image_data):
-    """
-    Simula análise de imagem de refeição por IA
-    Em uma implementação real, aqui seria integrado com modelos de ML
-    """
-    # Simulação de análise de IA
-    mock_analysis = {
-        'detected_foods': [
-            {
-                'name': 'Frango Grelhado',
-                'confidence': 0.92,
-                'quantity': 150,
-                'unit': 'g',
-                'calories_per_100g': 165,
-                'protein_per_100g': 31,
-                'carbs_per_100g': 0,
-                'fat_per_100g': 3.6
-            },
-            {
-                'name': 'Arroz Branco',
-                'confidence': 0.88,
-                'quantity': 100,
-                'unit': 'g',
-                'calories_per_100g': 130,
-                'protein_per_100g': 2.7,
-                'carbs_per_100g': 28,
-                'fat_per_100g': 0.3
-            },
-            {
-                'name': 'Brócolis',
-                'confidence': 0.85,
-                'quantity': 80,
-                'unit': 'g',
-                'calories_per_100g': 34,
-                'protein_per_100g': 2.8,
-                'carbs_per_100g': 7,
-                'fat_per_100g': 0.4
-            }
-        ],
-        'total_calories': 295,
-        'total_protein': 52.5,
-        'total_carbs': 33.6,
-        'total_fat': 5.7,
-        'health_score': 85,
-        'recommendations': [
-            'Excelente fonte de proteína magra!',
-            'Adicione mais vegetais coloridos para aumentar a variedade de nutrientes',
-            'Considere trocar o arroz branco por integral para mais fibras'
-        ]
-    }
-    
-    return mock_analysis
+# Cada stream aberto ocupa uma thread do worker (gunicorn com gthread, ver Procfile;
+# em workers síncronos ocuparia o worker inteiro). A conexão dura no máximo
+# EVENTS_MAX_SECONDS e o cliente reconecta após EVENTS_RETRY_MS
+EVENTS_MAX_SECONDS = 20
+EVENTS_RETRY_MS = 2000
 
 @meals_bp.route('/analyze', methods=['POST'])
 @jwt_required()
 def analyze_meal():
-    """Analisa uma refeição através de imagem"""
+    """
+    Analisa uma refeição através de imagem.
+    Aceita multipart (campo `image`), corpo binário (image/*) ou JSON com base64 (legado).
+    Com ?async=1 a análise é enfileirada e a resposta é 202 com o job; o resultado
+    sai em GET /analyze/<id> ou pelo stream GET /analyze/<id>/events.
+    """
     try:
         current_user_id = get_jwt_identity()
-        data = request.get_json()
         
-        if not data.get('image'):
-            return jsonify({'message': 'Imagem é obrigatória'}), 400
+        try:
+            image_file, fields = images.read_upload(request)
+        except images.InvalidImage as e:
+            return jsonify({'message': str(e)}), 400
         
-        meal_type = data.get('meal_type', 'snack')
+        meal_type = fields.get('meal_type', 'snack')
         
         # Validar tipo de refeição
         try:
             meal_type_enum = MealType(meal_type)
         except ValueError:
+            image_file.close()
             return jsonify({'message': 'Tipo de refeição inválido'}), 400
         
-        # Processar imagem (simulado)
+        # Decodificar direto na resolução de trabalho do modelo
         try:
-            # Em uma implementação real, aqui processaríamos a imagem
-            image_data = data['image']
-            analysis_result = analyze_meal_image(image_data)
-            
-            return jsonify({
-                'message': 'Análise concluída com sucesso',
-                'analysis': analysis_result
-            }), 200
-            
-        except Exception as e:
+            image, processing = images.load_for_model(image_file)
+        except images.InvalidImage as e:
             return jsonify({'message': f'Erro ao processar imagem: {str(e)}'}), 400
+        except images.ImageBusy as e:
+            return jsonify({'message': str(e)}), 503
+        
+        current_app.logger.info('Análise de imagem: %s', processing)
+        
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            try:
+                job = analysis_jobs.enqueue(current_user_id, meal_type_enum.value, image)
+            except analysis_jobs.QueueFull as e:
+                response = jsonify({'message': str(e), 'retry_after': e.retry_after})
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 429
+            
+            response = jsonify({
+                'message': 'Análise enfileirada',
+                'job': job.to_dict(),
+                'status_url': f'/api/meals/analyze/{job.id}',
+                'events_url': f'/api/meals/analyze/{job.id}/events'
+            })
+            response.headers['Location'] = f'/api/meals/analyze/{job.id}'
+            return response, 202
+        
+        analysis_result = analyze_meal_image(image)
+        
+        return jsonify({
+            'message': 'Análise concluída com sucesso',
+            'analysis': analysis_result
+        }), 200
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
+@meals_bp.route('/analyze/<job_id>', methods=['GET'])
+@jwt_required()
+def get_analysis(job_id):
+    """Status e resultado de uma análise enfileirada"""
+    try:
+        current_user_id = get_jwt_identity()
+        job = analysis_jobs.get_job(job_id, current_user_id)
+        
+        if not job:
+            return jsonify({'message': 'Análise não encontrada'}), 404
+        
+        return jsonify({'job': job.to_dict()}), 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@meals_bp.route('/analyze/<job_id>/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def analysis_events(job_id):
+    """
+    Server-Sent Events com as mudanças de status da análise; encerra quando ela
+    termina ou após EVENTS_MAX_SECONDS (long-poll curto: o EventSource reconecta
+    sozinho pelo `retry:`). O id de cada evento é o status; na reconexão, o
+    Last-Event-ID evita reenviar o mesmo status e, com a análise concluída, a
+    resposta 204 encerra as reconexões. Aceita o token em ?jwt= porque o
+    EventSource não envia cabeçalhos.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        job = analysis_jobs.get_job(job_id, current_user_id)
+        if not job:
+            return jsonify({'message': 'Análise não encontrada'}), 404
+        
+        last_event_id = request.headers.get('Last-Event-ID')
+        if job.is_finished and last_event_id == job.status.value:
+            return '', 204
+        
+        def generate():
+            last_status = last_event_id
+            started = time.monotonic()
+            yield f'retry: {EVENTS_RETRY_MS}\n\n'
+            while time.monotonic() - started < EVENTS_MAX_SECONDS:
+                # Encerra a transação para enxergar o que o worker gravou
+                db.session.rollback()
+                job = analysis_jobs.get_job(job_id, current_user_id)
+                if job is None:
+                    return
+                
+                if job.status.value != last_status:
+                    last_status = job.status.value
+                    yield f'id: {last_status}\nevent: status\ndata: {json.dumps(job.to_dict())}\n\n'
+                    if job.is_finished:
+                        return
+                
+                time.sleep(analysis_jobs.POLL_INTERVAL_SECONDS)
+            # Tempo máximo atingido: libera o worker; o cliente reconecta ou consulta o status
+            yield 'event: timeout\ndata: {}\n\n'
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@meals_bp.route('/images', methods=['POST'])
+@jwt_required()
+def upload_meal_image():
+    """
+    Guarda a foto da refeição (mesmos formatos de envio do /analyze) e devolve as
+    URLs das renditions, que podem ir em `image_url` ao salvar a refeição.
+    """
+    try:
+        try:
+            image_file, _ = images.read_upload(request)
+            digest, created = image_store.store_upload(image_file)
+        except images.InvalidImage as e:
+            return jsonify({'message': str(e)}), 400
+        except images.ImageBusy as e:
+            return jsonify({'message': str(e)}), 503
+        
+        return jsonify({
+            'message': 'Imagem salva com sucesso',
+            'image': {'id': digest, 'urls': image_store.image_urls(digest)}
+        }), 201 if created else 200
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+@meals_bp.route('/images/<digest>/<rendition>', methods=['GET'])
+def get_meal_image(digest, rendition):
+    """Serve uma rendition; a URL é endereçada pelo conteúdo, então o cache é imutável"""
+    try:
+        return image_store.send_rendition(digest, rendition)
+    except image_store.ImageNotFound:
+        return jsonify({'message': 'Imagem não encontrada'}), 404
+
 @meals_bp.route('/', methods=['POST'])
 @jwt_required()
 def save_meal():
@@ -118,6 +203,10 @@ def save_meal():
         except ValueError:
             return jsonify({'message': 'Tipo de refeição inválido'}), 400
         
+        foods_data = data.get('foods') or []
+        if any(not normalize_food_name(food_data.get('name')) for food_data in foods_data):
+            return jsonify({'message': 'Nome do alimento é obrigatório'}), 400
+        
         # Criar refeição
         meal = Meal(
             user_id=current_user_id,
@@ -135,44 +224,67 @@ def save_meal():
         db.session.add(meal)
         db.session.flush()  # Para obter o ID da refeição
         
-        # Adicionar alimentos da refeição
-        foods_data = data.get('foods', [])
-        for food_data in foods_data:
-            # Buscar ou criar alimento
-            food = Food.query.filter_by(name=food_data['name']).first()
-            if not food:
-                food = Food(
-                    name=food_data['name'],
-                    calories_per_100g=food_data.get('calories_per_100g', 0),
-                    protein_per_100g=food_data.get('protein_per_100g', 0),
-                    carbs_per_100g=food_data.get('carbs_per_100g', 0),
-                    fat_per_100g=food_data.get('fat_per_100g', 0),
-                    fiber_per_100g=food_data.get('fiber_per_100g', 0),
-                    source_api='manual'
-                )
-                db.session.add(food)
-                db.session.flush()
-            
-            # Criar relação refeição-alimento
-            meal_food = MealFood(
-                meal_id=meal.id,
-                food_id=food.id,
-                quantity=food_data.get('quantity', 0),
-                unit=food_data.get('unit', 'g')
-            )
-            db.session.add(meal_food)
+        # Resolver todos os alimentos de uma vez (SELECT ... IN + INSERT multi-linha)
+        # e inserir as linhas da refeição em lote: número fixo de comandos por refeição
+        foods, new_foods = resolve_foods(foods_data)
+        used_food_ids = add_meal_foods(meal.id, foods_data, foods)
+        
+        # Atualizar consolidado diário e versão do dashboard na mesma transação
+        daily_stats.record_meal(meal)
+        invalidate_dashboard(current_user_id)
         
         db.session.commit()
         
+        # Índice de busca só recebe o que foi de fato persistido
+        food_search.food_index.add_foods(new_foods)
+        food_search.food_index.record_usage(used_food_ids)
+        
         return jsonify({
             'message': 'Refeição salva com sucesso',
-            'meal': meal.to_dict()
+            'meal': serialize_meals([meal])[0]
         }), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
+@meals_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def save_meals_batch():
+    """
+    Importa várias refeições de uma vez (sincronização de clientes offline).
+    Cada item tem o formato do POST /api/meals/ e, opcionalmente, `created_at`.
+    Itens inválidos são reportados sem impedir a importação dos demais.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        
+        items = data.get('meals')
+        if not isinstance(items, list) or not items:
+            return jsonify({'message': 'Lista de refeições é obrigatória'}), 400
+        if len(items) > MAX_BATCH_MEALS:
+            return jsonify({'message': f'Máximo de {MAX_BATCH_MEALS} refeições por lote'}), 400
+        
+        results, new_foods, used_food_ids = import_meals(int(current_user_id), items)
+        invalidate_dashboard(current_user_id)
+        db.session.commit()
+        
+        food_search.food_index.add_foods(new_foods)
+        food_search.food_index.record_usage(used_food_ids)
+        
+        created = sum(1 for result in results if result['status'] == 'created')
+        return jsonify({
+            'message': 'Importação concluída',
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
 @meals_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_meals():
@@ -184,8 +296,6 @@ def get_meals():
         date_from = request.args.get('date_from')
         date_to = request.args.get('date_to')
         meal_type = request.args.get('meal_type')
-        limit = int(request.args.get('limit', 20))
-        offset = int(request.args.get('offset', 0))
         
         # Construir query
         query = Meal.query.filter_by(user_id=current_user_id)
@@ -212,20 +322,16 @@ def get_meals():
             except ValueError:
                 return jsonify({'message': 'Tipo de refeição inválido'}), 400
         
-        # Ordenar por data (mais recente primeiro)
-        query = query.order_by(Meal.created_at.desc())
-        
-        # Paginação
-        meals = query.offset(offset).limit(limit).all()
-        total = query.count()
+        # Paginação por cursor em (created_at, id), mais recente primeiro
+        page = paginate(query, Meal.created_at, Meal.id, request.args)
         
         return jsonify({
-            'meals': [meal.to_dict() for meal in meals],
-            'total': total,
-            'limit': limit,
-            'offset': offset
+            'meals': serialize_meals(page.items),
+            **page.meta()
         }), 200
         
+    except InvalidCursor:
+        return jsonify({'message': 'Cursor de paginação inválido'}), 400
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
@@ -240,7 +346,7 @@ def get_meal(meal_id):
         if not meal:
             return jsonify({'message': 'Refeição não encontrada'}), 404
         
-        return jsonify({'meal': meal.to_dict()}), 200
+        return jsonify({'meal': serialize_meals([meal])[0]}), 200
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
@@ -256,6 +362,8 @@ def delete_meal(meal_id):
         if not meal:
             return jsonify({'message': 'Refeição não encontrada'}), 404
         
+        daily_stats.remove_meal(meal)
+        invalidate_dashboard(current_user_id)
         db.session.delete(meal)
         db.session.commit()
         
@@ -280,38 +388,29 @@ def get_nutrition_summary():
         except ValueError:
             return jsonify({'message': 'Data inválida. Use formato YYYY-MM-DD'}), 400
         
-        # Buscar refeições do dia
-        meals = Meal.query.filter(
-            Meal.user_id == current_user_id,
-            db.func.date(Meal.created_at) == target_date
-        ).all()
-        
-        # Calcular totais
-        total_calories = sum(meal.total_calories or 0 for meal in meals)
-        total_protein = sum(meal.total_protein or 0 for meal in meals)
-        total_carbs = sum(meal.total_carbs or 0 for meal in meals)
-        total_fat = sum(meal.total_fat or 0 for meal in meals)
-        total_fiber = sum(meal.total_fiber or 0 for meal in meals)
+        # Totais do dia a partir do consolidado diário (uma linha)
+        day_stats = daily_stats.get_day(current_user_id, target_date)
+        total_calories = day_stats['total_calories']
         
         # Buscar meta calórica do usuário
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         daily_goal = user.profile.daily_calorie_goal if user.profile else 2000
         
         return jsonify({
             'date': target_date.isoformat(),
             'summary': {
                 'total_calories': total_calories,
-                'total_protein': total_protein,
-                'total_carbs': total_carbs,
-                'total_fat': total_fat,
-                'total_fiber': total_fiber,
+                'total_protein': day_stats['total_protein'],
+                'total_carbs': day_stats['total_carbs'],
+                'total_fat': day_stats['total_fat'],
+                'total_fiber': day_stats['total_fiber'],
                 'daily_calorie_goal': daily_goal,
                 'calorie_progress': (total_calories / daily_goal * 100) if daily_goal > 0 else 0,
-                'meals_count': len(meals)
+                'meals_count': day_stats['meals_count']
             },
             'meals_by_type': {
-                meal_type.value: len([m for m in meals if m.meal_type == meal_type])
-                for meal_type in MealType
+                meal_type.value: day_stats[column]
+                for meal_type, column in daily_stats.MEAL_TYPE_COLUMNS.items()
             }
         }), 200
         
@@ -329,10 +428,8 @@ def search_foods():
         if not query:
             return jsonify({'message': 'Termo de busca é obrigatório'}), 400
         
-        # Buscar alimentos
-        foods = Food.query.filter(
-            Food.name.ilike(f'%{query}%')
-        ).limit(limit).all()
+        # Buscar alimentos no índice em memória (sem acentos, ranqueado por uso)
+        foods = food_search.search_foods(query, limit)
         
         return jsonify({
             'foods': [food.to_dict() for food in foods],
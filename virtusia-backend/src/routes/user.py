@@ -1,12 +1,15 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_current_user
 from datetime import datetime, timezone, date, timedelta
 import json
 
-from src.models.user import db, User, UserProfile, Gender, ActivityLevel
+from src.models.user import db, UserProfile, Gender, ActivityLevel
 from src.models.meal import Meal
 from src.models.exercise import UserExercise
 from src.models.goal import Goal, GoalStatus
+from src.services import daily_stats, export, dashboard
+from src.services.recommendation_training import stored_recommendations
+from src.services.current_user import load_user_for_update, invalidate_user
 
 user_bp = Blueprint('user', __name__)
 
@@ -15,8 +18,7 @@ user_bp = Blueprint('user', __name__)
 def get_profile():
     """Obtém perfil completo do usuário"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = get_current_user()
         
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
@@ -31,6 +33,7 @@ def get_profile():
             profile = UserProfile(user_id=user.id)
             db.session.add(profile)
             db.session.commit()
+            invalidate_user(user.id)
             user_data['profile'] = profile.to_dict()
         
         return jsonify({'user': user_data}), 200
@@ -46,7 +49,7 @@ def update_profile():
         current_user_id = get_jwt_identity()
         data = request.get_json()
         
-        user = User.query.get(current_user_id)
+        user = load_user_for_update(current_user_id)
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
@@ -102,8 +105,10 @@ def update_profile():
         
         user.updated_at = datetime.now(timezone.utc)
         profile.updated_at = datetime.now(timezone.utc)
+        dashboard.invalidate_dashboard(user.id)
         
         db.session.commit()
+        invalidate_user(user.id)
         
         return jsonify({
             'message': 'Perfil atualizado com sucesso',
@@ -120,108 +125,21 @@ def get_dashboard():
     """Obtém dados do dashboard principal"""
     try:
         current_user_id = get_jwt_identity()
-        today = date.today()
         
-        # Buscar usuário
-        user = User.query.get(current_user_id)
-        if not user:
+        # Resposta em cache por usuário; recalculada quando a versão dos dados muda
+        version, body = dashboard.cached_dashboard(current_user_id)
+        if body is None:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
-        # Progresso calórico do dia
-        today_meals = Meal.query.filter(
-            Meal.user_id == current_user_id,
-            db.func.date(Meal.created_at) == today
-        ).all()
-        
-        total_calories_today = sum(meal.total_calories or 0 for meal in today_meals)
-        daily_goal = user.profile.daily_calorie_goal if user.profile else 2000
-        calorie_progress = (total_calories_today / daily_goal * 100) if daily_goal > 0 else 0
-        
-        # Exercícios da semana
-        week_start = today - timedelta(days=today.weekday())
-        week_exercises = UserExercise.query.filter(
-            UserExercise.user_id == current_user_id,
-            UserExercise.completed_at >= week_start
-        ).count()
-        
-        # Metas ativas
-        active_goals = Goal.query.filter_by(
-            user_id=current_user_id,
-            status=GoalStatus.ACTIVE
-        ).limit(3).all()
-        
-        # Refeições recentes
-        recent_meals = Meal.query.filter_by(
-            user_id=current_user_id
-        ).order_by(Meal.created_at.desc()).limit(5).all()
-        
-        # Próximos exercícios (simulado)
-        upcoming_exercises = [
-            {
-                'name': 'Treino de Força',
-                'scheduled_time': '18:00',
-                'duration': 45,
-                'type': 'strength'
-            },
-            {
-                'name': 'Caminhada',
-                'scheduled_time': '07:00',
-                'duration': 30,
-                'type': 'cardio'
-            }
-        ]
-        
-        # Estatísticas da semana
-        week_stats = {
-            'calories_consumed': sum(
-                meal.total_calories or 0 
-                for meal in Meal.query.filter(
-                    Meal.user_id == current_user_id,
-                    Meal.created_at >= week_start
-                ).all()
-            ),
-            'exercises_completed': week_exercises,
-            'goals_on_track': len([g for g in active_goals if g.calculate_progress_percentage() >= 50])
-        }
-        
-        return jsonify({
-            'user': {
-                'name': f"{user.first_name} {user.last_name}",
-                'id': user.id
-            },
-            'daily_progress': {
-                'calories': {
-                    'consumed': total_calories_today,
-                    'goal': daily_goal,
-                    'percentage': min(100, calorie_progress)
-                },
-                'meals_logged': len(today_meals),
-                'water_intake': 1.5,  # Simulado - em litros
-                'steps': 8500  # Simulado
-            },
-            'recent_meals': [meal.to_dict() for meal in recent_meals],
-            'upcoming_exercises': upcoming_exercises,
-            'active_goals': [goal.to_dict() for goal in active_goals],
-            'week_stats': week_stats,
-            'motivational_message': get_motivational_message(calorie_progress, week_exercises)
-        }), 200
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(f'{current_user_id}-{version[0]}-{version[1]}')
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
-def get_motivational_message(calorie_progress, week_exercises):
-    """Gera mensagem motivacional baseada no progresso"""
-    if calorie_progress >= 90:
-        return "Excelente! Você está muito próximo da sua meta calórica diária! 🎯"
-    elif calorie_progress >= 70:
-        return "Ótimo progresso! Continue assim para atingir sua meta! 💪"
-    elif week_exercises >= 3:
-        return "Parabéns pelos exercícios desta semana! Que tal focar na alimentação agora? 🥗"
-    elif week_exercises >= 1:
-        return "Bom trabalho com os exercícios! Vamos manter o ritmo! 🏃‍♀️"
-    else:
-        return "Um novo dia, uma nova oportunidade! Vamos começar com uma refeição saudável? 🌟"
-
 @user_bp.route('/stats', methods=['GET'])
 @jwt_required()
 def get_user_stats():
@@ -229,76 +147,122 @@ def get_user_stats():
     try:
         current_user_id = get_jwt_identity()
         
-        # Parâmetros de consulta
-        period = request.args.get('period', 'month')  # week, month, year
-        
-        # Calcular período
-        today = date.today()
-        if period == 'week':
-            start_date = today - timedelta(days=today.weekday())
-            end_date = today
-        elif period == 'month':
-            start_date = today.replace(day=1)
-            end_date = today
-        elif period == 'year':
-            start_date = today.replace(month=1, day=1)
-            end_date = today
-        else:
-            return jsonify({'message': 'Período inválido. Use: week, month, year'}), 400
-        
-        # Estatísticas de refeições
-        meals = Meal.query.filter(
-            Meal.user_id == current_user_id,
-            db.func.date(Meal.created_at) >= start_date,
-            db.func.date(Meal.created_at) <= end_date
-        ).all()
-        
-        total_calories = sum(meal.total_calories or 0 for meal in meals)
-        avg_health_score = sum(meal.health_score or 0 for meal in meals) / len(meals) if meals else 0
-        
-        # Estatísticas de exercícios
-        exercises = UserExercise.query.filter(
-            UserExercise.user_id == current_user_id,
-            db.func.date(UserExercise.completed_at) >= start_date,
-            db.func.date(UserExercise.completed_at) <= end_date
-        ).all()
-        
-        total_exercise_time = sum(ex.duration_minutes or 0 for ex in exercises)
-        total_calories_burned = sum(ex.calories_burned or 0 for ex in exercises)
-        
-        # Estatísticas de metas
-        goals = Goal.query.filter_by(user_id=current_user_id).all()
-        completed_goals = len([g for g in goals if g.status == GoalStatus.COMPLETED])
-        active_goals = len([g for g in goals if g.status == GoalStatus.ACTIVE])
+        # Parâmetros de consulta: period (week, month, year) ou start_date/end_date
+        try:
+            period, start_date, end_date = daily_stats.resolve_period(
+                request.args.get('period'), request.args.get('start_date'), request.args.get('end_date')
+            )
+        except daily_stats.InvalidPeriod as e:
+            return jsonify({'message': str(e)}), 400
+        
+        # Período atual e anterior (mesmo tamanho) numa varredura do consolidado diário
+        previous_start, previous_end = daily_stats.previous_range(start_date, end_date)
+        totals, previous_totals = daily_stats.compare_ranges(current_user_id, start_date, end_date, previous_start)
+        days = (end_date - start_date).days + 1
+        current = summarize_period(totals, days)
+        previous = summarize_period(previous_totals, days)
+        
+        # Estatísticas de metas (contagem por status no banco)
+        goal_counts = dict(db.session.query(Goal.status, db.func.count(Goal.id)).filter(
+            Goal.user_id == current_user_id
+        ).group_by(Goal.status).all())
+        total_goals = sum(goal_counts.values())
+        completed_goals = goal_counts.get(GoalStatus.COMPLETED, 0)
+        active_goals = goal_counts.get(GoalStatus.ACTIVE, 0)
         
         return jsonify({
             'period': period,
             'start_date': start_date.isoformat(),
             'end_date': end_date.isoformat(),
-            'nutrition': {
-                'total_calories_consumed': total_calories,
-                'meals_logged': len(meals),
-                'average_health_score': round(avg_health_score, 1),
-                'calories_per_day': round(total_calories / max((end_date - start_date).days + 1, 1), 1)
-            },
-            'fitness': {
-                'total_exercise_time': total_exercise_time,
-                'total_calories_burned': total_calories_burned,
-                'exercises_completed': len(exercises),
-                'avg_exercise_duration': round(total_exercise_time / len(exercises), 1) if exercises else 0
-            },
+            **current,
             'goals': {
-                'total_goals': len(goals),
+                'total_goals': total_goals,
                 'completed_goals': completed_goals,
                 'active_goals': active_goals,
-                'completion_rate': round(completed_goals / len(goals) * 100, 1) if goals else 0
+                'completion_rate': round(completed_goals / total_goals * 100, 1) if total_goals else 0
+            },
+            'overall_score': calculate_overall_score(
+                current['nutrition']['average_health_score'], current['fitness']['exercises_completed'], completed_goals
+            ),
+            'previous_period': {
+                'start_date': previous_start.isoformat(),
+                'end_date': previous_end.isoformat(),
+                **previous
             },
-            'overall_score': calculate_overall_score(avg_health_score, len(exercises), completed_goals)
+            'changes': period_changes(current, previous)
         }), 200
         
     except Exception as e:
         return jsonify({'message': f'Erro interno: {str(e)}'}), 500
 
+@user_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_account():
+    """
+    Exporta o histórico completo do usuário (portabilidade de dados) em gzip.
+    format=ndjson (padrão, todas as entidades) ou csv (exige entity=...).
+    A resposta é gerada em streaming com memória constante.
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        fmt = request.args.get('format', 'ndjson')
+        
+        try:
+            entities = export.resolve_entities(fmt, request.args.get('entity'))
+        except export.InvalidExport as e:
+            return jsonify({'message': str(e)}), 400
+        
+        filename = export.export_filename(fmt, entities)
+        return Response(
+            stream_with_context(export.export_user(current_user_id, fmt, entities)),
+            mimetype='application/gzip',
+            headers={
+                'Content-Disposition': f'attachment; filename="{filename}"',
+                'Cache-Control': 'no-store',
+                'X-Accel-Buffering': 'no'
+            }
+        )
+        
+    except Exception as e:
+        return jsonify({'message': f'Erro interno: {str(e)}'}), 500
+
+def summarize_period(totals, days):
+    """Estatísticas de nutrição e atividade a partir dos totais do consolidado"""
+    meals_logged = totals['meals_count']
+    exercises_completed = totals['exercises_count']
+    total_exercise_time = totals['exercise_minutes']
+    return {
+        'nutrition': {
+            'total_calories_consumed': totals['total_calories'],
+            'total_protein': totals['total_protein'],
+            'total_carbs': totals['total_carbs'],
+            'total_fat': totals['total_fat'],
+            'total_fiber': totals['total_fiber'],
+            'meals_logged': meals_logged,
+            # Média sobre todas as refeições: as sem nota contam como 0
+            'average_health_score': round(totals['health_score_sum'] / meals_logged, 1) if meals_logged else 0,
+            'calories_per_day': round(totals['total_calories'] / max(days, 1), 1)
+        },
+        'fitness': {
+            'total_exercise_time': total_exercise_time,
+            'total_calories_burned': totals['calories_burned'],
+            'exercises_completed': exercises_completed,
+            'avg_exercise_duration': round(total_exercise_time / exercises_completed, 1) if exercises_completed else 0,
+            'net_calories': round(totals['total_calories'] - totals['calories_burned'], 1)
+        }
+    }
+
+def period_changes(current, previous):
+    """Variação percentual de cada métrica em relação ao período anterior (None sem base)"""
+    changes = {}
+    for section, values in current.items():
+        changes[section] = {
+            key: round((value - previous[section][key]) / abs(previous[section][key]) * 100, 1)
+            if previous[section][key] else None
+            for key, value in values.items()
+        }
+    return changes
+
 def calculate_overall_score(health_score, exercise_count, completed_goals):
     """Calcula pontuação geral do usuário"""
     # Fórmula simples para demonstração
@@ -315,8 +279,8 @@ def get_user_recommendations():
     try:
         current_user_id = get_jwt_identity()
         
-        # Buscar usuário e dados recentes
-        user = User.query.get(current_user_id)
+        # Usuário (com perfil) já carregado pelo token; dados recentes
+        user = get_current_user()
         if not user:
             return jsonify({'message': 'Usuário não encontrado'}), 404
         
@@ -393,8 +357,12 @@ def get_user_recommendations():
                     'action': 'weight_loss_plan'
                 })
         
+        # Sugestões do modelo colaborativo (pré-calculadas pelo job train-recommendations)
+        personalized = [recommendation.to_dict() for recommendation in stored_recommendations(current_user_id)]
+        
         return jsonify({
             'recommendations': recommendations,
+            'personalized': personalized,
             'total': len(recommendations),
             'generated_at': datetime.now(timezone.utc).isoformat()
         }), 200
@@ -0,0 +1,210 @@
+import io
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, timezone
+
+from src.models.user import db
+from src.models.analysis import AnalysisJob, AnalysisJobStatus
+from src.services.meal_analysis import analyze_image_bytes
+from src.services.sql import transaction_lock
+
+MAX_QUEUED_JOBS = int(os.getenv('ANALYSIS_MAX_QUEUED', 200))
+MAX_JOBS_PER_USER = int(os.getenv('ANALYSIS_MAX_PER_USER', 3))
+WORKER_PROCESSES = int(os.getenv('ANALYSIS_WORKER_PROCESSES', 2))
+RETRY_AFTER_SECONDS = 5
+ESTIMATED_JOB_SECONDS = 2
+JOB_TIMEOUT_SECONDS = 120  # "running" há mais tempo que isso: worker morreu, volta para a fila
+MAX_ATTEMPTS = 3
+POLL_INTERVAL_SECONDS = 0.5
+MAINTENANCE_INTERVAL_SECONDS = 30
+FINISHED_RETENTION = timedelta(days=7)
+WORKING_IMAGE_QUALITY = 90
+ENQUEUE_LOCK_KEY = 0x616E616C  # trava da admissão na fila (contagem + inserção)
+
+ACTIVE_STATUSES = (AnalysisJobStatus.QUEUED, AnalysisJobStatus.RUNNING)
+
+class QueueFull(Exception):
+    """Fila cheia ou limite por usuário atingido; o cliente deve tentar depois"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def encode_working_image(image):
+    """Serializa a imagem já reduzida para guardar no job"""
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=WORKING_IMAGE_QUALITY)
+    return buffer.getvalue()
+
+def enqueue(user_id, meal_type, image):
+    """
+    Enfileira uma análise; levanta QueueFull se o usuário já tem MAX_JOBS_PER_USER
+    análises pendentes ou se a fila global passou de MAX_QUEUED_JOBS. A contagem e a
+    inserção rodam sob uma trava da transação, então posts simultâneos não furam os limites.
+    """
+    image_data = encode_working_image(image)
+
+    transaction_lock(ENQUEUE_LOCK_KEY)
+    user_active = AnalysisJob.query.filter(
+        AnalysisJob.user_id == user_id,
+        AnalysisJob.status.in_(ACTIVE_STATUSES)
+    ).count()
+    if user_active >= MAX_JOBS_PER_USER:
+        db.session.rollback()
+        raise QueueFull('Limite de análises simultâneas por usuário atingido', RETRY_AFTER_SECONDS)
+
+    queued = AnalysisJob.query.filter_by(status=AnalysisJobStatus.QUEUED).count()
+    if queued >= MAX_QUEUED_JOBS:
+        db.session.rollback()
+        # Tempo estimado para o pool escoar a fila atual
+        retry_after = max(RETRY_AFTER_SECONDS, math.ceil(queued * ESTIMATED_JOB_SECONDS / WORKER_PROCESSES))
+        raise QueueFull('Fila de análises cheia, tente novamente em instantes', retry_after)
+
+    job = AnalysisJob(user_id=user_id, meal_type=meal_type, image_data=image_data)
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def get_job(job_id, user_id):
+    """Job do usuário, lido do banco sem cache da sessão"""
+    return AnalysisJob.query.filter_by(id=job_id, user_id=user_id).populate_existing().first()
+
+def claim_jobs(limit):
+    """
+    Marca até `limit` jobs da fila como em execução e os retorna como (id, imagem).
+    No PostgreSQL usa FOR UPDATE SKIP LOCKED; o UPDATE condicionado ao status evita
+    que dois workers peguem o mesmo job nos demais bancos.
+    """
+    candidates = AnalysisJob.query.with_entities(AnalysisJob.id).filter_by(
+        status=AnalysisJobStatus.QUEUED
+    ).order_by(AnalysisJob.created_at).limit(limit).with_for_update(skip_locked=True).all()
+
+    table = AnalysisJob.__table__
+    now = _now()
+    claimed_ids = []
+    for (job_id,) in candidates:
+        claimed = db.session.execute(
+            table.update().where(
+                table.c.id == job_id,
+                table.c.status == AnalysisJobStatus.QUEUED
+            ).values(status=AnalysisJobStatus.RUNNING, started_at=now, attempts=table.c.attempts + 1)
+        ).rowcount
+        if claimed:
+            claimed_ids.append(job_id)
+    db.session.commit()
+
+    if not claimed_ids:
+        return []
+    rows = db.session.query(AnalysisJob.id, AnalysisJob.image_data).filter(AnalysisJob.id.in_(claimed_ids)).all()
+    db.session.commit()
+    return rows
+
+def finish_job(job_id, result=None, error=None):
+    """Grava o resultado (ou o erro) e descarta a imagem do job"""
+    AnalysisJob.query.filter_by(id=job_id).update({
+        'status': AnalysisJobStatus.FAILED if error else AnalysisJobStatus.DONE,
+        'result': json.dumps(result) if result is not None else None,
+        'error': error,
+        'image_data': None,
+        'finished_at': _now()
+    }, synchronize_session=False)
+    db.session.commit()
+
+def requeue_jobs(job_ids):
+    """Devolve jobs à fila (ex.: o pool de processos quebrou no meio da execução)"""
+    if not job_ids:
+        return
+    AnalysisJob.query.filter(AnalysisJob.id.in_(job_ids)).update(
+        {'status': AnalysisJobStatus.QUEUED, 'started_at': None}, synchronize_session=False
+    )
+    db.session.commit()
+
+def recover_stale_jobs():
+    """
+    Jobs "running" além do tempo limite (worker reiniciado ou morto) voltam para a
+    fila; após MAX_ATTEMPTS tentativas são marcados como falha. Retorna quantos mudaram.
+    """
+    cutoff = _now() - timedelta(seconds=JOB_TIMEOUT_SECONDS)
+    stale = AnalysisJob.query.filter(
+        AnalysisJob.status == AnalysisJobStatus.RUNNING,
+        AnalysisJob.started_at < cutoff
+    )
+    failed = stale.filter(AnalysisJob.attempts >= MAX_ATTEMPTS).update({
+        'status': AnalysisJobStatus.FAILED,
+        'error': 'Tempo limite de análise excedido',
+        'image_data': None,
+        'finished_at': _now()
+    }, synchronize_session=False)
+    requeued = stale.filter(AnalysisJob.attempts < MAX_ATTEMPTS).update(
+        {'status': AnalysisJobStatus.QUEUED, 'started_at': None}, synchronize_session=False
+    )
+    db.session.commit()
+    return failed + requeued
+
+def purge_finished_jobs():
+    """Remove jobs concluídos há mais de FINISHED_RETENTION"""
+    deleted = AnalysisJob.query.filter(
+        AnalysisJob.status.in_((AnalysisJobStatus.DONE, AnalysisJobStatus.FAILED)),
+        AnalysisJob.finished_at < _now() - FINISHED_RETENTION
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+def run_worker(processes, burst=False, log=print):
+    """
+    Consome a fila com um pool de `processes` processos. O processo principal só
+    reivindica jobs e grava resultados; a inferência roda nos filhos (spawn, sem
+    herdar conexões do banco). Com `burst`, termina quando a fila esvazia.
+    """
+    context = multiprocessing.get_context('spawn')
+    last_maintenance = 0.0
+    processed = 0
+
+    while True:
+        pool = ProcessPoolExecutor(max_workers=processes, mp_context=context)
+        inflight = {}
+        try:
+            while True:
+                if time.monotonic() - last_maintenance > MAINTENANCE_INTERVAL_SECONDS:
+                    recovered = recover_stale_jobs()
+                    if recovered:
+                        log(f'{recovered} jobs presos recuperados')
+                    purge_finished_jobs()
+                    last_maintenance = time.monotonic()
+
+                free = processes - len(inflight)
+                if free > 0:
+                    for job_id, image_data in claim_jobs(free):
+                        inflight[pool.submit(analyze_image_bytes, image_data)] = job_id
+
+                if not inflight:
+                    if burst:
+                        return processed
+                    time.sleep(POLL_INTERVAL_SECONDS)
+                    continue
+
+                done, _ = wait(inflight, timeout=POLL_INTERVAL_SECONDS, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = inflight[future]
+                    try:
+                        finish_job(job_id, result=future.result())
+                    except BrokenProcessPool:
+                        raise
+                    except Exception as e:
+                        finish_job(job_id, error=str(e))
+                    del inflight[future]
+                    processed += 1
+        except BrokenProcessPool:
+            # Um filho morreu (ex.: OOM); devolve os jobs em andamento e recria o pool
+            log('Pool de análise quebrou; recriando')
+            requeue_jobs(list(inflight.values()))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,38 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_SIZE = 4096
+
+class VersionedCache:
+    """
+    LRU em memória em que cada entrada guarda a versão dos dados com que foi
+    calculada. Se a versão atual for outra, a entrada é recalculada na leitura;
+    nada precisa ser apagado explicitamente quando os dados mudam.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key, version, compute):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+        value = compute()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def discard(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
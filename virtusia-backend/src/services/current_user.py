@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from src.models.user import db, User, UserProfile
+
+CACHE_TTL_SECONDS = float(os.getenv('CURRENT_USER_TTL_SECONDS', 30))
+CACHE_SIZE = int(os.getenv('CURRENT_USER_CACHE_SIZE', 10000))
+
+def _columns(instance):
+    return {attribute.key: getattr(instance, attribute.key) for attribute in db.inspect(type(instance)).column_attrs}
+
+class UserCache:
+    """
+    LRU com TTL das colunas de usuário e perfil, por worker. Guarda valores e não
+    instâncias do ORM: a cada uso elas são recriadas e anexadas à sessão da
+    requisição sem consulta. Escritas neste worker invalidam na hora; nos demais,
+    a entrada vence em CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, size=CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1], entry[2]
+
+    def put(self, user_id, user_values, profile_values):
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, user_values, profile_values)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+user_cache = UserCache()
+
+def _attach(model, values):
+    """Instância persistente montada a partir de valores em cache, sem ir ao banco"""
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    db.session.add(instance)
+    return instance
+
+def _fetch(user_id):
+    """Usuário e perfil numa consulta só (JOIN); guarda os valores no cache"""
+    user = db.session.query(User).options(joinedload(User.profile)).filter(User.id == user_id).first()
+    if user is not None:
+        user_cache.put(user_id, _columns(user), _columns(user.profile) if user.profile else None)
+    return user
+
+def _load(user_id):
+    existing = db.session.identity_map.get(identity_key(User, user_id))
+    if existing is not None:
+        return existing
+    cached = user_cache.get(user_id)
+    if cached is None:
+        return _fetch(user_id)
+
+    user_values, profile_values = cached
+    user = _attach(User, user_values)
+    profile = None
+    if profile_values is not None:
+        profile = db.session.identity_map.get(identity_key(UserProfile, profile_values['id']))
+        if profile is None:
+            profile = _attach(UserProfile, profile_values)
+        set_committed_value(profile, 'user', user)
+    set_committed_value(user, 'profile', profile)
+    return user
+
+def load_current_user(identity):
+    """
+    Usuário do token (com perfil já carregado), memorizado na requisição e em
+    cache entre requisições. None se o usuário não existir.
+    """
+    user_id = int(identity)
+    loaded = g.setdefault('_current_users', {})
+    if user_id not in loaded:
+        loaded[user_id] = _load(user_id)
+    return loaded[user_id]
+
+def load_user_for_update(user_id):
+    """Usuário e perfil relidos do banco (ignora o cache), para rotas que alteram dados"""
+    return db.session.get(User, int(user_id), options=[joinedload(User.profile)], populate_existing=True)
+
+def invalidate_user(user_id):
+    """Descarta o usuário do cache deste worker (chamar depois do commit)"""
+    user_cache.discard(int(user_id))
+    g.pop('_current_users', None)
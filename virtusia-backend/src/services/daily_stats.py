@@ -0,0 +1,240 @@
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from src.models.user import db
+from src.models.meal import Meal, MealType
+from src.models.exercise import UserExercise
+from src.models.stats import UserDailyStats
+from src.services.sql import upsert_increment, update_increment
+
+NUTRITION_COLUMNS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat', 'total_fiber')
+MEAL_TYPE_COLUMNS = {meal_type: f'{meal_type.value}_count' for meal_type in MealType}
+MEAL_COLUMNS = NUTRITION_COLUMNS + ('health_score_sum', 'health_score_count', 'meals_count') + tuple(MEAL_TYPE_COLUMNS.values())
+EXERCISE_COLUMNS = ('exercise_minutes', 'calories_burned', 'exercises_count')
+SUM_COLUMNS = MEAL_COLUMNS + EXERCISE_COLUMNS
+
+PERIODS = ('week', 'month', 'year')
+MAX_RANGE_DAYS = 366
+REBUILD_CHUNK_SIZE = 1000
+
+class InvalidPeriod(ValueError):
+    """Período ou intervalo de datas inválido"""
+
+def meal_day(meal):
+    """Dia (UTC) ao qual a refeição pertence"""
+    return (meal.created_at or datetime.now(timezone.utc)).date()
+
+def row_increments(values, sign=1):
+    """Incrementos de uma refeição dada como dicionário de colunas (inclui meal_type)"""
+    increments = {column: sign * (values.get(column) or 0) for column in NUTRITION_COLUMNS}
+    increments['health_score_sum'] = sign * (values.get('health_score') or 0)
+    increments['health_score_count'] = sign * (values.get('health_score') is not None)
+    increments['meals_count'] = sign
+    increments[MEAL_TYPE_COLUMNS[values['meal_type']]] = sign
+    return increments
+
+def meal_increments(meal, sign=1):
+    """Incrementos que uma refeição aplica na linha diária do usuário"""
+    values = {column: getattr(meal, column) for column in NUTRITION_COLUMNS + ('health_score', 'meal_type')}
+    return row_increments(values, sign)
+
+def record_meal(meal):
+    """Soma uma refeição recém-criada no consolidado (mesma transação)"""
+    upsert_increment(
+        UserDailyStats.__table__,
+        {'user_id': meal.user_id, 'date': meal_day(meal)},
+        meal_increments(meal),
+        {'updated_at': datetime.now(timezone.utc)}
+    )
+
+def record_meal_rows(rows):
+    """
+    Soma várias refeições recém-inseridas (dicionários de colunas com user_id e
+    created_at) no consolidado: um upsert por usuário e dia, não por refeição.
+    """
+    totals = {}
+    for row in rows:
+        increments = totals.setdefault((row['user_id'], row['created_at'].date()), Counter())
+        increments.update(row_increments(row))
+    now = datetime.now(timezone.utc)
+    for (user_id, day), increments in totals.items():
+        upsert_increment(UserDailyStats.__table__, {'user_id': user_id, 'date': day}, dict(increments), {'updated_at': now})
+
+def remove_meal(meal):
+    """Subtrai uma refeição excluída do consolidado (mesma transação)"""
+    update_increment(
+        UserDailyStats.__table__,
+        {'user_id': meal.user_id, 'date': meal_day(meal)},
+        meal_increments(meal, sign=-1),
+        {'updated_at': datetime.now(timezone.utc)}
+    )
+
+def exercise_day(user_exercise):
+    """Dia (UTC) ao qual o exercício pertence"""
+    return (user_exercise.completed_at or datetime.now(timezone.utc)).date()
+
+def record_exercise(user_exercise):
+    """Soma um exercício recém-registrado no consolidado (mesma transação)"""
+    upsert_increment(
+        UserDailyStats.__table__,
+        {'user_id': int(user_exercise.user_id), 'date': exercise_day(user_exercise)},
+        {
+            'exercise_minutes': user_exercise.duration_minutes or 0,
+            'calories_burned': user_exercise.calories_burned or 0,
+            'exercises_count': 1
+        },
+        {'updated_at': datetime.now(timezone.utc)}
+    )
+
+def get_day(user_id, day):
+    """Retorna os totais de um dia como dicionário (zeros se não houver linha)"""
+    row = UserDailyStats.query.filter_by(user_id=user_id, date=day).first()
+    if not row:
+        return dict.fromkeys(SUM_COLUMNS, 0)
+    return {column: getattr(row, column) for column in SUM_COLUMNS}
+
+def sum_range(user_id, start_date, end_date):
+    """Soma os totais diários de um intervalo fechado de datas"""
+    columns = [db.func.coalesce(db.func.sum(getattr(UserDailyStats, column)), 0) for column in SUM_COLUMNS]
+    row = db.session.query(*columns).filter(
+        UserDailyStats.user_id == user_id,
+        UserDailyStats.date >= start_date,
+        UserDailyStats.date <= end_date
+    ).one()
+    return dict(zip(SUM_COLUMNS, row))
+
+def resolve_period(period=None, start_date=None, end_date=None, today=None):
+    """
+    Valida o período pedido. Retorna (nome, início, fim): week, month ou year até
+    hoje, ou custom com start_date/end_date (YYYY-MM-DD, no máximo 366 dias).
+    """
+    today = today or date.today()
+    if start_date or end_date:
+        if not (start_date and end_date):
+            raise InvalidPeriod('Informe start_date e end_date')
+        try:
+            start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+        except ValueError:
+            raise InvalidPeriod('Data inválida. Use formato YYYY-MM-DD')
+        if end < start:
+            raise InvalidPeriod('end_date deve ser igual ou posterior a start_date')
+        if (end - start).days + 1 > MAX_RANGE_DAYS:
+            raise InvalidPeriod(f'O intervalo deve ter no máximo {MAX_RANGE_DAYS} dias')
+        return 'custom', start, end
+
+    period = period or 'month'
+    if period == 'week':
+        return period, today - timedelta(days=today.weekday()), today
+    if period == 'month':
+        return period, today.replace(day=1), today
+    if period == 'year':
+        return period, today.replace(month=1, day=1), today
+    raise InvalidPeriod(f'Período inválido. Use: {", ".join(PERIODS)}')
+
+def previous_range(start_date, end_date):
+    """Intervalo de mesmo tamanho imediatamente anterior"""
+    length = end_date - start_date + timedelta(days=1)
+    return start_date - length, start_date - timedelta(days=1)
+
+def compare_ranges(user_id, start_date, end_date, previous_start):
+    """
+    Totais do intervalo e do período anterior (de previous_start até a véspera de
+    start_date) numa só varredura das linhas diárias. Retorna (atual, anterior).
+    """
+    current = UserDailyStats.date >= start_date
+    columns = []
+    for column in SUM_COLUMNS:
+        value = getattr(UserDailyStats, column)
+        columns.append(db.func.coalesce(db.func.sum(db.case((current, value), else_=0)), 0))
+        columns.append(db.func.coalesce(db.func.sum(db.case((current, 0), else_=value)), 0))
+    row = db.session.query(*columns).filter(
+        UserDailyStats.user_id == user_id,
+        UserDailyStats.date >= previous_start,
+        UserDailyStats.date <= end_date
+    ).one()
+    return dict(zip(SUM_COLUMNS, row[0::2])), dict(zip(SUM_COLUMNS, row[1::2]))
+
+def ensure_columns():
+    """
+    Adiciona ao consolidado as colunas criadas depois da tabela (create_all não
+    altera tabelas existentes). Todas são contadores com padrão zero.
+    Retorna os nomes adicionados; roda no upgrade-db, que reconstrói o histórico.
+    """
+    table = UserDailyStats.__table__
+    connection = db.session.connection()
+    existing = {column['name'] for column in db.inspect(connection).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=connection.dialect)
+        connection.execute(db.text(
+            f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NOT NULL DEFAULT 0'
+        ))
+        added.append(column.name)
+    return added
+
+def is_empty():
+    """True se o consolidado não tem nenhuma linha (banco anterior a ele ou recém-criado)"""
+    return db.session.query(UserDailyStats.id).limit(1).first() is None
+
+def _meal_totals(user_id):
+    day = db.func.date(Meal.created_at)
+    columns = [db.func.sum(db.func.coalesce(getattr(Meal, column), 0)) for column in NUTRITION_COLUMNS]
+    columns.append(db.func.sum(db.func.coalesce(Meal.health_score, 0)))
+    columns.append(db.func.count(Meal.health_score))
+    columns.append(db.func.count(Meal.id))
+    columns.extend(
+        db.func.sum(db.case((Meal.meal_type == meal_type, 1), else_=0))
+        for meal_type in MEAL_TYPE_COLUMNS
+    )
+    columns.extend(db.literal(0) for _ in EXERCISE_COLUMNS)
+    query = db.select(Meal.user_id.label('user_id'), day.label('day'), *columns).group_by(Meal.user_id, day)
+    if user_id is not None:
+        query = query.where(Meal.user_id == user_id)
+    return query
+
+def _exercise_totals(user_id):
+    day = db.func.date(UserExercise.completed_at)
+    columns = [db.literal(0) for _ in MEAL_COLUMNS]
+    columns.append(db.func.sum(db.func.coalesce(UserExercise.duration_minutes, 0)))
+    columns.append(db.func.sum(db.func.coalesce(UserExercise.calories_burned, 0)))
+    columns.append(db.func.count(UserExercise.id))
+    query = db.select(UserExercise.user_id, day, *columns).group_by(UserExercise.user_id, day)
+    if user_id is not None:
+        query = query.where(UserExercise.user_id == user_id)
+    return query
+
+def rebuild_daily_stats(user_id=None):
+    """
+    Reconstrói o consolidado a partir das refeições e dos exercícios; retorna o
+    número de linhas. Os dois agregados por (usuário, dia) são unidos e somados no
+    banco, então cada dia sai numa linha só.
+    """
+    combined = db.union_all(_meal_totals(user_id), _exercise_totals(user_id)).subquery()
+    columns = list(combined.c)[2:]
+    query = db.select(
+        combined.c.user_id, combined.c.day, *(db.func.sum(column) for column in columns)
+    ).group_by(combined.c.user_id, combined.c.day)
+
+    delete = UserDailyStats.query
+    if user_id is not None:
+        delete = delete.filter_by(user_id=user_id)
+    delete.delete(synchronize_session=False)
+
+    now = datetime.now(timezone.utc)
+    table = UserDailyStats.__table__
+    total = 0
+    chunk = []
+    for row in db.session.execute(query.execution_options(yield_per=REBUILD_CHUNK_SIZE)):
+        row_day = row[1] if isinstance(row[1], date) else date.fromisoformat(row[1])
+        values = dict(zip(SUM_COLUMNS, row[2:]))
+        chunk.append({'user_id': row[0], 'date': row_day, 'updated_at': now, **values})
+        if len(chunk) >= REBUILD_CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        total += len(chunk)
+    return total
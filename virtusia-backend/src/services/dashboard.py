@@ -0,0 +1,158 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app
+
+from src.models.user import db, User, UserProfile
+from src.models.meal import Meal, serialize_meals
+from src.models.goal import Goal, GoalStatus, BodyMeasurement
+from src.models.stats import UserDailyStats, UserDataVersion
+from src.services.cache import VersionedCache
+from src.services.goal_forecast import forecast_goals
+from src.services.sql import upsert_increment
+
+DEFAULT_CALORIE_GOAL = 2000
+DASHBOARD_GOALS = 3
+RECENT_MEALS = 5
+CACHE_SIZE = int(os.getenv('DASHBOARD_CACHE_SIZE', 500))  # por worker; cada entrada traz refeições e alimentos
+
+# Resposta serializada por usuário, versionada por UserDataVersion e pelo dia
+dashboard_cache = VersionedCache(CACHE_SIZE)
+
+# Próximos exercícios (simulado)
+UPCOMING_EXERCISES = [
+    {
+        'name': 'Treino de Força',
+        'scheduled_time': '18:00',
+        'duration': 45,
+        'type': 'strength'
+    },
+    {
+        'name': 'Caminhada',
+        'scheduled_time': '07:00',
+        'duration': 30,
+        'type': 'cardio'
+    }
+]
+
+def invalidate_dashboard(user_id):
+    """
+    Incrementa a versão dos dados do usuário na transação corrente. Deve ser
+    chamada por toda escrita que aparece no dashboard, antes do commit.
+    """
+    upsert_increment(
+        UserDataVersion.__table__,
+        {'user_id': int(user_id)},
+        {'version': 1},
+        {'updated_at': datetime.now(timezone.utc)}
+    )
+
+def data_version(user_id):
+    version = db.session.query(UserDataVersion.version).filter_by(user_id=int(user_id)).scalar()
+    return version or 0
+
+def get_motivational_message(calorie_progress, week_exercises):
+    """Gera mensagem motivacional baseada no progresso"""
+    if calorie_progress >= 90:
+        return "Excelente! Você está muito próximo da sua meta calórica diária! 🎯"
+    elif calorie_progress >= 70:
+        return "Ótimo progresso! Continue assim para atingir sua meta! 💪"
+    elif week_exercises >= 3:
+        return "Parabéns pelos exercícios desta semana! Que tal focar na alimentação agora? 🥗"
+    elif week_exercises >= 1:
+        return "Bom trabalho com os exercícios! Vamos manter o ritmo! 🏃‍♀️"
+    else:
+        return "Um novo dia, uma nova oportunidade! Vamos começar com uma refeição saudável? 🌟"
+
+def _summary_query(user_id, today):
+    """
+    Uma consulta com CTEs de uma linha (consolidado do dia e da semana, versão
+    das medidas) juntas ao usuário e ao perfil, mais as metas ativas: uma linha
+    por meta (ou uma só, sem meta).
+    """
+    week_start = today - timedelta(days=today.weekday())
+    stats = UserDailyStats.__table__
+    today_stats = db.select(
+        db.func.coalesce(db.func.sum(stats.c.total_calories), 0).label('calories'),
+        db.func.coalesce(db.func.sum(stats.c.meals_count), 0).label('meals')
+    ).where(stats.c.user_id == user_id, stats.c.date == today).cte('today_stats')
+    week_stats = db.select(
+        db.func.coalesce(db.func.sum(stats.c.total_calories), 0).label('calories'),
+        db.func.coalesce(db.func.sum(stats.c.exercises_count), 0).label('sessions')
+    ).where(stats.c.user_id == user_id, stats.c.date >= week_start, stats.c.date <= today).cte('week_stats')
+    measurements = db.select(
+        db.func.count(BodyMeasurement.id).label('total'), db.func.max(BodyMeasurement.id).label('last_id')
+    ).where(BodyMeasurement.user_id == user_id).cte('measurements')
+    active_goals = db.aliased(Goal, db.select(Goal).where(
+        Goal.user_id == user_id, Goal.status == GoalStatus.ACTIVE
+    ).subquery('active_goals'))
+
+    return db.select(
+        User.id, User.first_name, User.last_name, UserProfile.daily_calorie_goal,
+        today_stats.c.calories, today_stats.c.meals, week_stats.c.calories.label('week_calories'),
+        week_stats.c.sessions, measurements.c.total, measurements.c.last_id, active_goals
+    ).select_from(User).outerjoin(
+        UserProfile, UserProfile.user_id == User.id
+    ).join(today_stats, db.true()).join(week_stats, db.true()).join(
+        measurements, db.true()
+    ).outerjoin(active_goals, db.true()).where(
+        User.id == user_id
+    ).order_by(active_goals.id)
+
+def build_dashboard(user_id, today=None):
+    """Monta o dashboard (None se o usuário não existir)"""
+    user_id = int(user_id)
+    today = today or date.today()
+    rows = db.session.execute(_summary_query(user_id, today)).all()
+    if not rows:
+        return None
+    summary = rows[0]
+    goals = [row[-1] for row in rows if row[-1] is not None]
+
+    recent_meals = Meal.query.filter_by(user_id=user_id).order_by(Meal.created_at.desc()).limit(RECENT_MEALS).all()
+    forecasts = forecast_goals(user_id, today, goals=goals, measurements=(summary.total, summary.last_id))
+
+    daily_goal = summary.daily_calorie_goal or DEFAULT_CALORIE_GOAL
+    calorie_progress = (summary.calories / daily_goal * 100) if daily_goal > 0 else 0
+
+    return {
+        'user': {
+            'name': f"{summary.first_name} {summary.last_name}",
+            'id': summary.id
+        },
+        'daily_progress': {
+            'calories': {
+                'consumed': summary.calories,
+                'goal': daily_goal,
+                'percentage': min(100, calorie_progress)
+            },
+            'meals_logged': summary.meals,
+            'water_intake': 1.5,  # Simulado - em litros
+            'steps': 8500  # Simulado
+        },
+        'recent_meals': serialize_meals(recent_meals),
+        'upcoming_exercises': UPCOMING_EXERCISES,
+        'active_goals': [goal.to_dict() for goal in goals[:DASHBOARD_GOALS]],
+        'week_stats': {
+            'calories_consumed': summary.week_calories,
+            'exercises_completed': summary.sessions,
+            'goals_on_track': sum(1 for forecast in forecasts if forecast['on_track'])
+        },
+        'motivational_message': get_motivational_message(calorie_progress, summary.sessions)
+    }
+
+def cached_dashboard(user_id):
+    """
+    Retorna (versão, corpo JSON serializado ou None). Com cache válido, custa só
+    a leitura da versão (chave primária). A versão é lida antes dos dados: uma
+    escrita concorrente muda a versão e a próxima leitura recalcula.
+    """
+    user_id = int(user_id)
+    today = date.today()
+    version = (data_version(user_id), today.isoformat())
+
+    def compute():
+        payload = build_dashboard(user_id, today)
+        return None if payload is None else current_app.json.dumps(payload).encode('utf-8')
+
+    return version, dashboard_cache.get(user_id, version, compute)
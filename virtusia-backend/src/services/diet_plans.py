@@ -0,0 +1,163 @@
+import os
+import random
+from functools import lru_cache
+
+CALORIE_BUCKET = 50  # kcal: metas calóricas próximas recebem o mesmo cardápio
+CACHE_SIZE = int(os.getenv('DIET_PLAN_CACHE_SIZE', 4096))
+DEFAULT_GOAL = 'maintenance'
+DEFAULT_PREFERENCE = 'omnivore'
+
+# Distribuição de macronutrientes (proteína, carboidrato, gordura) por objetivo
+MACRO_RATIOS = {
+    'weight_loss': (0.30, 0.35, 0.35),
+    'muscle_gain': (0.25, 0.45, 0.30),
+    'maintenance': (0.20, 0.50, 0.30),
+}
+
+# Planos de refeição por preferência alimentar (carregados uma vez, imutáveis)
+MEAL_PLANS = {
+    'omnivore': {
+        'breakfast': (
+            'Ovos mexidos com aveia e frutas vermelhas',
+            'Iogurte grego com granola e banana',
+            'Panqueca de aveia com mel e nozes',
+            'Smoothie de proteína com frutas'
+        ),
+        'lunch': (
+            'Peito de frango grelhado com arroz integral e brócolis',
+            'Salmão assado com batata-doce e aspargos',
+            'Carne magra com quinoa e salada verde',
+            'Peixe grelhado com arroz e legumes'
+        ),
+        'dinner': (
+            'Frango ao curry com arroz integral',
+            'Peixe com purê de batata-doce',
+            'Carne magra com salada e batata',
+            'Omelete com vegetais e queijo'
+        ),
+        'snacks': (
+            'Mix de castanhas',
+            'Iogurte com frutas',
+            'Sanduíche natural',
+            'Shake de proteína'
+        )
+    },
+    'vegetarian': {
+        'breakfast': (
+            'Aveia com leite vegetal e frutas',
+            'Smoothie verde com espinafre e banana',
+            'Torrada integral com abacate',
+            'Iogurte vegetal com granola'
+        ),
+        'lunch': (
+            'Quinoa com legumes grelhados',
+            'Lentilha com arroz integral',
+            'Tofu grelhado com vegetais',
+            'Salada de grão-de-bico'
+        ),
+        'dinner': (
+            'Curry de grão-de-bico',
+            'Risotto de cogumelos',
+            'Macarrão integral com molho de tomate',
+            'Omelete de vegetais'
+        ),
+        'snacks': (
+            'Hummus com vegetais',
+            'Frutas secas e castanhas',
+            'Smoothie de proteína vegetal',
+            'Iogurte vegetal'
+        )
+    },
+    'vegan': {
+        'breakfast': (
+            'Aveia com leite de amêndoas e frutas',
+            'Smoothie de proteína vegetal',
+            'Torrada com pasta de amendoim',
+            'Chia pudding com frutas'
+        ),
+        'lunch': (
+            'Bowl de quinoa com vegetais',
+            'Curry de lentilha vermelha',
+            'Salada de grão-de-bico com tahine',
+            'Tofu marinado com arroz'
+        ),
+        'dinner': (
+            'Tempeh refogado com vegetais',
+            'Sopa de feijão com legumes',
+            'Macarrão com molho de castanhas',
+            'Curry de vegetais'
+        ),
+        'snacks': (
+            'Mix de sementes',
+            'Frutas frescas',
+            'Leite vegetal com proteína',
+            'Hummus com vegetais'
+        )
+    }
+}
+
+MEAL_TIMING = {
+    'breakfast': '07:00-09:00',
+    'snack1': '10:00-11:00',
+    'lunch': '12:00-14:00',
+    'snack2': '15:00-16:00',
+    'dinner': '18:00-20:00'
+}
+
+def plan_key(calories, goal, dietary_preferences=None):
+    """
+    Chave do cardápio: calorias quantizadas em faixas de CALORIE_BUCKET kcal e
+    objetivo/preferência normalizados (valores desconhecidos caem no padrão,
+    como antes, sem abrir entradas novas no cache)
+    """
+    bucket = int(round(calories / CALORIE_BUCKET)) * CALORIE_BUCKET
+    goal = goal if isinstance(goal, str) and goal in MACRO_RATIOS else DEFAULT_GOAL
+    preference = dietary_preferences if isinstance(dietary_preferences, str) and dietary_preferences in MEAL_PLANS else DEFAULT_PREFERENCE
+    return bucket, goal, preference
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _select_meals(bucket, preference):
+    meals = MEAL_PLANS[preference]
+
+    # Escolhas "aleatórias" sorteadas com semente derivada da chave: o mesmo
+    # cardápio sai do cache ou de um cálculo novo, em qualquer worker
+    rng = random.Random(f'{bucket}:{preference}')
+    return (
+        ('breakfast', rng.choice(meals['breakfast'])),
+        ('lunch', rng.choice(meals['lunch'])),
+        ('dinner', rng.choice(meals['dinner'])),
+        ('snack1', rng.choice(meals['snacks'])),
+        ('snack2', rng.choice(meals['snacks']))
+    )
+
+def generate_diet_plan(calories, goal, dietary_preferences=None):
+    """
+    Gera um plano alimentar personalizado. Só o sorteio das refeições fica em
+    cache (pela faixa de calorias); calorias, macros e hidratação saem da meta exata.
+    """
+    bucket, goal, preference = plan_key(calories, goal, dietary_preferences)
+    protein_ratio, carb_ratio, fat_ratio = MACRO_RATIOS[goal]
+
+    return {
+        'daily_calories': round(calories),
+        'macronutrients': {
+            'protein': round(calories * protein_ratio / 4),
+            'carbohydrates': round(calories * carb_ratio / 4),
+            'fat': round(calories * fat_ratio / 9)
+        },
+        'meals': dict(_select_meals(bucket, preference)),
+        'hydration_goal': round(calories * 0.035),  # 35ml por kcal
+        'meal_timing': dict(MEAL_TIMING)
+    }
+
+def cache_stats():
+    """Tamanho e taxa de acerto do cache de cardápios"""
+    info = _select_meals.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        'size': info.currsize,
+        'max_size': info.maxsize,
+        'hits': info.hits,
+        'misses': info.misses,
+        'hit_ratio': round(info.hits / lookups, 4) if lookups else None
+    }
@@ -0,0 +1,20 @@
+import logging
+
+from blinker import Namespace
+
+logger = logging.getLogger(__name__)
+
+# Sinais de domínio. São emitidos depois do commit e levam no payload tudo o que
+# os assinantes precisam, para não haver consultas extras no caminho da requisição.
+events = Namespace()
+
+# goal_completed.send(user_id, goal={id, title, goal_type, target_value, current_value}, completed_at=datetime)
+goal_completed = events.signal('goal-completed')
+
+def emit(signal, sender, **payload):
+    """Entrega o evento a cada assinante; a falha de um não afeta os demais nem a requisição"""
+    for receiver in signal.receivers_for(sender):
+        try:
+            receiver(sender, **payload)
+        except Exception:
+            logger.exception('Falha no assinante %r do evento %s', receiver, signal.name)
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from src.models.user import db
+from src.models.exercise import Exercise, DifficultyLevel
+from src.models.meal import normalize_food_name as fold
+
+VERSION_CHECK_INTERVAL_SECONDS = 60
+PREFIX_MAX = 4  # prefixos de palavra indexados (1 a 4 letras); buscas maiores são confirmadas
+
+def parse_muscle_groups(value):
+    """Grupos musculares do campo JSON (tolera texto separado por vírgulas)"""
+    if not value:
+        return []
+    try:
+        groups = json.loads(value)
+    except ValueError:
+        groups = value.split(',')
+    if isinstance(groups, str):
+        groups = [groups]
+    return [str(group).strip() for group in groups if str(group).strip()]
+
+class Bitmap:
+    """Conjunto de posições do catálogo como palavras de 64 bits (imutável)"""
+    __slots__ = ('words',)
+
+    def __init__(self, words):
+        self.words = words
+        self.words.flags.writeable = False
+
+    @classmethod
+    def from_positions(cls, positions, size):
+        mask = np.zeros(size, dtype=bool)
+        mask[list(positions)] = True
+        return cls.from_mask(mask)
+
+    @classmethod
+    def from_mask(cls, mask):
+        packed = np.packbits(mask, bitorder='little')
+        packed = np.pad(packed, (0, -len(packed) % 8))
+        return cls(packed.view('<u8').copy())
+
+    @classmethod
+    def full(cls, size):
+        return cls.from_mask(np.ones(size, dtype=bool))
+
+    def __and__(self, other):
+        return Bitmap(self.words & other.words)
+
+    def __or__(self, other):
+        return Bitmap(self.words | other.words)
+
+    def __len__(self):
+        return int(np.bitwise_count(self.words).sum())
+
+    def positions(self, offset=0, limit=None):
+        """Posições presentes em ordem; desempacota só as palavras da página pedida"""
+        counts = np.cumsum(np.bitwise_count(self.words), dtype=np.int64)
+        total = int(counts[-1]) if len(counts) else 0
+        end = total if limit is None else min(total, offset + limit)
+        if offset >= end:
+            return np.zeros(0, dtype=np.intp)
+        first = int(np.searchsorted(counts, offset, side='right'))
+        last = int(np.searchsorted(counts, end, side='left')) + 1
+        bits = np.unpackbits(self.words[first:last].view(np.uint8), bitorder='little')
+        skip = offset - (int(counts[first - 1]) if first else 0)
+        return (np.flatnonzero(bits) + first * 64)[skip:skip + end - offset]
+
+class CatalogSnapshot:
+    """
+    Foto imutável do catálogo de exercícios, ordenada por nome.
+    Guarda os dicionários já serializados e bitmaps por grupo muscular,
+    dificuldade e prefixo de palavra (nome e descrição).
+    """
+
+    def __init__(self, exercises):
+        exercises = sorted(exercises, key=lambda exercise: (exercise.name.casefold(), exercise.id))
+        size = len(exercises)
+        self.size = size
+        self.exercises = tuple(exercise.to_dict() for exercise in exercises)
+        self.positions = {exercise.id: position for position, exercise in enumerate(exercises)}
+        self.muscle_groups = tuple(tuple(parse_muscle_groups(exercise.muscle_groups)) for exercise in exercises)
+        self.words = tuple(
+            frozenset(f'{fold(exercise.name)} {fold(exercise.description)}'.split()) for exercise in exercises
+        )
+
+        muscles = defaultdict(set)
+        difficulties = defaultdict(set)
+        prefixes = defaultdict(set)
+        for position, exercise in enumerate(exercises):
+            for group in self.muscle_groups[position]:
+                muscles[fold(group)].add(position)
+            difficulties[exercise.difficulty_level].add(position)
+            for word in self.words[position]:
+                for length in range(1, min(len(word), PREFIX_MAX) + 1):
+                    prefixes[word[:length]].add(position)
+
+        self.all = Bitmap.full(size)
+        self.empty = Bitmap.from_positions((), size)
+        self.by_muscle = {group: Bitmap.from_positions(found, size) for group, found in muscles.items()}
+        self.by_difficulty = {
+            level: Bitmap.from_positions(difficulties.get(level, ()), size) for level in DifficultyLevel
+        }
+        self.by_prefix = {prefix: Bitmap.from_positions(found, size) for prefix, found in prefixes.items()}
+
+        digest = hashlib.sha256(json.dumps(self.exercises, sort_keys=True, default=str).encode('utf-8'))
+        self.version = digest.hexdigest()[:20]
+
+    def muscle(self, text):
+        """Exercícios de grupos musculares que contêm o texto (sem acento/caixa)"""
+        folded = fold(text)
+        result = self.empty
+        for group, bitmap in self.by_muscle.items():
+            if folded in group:
+                result = result | bitmap
+        return result
+
+    def difficulty(self, level):
+        return self.by_difficulty[level]
+
+    def search(self, text):
+        """Cada palavra buscada precisa ser início de alguma palavra do nome ou da descrição"""
+        result = self.all
+        for query_word in fold(text).split():
+            bitmap = self.by_prefix.get(query_word[:PREFIX_MAX])
+            if bitmap is None:
+                return self.empty
+            result = result & bitmap
+            if len(query_word) > PREFIX_MAX:
+                confirmed = [
+                    position for position in result.positions()
+                    if any(word.startswith(query_word) for word in self.words[position])
+                ]
+                result = Bitmap.from_positions(confirmed, self.size)
+        return result
+
+    def page(self, bitmap, offset, limit):
+        return [dict(self.exercises[position]) for position in bitmap.positions(offset, limit)]
+
+    def get(self, exercise_id):
+        """Cópia do dicionário do exercício (None se não existir)"""
+        position = self.positions.get(exercise_id)
+        return dict(self.exercises[position]) if position is not None else None
+
+class ExerciseCatalog:
+    """
+    Mantém a foto atual do catálogo. A cada intervalo confere uma impressão
+    barata da tabela (contagem, maior id, maior criação e maior alteração) e,
+    se mudou, constrói uma
+    nova foto e troca a referência de uma vez; leitores nunca veem meio estado.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._fingerprint = None
+        self._checked_at = 0.0
+
+    def _current_fingerprint(self):
+        return tuple(db.session.query(
+            db.func.count(Exercise.id), db.func.max(Exercise.id),
+            db.func.max(Exercise.created_at), db.func.max(Exercise.updated_at)
+        ).one())
+
+    def snapshot(self):
+        if self._snapshot is not None and time.monotonic() - self._checked_at < VERSION_CHECK_INTERVAL_SECONDS:
+            return self._snapshot
+        with self._lock:
+            if self._snapshot is None or time.monotonic() - self._checked_at >= VERSION_CHECK_INTERVAL_SECONDS:
+                fingerprint = self._current_fingerprint()
+                if self._snapshot is None or fingerprint != self._fingerprint:
+                    self._snapshot = CatalogSnapshot(Exercise.query.all())
+                    self._fingerprint = fingerprint
+                self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Força a reconstrução na próxima leitura (ex.: após editar o catálogo)"""
+        with self._lock:
+            self._snapshot = None
+
+catalog = ExerciseCatalog()
+
+def ensure_columns():
+    """
+    Adiciona exercises.updated_at em bancos criados antes da coluna (create_all não
+    altera tabelas existentes). Retorna True se a coluna foi criada.
+    """
+    table = Exercise.__table__
+    connection = db.session.connection()
+    existing = {column['name'] for column in db.inspect(connection).get_columns(table.name)}
+    if 'updated_at' in existing:
+        return False
+    column_type = table.c.updated_at.type.compile(dialect=connection.dialect)
+    connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN updated_at {column_type}'))
+    return True
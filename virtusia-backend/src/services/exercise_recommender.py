@@ -0,0 +1,211 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.models.user import db, ActivityLevel
+from src.models.exercise import UserExercise, DifficultyLevel
+from src.models.goal import Goal, GoalStatus, GoalType
+from src.models.meal import normalize_food_name as fold
+from src.services.exercise_catalog import catalog
+
+HISTORY_DAYS = 28
+HISTORY_LIMIT = 500
+RECENCY_HALF_LIFE_DAYS = 7.0
+PROGRESSION_SESSIONS = 12  # sessões no período para subir meio nível
+
+DIFFICULTY_LEVELS = (DifficultyLevel.BEGINNER, DifficultyLevel.INTERMEDIATE, DifficultyLevel.ADVANCED)
+DIFFICULTY_INDEX = {level: index for index, level in enumerate(DIFFICULTY_LEVELS)}
+
+# Nível-alvo (0 = iniciante, 2 = avançado) pelo nível de atividade declarado
+ACTIVITY_TARGET = {
+    ActivityLevel.SEDENTARY: 0.0,
+    ActivityLevel.LIGHTLY_ACTIVE: 0.5,
+    ActivityLevel.MODERATELY_ACTIVE: 1.0,
+    ActivityLevel.VERY_ACTIVE: 1.5,
+    ActivityLevel.EXTREMELY_ACTIVE: 2.0,
+}
+
+# Quanto cada objetivo valoriza gasto calórico por minuto
+GOAL_CALORIE_WEIGHT = {
+    GoalType.WEIGHT_LOSS: 1.0,
+    GoalType.FITNESS_IMPROVEMENT: 0.6,
+    GoalType.MAINTENANCE: 0.3,
+    GoalType.NUTRITION_IMPROVEMENT: 0.2,
+    GoalType.MUSCLE_GAIN: 0.1,
+}
+DEFAULT_CALORIE_WEIGHT = 0.3
+GOAL_KEYWORDS = {
+    'emagrec': GoalType.WEIGHT_LOSS,
+    'perder peso': GoalType.WEIGHT_LOSS,
+    'massa': GoalType.MUSCLE_GAIN,
+    'hipertrofia': GoalType.MUSCLE_GAIN,
+    'condicionamento': GoalType.FITNESS_IMPROVEMENT,
+    'resistencia': GoalType.FITNESS_IMPROVEMENT,
+}
+
+# Pesos dos termos da pontuação
+BALANCE_WEIGHT = 2.0
+DIFFICULTY_WEIGHT = 1.0
+RECENCY_WEIGHT = 1.0
+
+class CatalogFeatures:
+    """
+    Matrizes NumPy derivadas de uma foto do catálogo: grupos musculares
+    (linhas somam 1), dificuldade e calorias por minuto normalizadas.
+    """
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.snapshot = snapshot
+        self.groups = sorted({fold(group) for groups in snapshot.muscle_groups for group in groups})
+        group_index = {group: index for index, group in enumerate(self.groups)}
+
+        self.muscles = np.zeros((snapshot.size, len(self.groups)), dtype=np.float32)
+        for position, groups in enumerate(snapshot.muscle_groups):
+            columns = sorted({group_index[fold(group)] for group in groups})
+            if columns:
+                self.muscles[position, columns] = 1.0 / len(columns)
+
+        self.difficulty = np.array([
+            DIFFICULTY_INDEX[DifficultyLevel(exercise['difficulty_level'])] for exercise in snapshot.exercises
+        ], dtype=np.float32)
+        calories = np.array([exercise['calories_per_minute'] or 0 for exercise in snapshot.exercises], dtype=np.float32)
+        self.calories = calories / calories.max() if len(calories) and calories.max() > 0 else calories
+
+        # Distribuição de referência: quanto cada grupo aparece no catálogo
+        coverage = self.muscles.sum(axis=0)
+        self.target_share = coverage / coverage.sum() if coverage.sum() > 0 else coverage
+
+class UserSignals:
+    """Sinais do usuário usados na pontuação (histórico recente, nível-alvo e objetivos)"""
+
+    def __init__(self, exercise_ids, ages_days, durations, target_level, calorie_weight):
+        self.exercise_ids = exercise_ids
+        self.ages_days = np.asarray(ages_days, dtype=np.float32)
+        self.durations = np.asarray(durations, dtype=np.float32)
+        self.target_level = target_level
+        self.calorie_weight = calorie_weight
+
+    @property
+    def target_difficulty(self):
+        return DIFFICULTY_LEVELS[int(round(min(max(self.target_level, 0), 2)))]
+
+_features = None
+_features_lock = threading.Lock()
+
+def current_features():
+    """Features da foto atual do catálogo; reconstruídas só quando a versão muda"""
+    global _features
+    snapshot = catalog.snapshot()
+    features = _features
+    if features is None or features.version != snapshot.version:
+        with _features_lock:
+            if _features is None or _features.version != snapshot.version:
+                _features = CatalogFeatures(snapshot)
+            features = _features
+    return features
+
+def _goal_types(user):
+    goal_types = {
+        goal_type for (goal_type,) in db.session.query(Goal.goal_type).filter_by(user_id=user.id, status=GoalStatus.ACTIVE)
+    }
+    if user.profile and user.profile.fitness_goals:
+        try:
+            declared = json.loads(user.profile.fitness_goals)
+        except ValueError:
+            declared = user.profile.fitness_goals
+        text = fold(' '.join(declared) if isinstance(declared, list) else str(declared))
+        for goal_type in GoalType:
+            if fold(goal_type.value) in text:
+                goal_types.add(goal_type)
+        goal_types.update(goal_type for keyword, goal_type in GOAL_KEYWORDS.items() if keyword in text)
+    return goal_types
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def user_signals(user, now=None):
+    """Coleta os sinais do usuário com uma consulta indexada ao histórico recente"""
+    now = now or datetime.now(timezone.utc)
+    history = db.session.query(
+        UserExercise.exercise_id, UserExercise.completed_at, UserExercise.duration_minutes
+    ).filter(
+        UserExercise.user_id == user.id,
+        UserExercise.completed_at >= now - timedelta(days=HISTORY_DAYS)
+    ).order_by(UserExercise.completed_at.desc()).limit(HISTORY_LIMIT).all()
+
+    target_level = ACTIVITY_TARGET.get(user.activity_level, 1.0)
+    if len(history) >= PROGRESSION_SESSIONS:
+        target_level += 0.5
+
+    goal_types = _goal_types(user)
+    calorie_weight = max((GOAL_CALORIE_WEIGHT[goal_type] for goal_type in goal_types), default=DEFAULT_CALORIE_WEIGHT)
+
+    return UserSignals(
+        [exercise_id for exercise_id, _, _ in history],
+        [(now - _as_utc(completed_at)).total_seconds() / 86400 for _, completed_at, _ in history],
+        [duration or 0 for _, _, duration in history],
+        target_level,
+        calorie_weight
+    )
+
+def score_exercises(features, signals):
+    """
+    Pontua o catálogo inteiro numa passada vetorizada:
+    - equilíbrio: favorece grupos abaixo da sua participação no catálogo no histórico recente
+    - dificuldade: proximidade do nível-alvo
+    - calorias: peso conforme os objetivos
+    - recência: penaliza o que foi feito nos últimos dias (meia-vida de 7 dias)
+    Retorna (pontuações, carga recente por grupo).
+    """
+    positions = features.snapshot.positions
+    known = [index for index, exercise_id in enumerate(signals.exercise_ids) if exercise_id in positions]
+    history = np.array([positions[signals.exercise_ids[index]] for index in known], dtype=np.intp)
+    recency = np.power(0.5, signals.ages_days[known] / RECENCY_HALF_LIFE_DAYS)
+
+    # Carga por grupo muscular: cada sessão pesa pela recência e (suavemente) pela duração
+    volume = recency * (1.0 + np.minimum(signals.durations[known], 60.0) / 30.0)
+    load = volume @ features.muscles[history] if len(history) else np.zeros(len(features.groups), dtype=np.float32)
+    share = load / load.sum() if load.sum() > 0 else load
+    balance = features.muscles @ (features.target_share - share)
+
+    last_done = np.zeros(features.snapshot.size, dtype=np.float32)
+    if len(history):
+        np.maximum.at(last_done, history, recency.astype(np.float32))
+
+    scores = (
+        BALANCE_WEIGHT * balance
+        - DIFFICULTY_WEIGHT * np.abs(features.difficulty - signals.target_level) / 2.0
+        + signals.calorie_weight * features.calories
+        - RECENCY_WEIGHT * last_done
+    )
+    return scores, share
+
+def top_k(scores, k):
+    """Índices das k maiores pontuações, em ordem decrescente (argpartition + ordenação só do topo)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.intp)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind='stable')]
+
+def recommend_exercises(user, k=6):
+    """
+    Retorna (exercícios recomendados com `score`, sinais do usuário, grupos menos trabalhados).
+    Os dicionários vêm da foto do catálogo (cópias).
+    """
+    features = current_features()
+    signals = user_signals(user)
+    scores, share = score_exercises(features, signals)
+
+    recommended = []
+    for position in top_k(scores, k).tolist():
+        exercise = dict(features.snapshot.exercises[position])
+        exercise['score'] = round(float(scores[position]), 4)
+        recommended.append(exercise)
+
+    deficit = features.target_share - share
+    undertrained = [features.groups[index] for index in top_k(deficit, 3).tolist() if deficit[index] > 0]
+    return recommended, signals, undertrained
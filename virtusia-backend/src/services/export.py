@@ -0,0 +1,130 @@
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+from src.models.user import db
+from src.models.meal import Meal, MealFood, Food
+from src.models.exercise import Exercise, UserExercise
+from src.models.goal import Goal, BodyMeasurement
+from src.models.recommendation import Recommendation
+
+FORMATS = ('ndjson', 'csv')
+YIELD_PER = 1000              # linhas buscadas por vez do cursor no servidor
+FLUSH_BYTES = 64 * 1024       # texto acumulado antes de passar ao compressor
+GZIP_LEVEL = 6
+
+class InvalidExport(ValueError):
+    """Formato ou entidade de exportação desconhecidos"""
+
+def _meals(user_id):
+    table = Meal.__table__
+    return db.select(table).where(table.c.user_id == user_id).order_by(table.c.id)
+
+def _meal_foods(user_id):
+    table = MealFood.__table__
+    meals = Meal.__table__
+    foods = Food.__table__
+    return db.select(table, foods.c.name.label('food_name')).join(
+        meals, meals.c.id == table.c.meal_id
+    ).join(foods, foods.c.id == table.c.food_id).where(meals.c.user_id == user_id).order_by(table.c.id)
+
+def _user_exercises(user_id):
+    table = UserExercise.__table__
+    exercises = Exercise.__table__
+    return db.select(table, exercises.c.name.label('exercise_name')).join(
+        exercises, exercises.c.id == table.c.exercise_id
+    ).where(table.c.user_id == user_id).order_by(table.c.id)
+
+def _by_user(model):
+    def query(user_id):
+        table = model.__table__
+        return db.select(table).where(table.c.user_id == user_id).order_by(table.c.id)
+    return query
+
+# Entidades exportadas, na ordem em que saem no arquivo
+ENTITIES = {
+    'meals': _meals,
+    'meal_foods': _meal_foods,
+    'user_exercises': _user_exercises,
+    'goals': _by_user(Goal),
+    'body_measurements': _by_user(BodyMeasurement),
+    'recommendations': _by_user(Recommendation),
+}
+
+def resolve_entities(fmt, entity=None):
+    """Valida o pedido e devolve as entidades a exportar; CSV exige uma entidade por arquivo"""
+    if fmt not in FORMATS:
+        raise InvalidExport(f'Formato inválido. Use: {", ".join(FORMATS)}')
+    if entity is None:
+        if fmt == 'csv':
+            raise InvalidExport(f'CSV exporta uma entidade por vez. Use entity: {", ".join(ENTITIES)}')
+        return list(ENTITIES)
+    if entity not in ENTITIES:
+        raise InvalidExport(f'Entidade inválida. Use: {", ".join(ENTITIES)}')
+    return [entity]
+
+def _value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def _rows(entity, user_id):
+    # Consulta Core (sem objetos ORM na sessão) com cursor no servidor: memória constante
+    result = db.session.execute(ENTITIES[entity](user_id).execution_options(yield_per=YIELD_PER))
+    return result.keys(), result
+
+def _ndjson(entities, user_id):
+    for entity in entities:
+        keys, rows = _rows(entity, user_id)
+        keys = list(keys)
+        for row in rows:
+            record = {'type': entity}
+            record.update(zip(keys, map(_value, row)))
+            yield json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+def _csv(entities, user_id):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for entity in entities:
+        keys, rows = _rows(entity, user_id)
+        writer.writerow(keys)
+        for row in rows:
+            writer.writerow([_value(value) for value in row])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    pending = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= FLUSH_BYTES:
+            data = compressor.compress(''.join(pending).encode('utf-8'))
+            pending = []
+            size = 0
+            if data:
+                yield data
+    if pending:
+        yield compressor.compress(''.join(pending).encode('utf-8'))
+    yield compressor.flush()
+
+def export_user(user_id, fmt, entities):
+    """
+    Gera o histórico do usuário como gzip (NDJSON ou CSV) em pedaços de bytes.
+    Nada é materializado: as linhas vêm do banco em blocos de YIELD_PER e são
+    comprimidas à medida que saem.
+    """
+    lines = _ndjson(entities, user_id) if fmt == 'ndjson' else _csv(entities, user_id)
+    return _gzip(lines)
+
+def export_filename(fmt, entities):
+    name = entities[0] if len(entities) == 1 else 'conta'
+    return f'virtusia-{name}-{date.today().isoformat()}.{fmt}.gz'
@@ -0,0 +1,317 @@
+import threading
+import time
+from array import array
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from src.models.user import db
+from src.models.meal import Food, MealFood, normalize_food_name as fold
+
+REFRESH_INTERVAL_SECONDS = 30
+LOAD_CHUNK_SIZE = 5000
+RESULT_CACHE_SIZE = 2048
+NGRAM_SIZE = 3
+PREFIX_SIZE = NGRAM_SIZE - 1
+NAME_START = '\x01'  # marca o início do nome nos trigramas e prefixos
+MARK_RATIO = 8   # acima disso, testa pertinência por busca binária em vez de marcar
+SKIP_RATIO = 32  # trigramas muito comuns não filtram; a verificação final cuida deles
+FILTER_MIN = 256
+FILTER_KEEP = 0.9
+
+# Qualidade do casamento (menor é melhor)
+MATCH_EXACT = 0
+MATCH_NAME_PREFIX = 1
+MATCH_WORD_PREFIX = 2
+MATCH_SUBSTRING = 3
+
+# Chave de ordenação empacotada num int64: qualidade | uso (invertido) | tamanho do nome
+_USAGE_CAP = (1 << 37) - 1
+_LENGTH_CAP = (1 << 12) - 1
+_QUALITY_SHIFT = 49
+_USAGE_SHIFT = 12
+
+def ngrams(text):
+    """Trigramas distintos de um texto já normalizado"""
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+def word_prefixes(folded):
+    """Prefixos curtos (1-2 letras) das palavras e do nome, para buscas com menos de 3 letras"""
+    prefixes = set()
+    for index, word in enumerate(folded.split()):
+        for size in range(1, min(len(word), PREFIX_SIZE) + 1):
+            prefixes.add(word[:size])
+            if index == 0:
+                prefixes.add(NAME_START + word[:size])
+    return prefixes
+
+def match_quality(folded_query, name):
+    """Qualidade real do casamento; None se o nome não contém a busca"""
+    if name == folded_query:
+        return MATCH_EXACT
+    if name.startswith(folded_query):
+        return MATCH_NAME_PREFIX
+    if name.find(' ' + folded_query) >= 0:
+        return MATCH_WORD_PREFIX
+    if folded_query in name:
+        return MATCH_SUBSTRING
+    return None
+
+def rank_key(usage, length):
+    """Parte da chave que não depende da busca: mais usado e nome mais curto primeiro"""
+    return ((_USAGE_CAP - min(usage, _USAGE_CAP)) << _USAGE_SHIFT) | min(length, _LENGTH_CAP)
+
+def _view(posting):
+    # Índices intp evitam a conversão implícita a cada indexação avançada
+    return np.frombuffer(posting, dtype=np.int32).astype(np.intp)
+
+class FoodSearchIndex:
+    """
+    Índice em memória sobre Food.name com nomes sem acento.
+    Trigramas atendem buscas de 3+ letras (semântica de substring, como o ILIKE);
+    prefixos de palavra atendem buscas de 1-2 letras. O ranking considera a
+    qualidade do casamento e quantas vezes o alimento já foi usado em refeições.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self.food_ids = []
+        self.folded_names = []
+        self.positions = {}
+        self.usage = []
+        self.rank_keys = np.zeros(1024, dtype=np.int64)
+        self.marks = np.zeros(1024, dtype=np.uint8)
+        self.grams = defaultdict(lambda: array('i'))
+        self.prefixes = defaultdict(lambda: array('i'))
+        self.results = OrderedDict()
+        self.max_food_id = 0
+        self.loaded = False
+        self.refreshed_at = 0.0
+
+    def __len__(self):
+        return len(self.food_ids)
+
+    def _grow(self, size):
+        if size <= len(self.rank_keys):
+            return
+        capacity = max(size, len(self.rank_keys) * 2)
+        self.rank_keys = np.resize(self.rank_keys, capacity)
+        self.marks = np.zeros(capacity, dtype=np.uint8)
+
+    def _add(self, food_id, name):
+        if food_id in self.positions:
+            return
+        folded = fold(name)
+        position = len(self.food_ids)
+        self._grow(position + 1)
+        self.food_ids.append(food_id)
+        self.folded_names.append(folded)
+        self.usage.append(0)
+        self.positions[food_id] = position
+        self.rank_keys[position] = rank_key(0, len(folded))
+        # Posições só crescem, então cada lista de postagem fica ordenada
+        for gram in ngrams(NAME_START + folded):
+            self.grams[gram].append(position)
+        for prefix in word_prefixes(folded):
+            self.prefixes[prefix].append(position)
+        self.max_food_id = max(self.max_food_id, food_id)
+
+    def _set_usage(self, position, usage):
+        self.usage[position] = usage
+        self.rank_keys[position] = rank_key(usage, len(self.folded_names[position]))
+
+    def _load_foods(self, min_id=0):
+        query = db.session.query(Food.id, Food.name).filter(Food.id > min_id).order_by(Food.id)
+        for food_id, name in query.yield_per(LOAD_CHUNK_SIZE):
+            self._add(food_id, name)
+
+    def build(self):
+        """(Re)constrói o índice completo a partir do banco"""
+        with self._lock:
+            self._build()
+
+    def _build(self):
+        self._clear()
+        self._load_foods()
+        usage = db.session.query(MealFood.food_id, db.func.count(MealFood.id)).group_by(MealFood.food_id)
+        for food_id, count in usage:
+            position = self.positions.get(food_id)
+            if position is not None:
+                self._set_usage(position, count)
+        self.loaded = True
+        self.refreshed_at = time.monotonic()
+
+    def refresh(self):
+        """
+        Carrega alimentos criados por outros processos desde a última carga.
+        Cada worker tem seu próprio índice; a busca por id > máximo usa a chave primária.
+        """
+        if not self.loaded:
+            # Primeira busca do worker: só uma thread constrói, as demais esperam por ela
+            with self._lock:
+                if not self.loaded:
+                    self._build()
+            return
+        if time.monotonic() - self.refreshed_at < REFRESH_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            self._load_foods(self.max_food_id)
+            # O cache de resultados vive no máximo um intervalo de atualização
+            self.results.clear()
+            self.refreshed_at = time.monotonic()
+
+    def add_foods(self, foods):
+        """Indexa alimentos recém-criados, como pares (id, nome) (chamar após o commit)"""
+        if not self.loaded or not foods:
+            return
+        with self._lock:
+            for food_id, name in foods:
+                self._add(food_id, name)
+            self.results.clear()
+
+    def record_usage(self, food_ids):
+        """Soma usos de alimentos em refeições salvas (chamar após o commit)"""
+        with self._lock:
+            for food_id in food_ids:
+                position = self.positions.get(food_id)
+                if position is not None:
+                    self._set_usage(position, self.usage[position] + 1)
+
+    def _member(self, positions, posting):
+        """Máscara de quais posições estão na lista de postagem"""
+        if len(posting) > MARK_RATIO * len(positions):
+            # Lista muito maior que os candidatos: busca binária custa menos que marcar tudo
+            index = np.searchsorted(posting, positions)
+            index[index == len(posting)] = 0
+            return posting[index] == positions
+        marks = self.marks
+        marks[posting] = 1
+        found = marks[positions] == 1
+        marks[posting] = 0
+        return found
+
+    def _candidates(self, folded):
+        """
+        Posições candidatas e uma chave aproximada de cada uma, que nunca fica acima
+        da chave real. Para 3+ letras os trigramas podem dar falso positivo; a
+        verificação final confirma.
+        """
+        if len(folded) < NGRAM_SIZE:
+            matches = self.prefixes.get(folded)
+            if matches is None:
+                return None
+            matches = _view(matches)
+            name_start = self.prefixes.get(NAME_START + folded)
+            word_start = None
+            fallback = MATCH_WORD_PREFIX
+        else:
+            postings = []
+            for gram in ngrams(folded):
+                posting = self.grams.get(gram)
+                if posting is None:
+                    return None
+                postings.append(posting)
+            postings.sort(key=len)
+            matches = _view(postings[0])
+            for posting in postings[1:]:
+                # Filtrar só enquanto compensa: o resto é confirmado na verificação final
+                if len(matches) <= FILTER_MIN or len(posting) > SKIP_RATIO * len(matches):
+                    break
+                before = len(matches)
+                matches = matches[self._member(matches, _view(posting))]
+                if len(matches) > FILTER_KEEP * before:
+                    break
+            name_start = self.grams.get(NAME_START + folded[:PREFIX_SIZE])
+            word_start = self.grams.get(' ' + folded[:PREFIX_SIZE])
+            fallback = MATCH_SUBSTRING
+
+        quality = np.full(len(matches), fallback << _QUALITY_SHIFT, dtype=np.int64)
+        if word_start is not None:
+            quality[self._member(matches, _view(word_start))] = MATCH_WORD_PREFIX << _QUALITY_SHIFT
+        keys = np.take(self.rank_keys, matches)
+        if name_start is not None:
+            at_name_start = self._member(matches, _view(name_start))
+            quality[at_name_start] = MATCH_NAME_PREFIX << _QUALITY_SHIFT
+            quality[at_name_start & ((keys & _LENGTH_CAP) == len(folded))] = MATCH_EXACT << _QUALITY_SHIFT
+        keys += quality
+        return matches, keys
+
+    def _exact_key(self, folded, position):
+        quality = match_quality(folded, self.folded_names[position])
+        if quality is None:
+            return None
+        return (quality << _QUALITY_SHIFT) | int(self.rank_keys[position])
+
+    def _rank(self, folded, limit):
+        candidates = self._candidates(folded)
+        if candidates is None or not len(candidates[0]):
+            return []
+        matches, keys = candidates
+
+        # Melhor-primeiro: a chave aproximada é um limite inferior da real, então
+        # paramos quando o próximo candidato já não pode entrar no top-k
+        batch = min(len(keys), max(limit * 4, 64))
+        if batch < len(keys):
+            order = np.argpartition(keys, batch - 1)[:batch]
+            order = order[np.argsort(keys[order], kind='stable')]
+        else:
+            order = np.argsort(keys, kind='stable')
+
+        best = []
+        seen = set()
+        while True:
+            for index in order.tolist():
+                if len(best) >= limit and keys[index] >= best[limit - 1][0]:
+                    break
+                if index in seen:
+                    continue
+                seen.add(index)
+                position = int(matches[index])
+                key = self._exact_key(folded, position)
+                if key is not None:
+                    best.append((key, self.food_ids[position]))
+                    best.sort()
+                    del best[limit:]
+            else:
+                if len(order) < len(keys):
+                    order = np.argsort(keys, kind='stable')
+                    continue
+            break
+
+        return [(food_id, key >> _QUALITY_SHIFT) for key, food_id in best]
+
+    def search(self, text, limit=20, use_cache=True):
+        """Retorna [(food_id, qualidade)] ordenados por qualidade, uso e tamanho do nome"""
+        folded = fold(text)
+        if not folded or limit <= 0:
+            return []
+
+        with self._lock:
+            cache_key = (folded, limit)
+            if use_cache and cache_key in self.results:
+                self.results.move_to_end(cache_key)
+                return self.results[cache_key]
+
+            ranked = self._rank(folded, limit)
+            if use_cache:
+                self.results[cache_key] = ranked
+                if len(self.results) > RESULT_CACHE_SIZE:
+                    self.results.popitem(last=False)
+            return ranked
+
+food_index = FoodSearchIndex()
+
+def search_foods(text, limit=20):
+    """
+    Busca alimentos pelo índice e devolve os objetos Food na ordem do ranking.
+    O índice é construído na primeira busca de cada worker, não na inicialização.
+    """
+    food_index.refresh()
+    ranked = food_index.search(text, limit)
+    if not ranked:
+        return []
+    foods = {food.id: food for food in Food.query.filter(Food.id.in_([food_id for food_id, _ in ranked]))}
+    return [foods[food_id] for food_id, _ in ranked if food_id in foods]
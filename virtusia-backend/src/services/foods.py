@@ -0,0 +1,110 @@
+from src.models.user import db
+from src.models.meal import Food, MealFood, normalize_food_name
+from src.services.sql import insert_ignore_conflicts
+
+NUTRIENT_FIELDS = ('calories_per_100g', 'protein_per_100g', 'carbs_per_100g', 'fat_per_100g', 'fiber_per_100g')
+
+def _lookup(normalized_names):
+    if not normalized_names:
+        return {}
+    foods = Food.query.filter(Food.normalized_name.in_(normalized_names)).all()
+    return {food.normalized_name: food for food in foods}
+
+def resolve_foods(foods_data):
+    """
+    Resolve os alimentos de uma lista de itens pelo nome normalizado.
+    Um SELECT ... IN para os existentes e um INSERT multi-linha (ON CONFLICT DO NOTHING)
+    para os que faltam, independentemente do tamanho da lista.
+    Retorna ({nome_normalizado: Food}, [(id, nome) dos alimentos que faltavam]).
+    """
+    wanted = {}
+    for food_data in foods_data:
+        normalized = normalize_food_name(food_data['name'])
+        if normalized and normalized not in wanted:
+            wanted[normalized] = food_data
+
+    foods = _lookup(list(wanted))
+    missing = [normalized for normalized in wanted if normalized not in foods]
+    if not missing:
+        return foods, []
+
+    insert_ignore_conflicts(Food.__table__, [
+        {
+            'name': wanted[normalized]['name'].strip(),
+            'normalized_name': normalized,
+            **{field: wanted[normalized].get(field, 0) for field in NUTRIENT_FIELDS},
+            'source_api': 'manual'
+        }
+        for normalized in missing
+    ], ['normalized_name'])
+
+    # Relê os que faltavam: inclui os criados agora e os que outra transação criou antes
+    created = _lookup(missing)
+    foods.update(created)
+    return foods, [(food.id, food.name) for food in created.values()]
+
+def meal_food_rows(meal_id, foods_data, foods):
+    """Linhas MealFood (dicionários) de uma refeição, prontas para INSERT em lote"""
+    rows = []
+    for food_data in foods_data:
+        food = foods.get(normalize_food_name(food_data['name']))
+        if food is None:
+            continue
+        rows.append({
+            'meal_id': meal_id,
+            'food_id': food.id,
+            'quantity': food_data.get('quantity', 0),
+            'unit': food_data.get('unit', 'g')
+        })
+    return rows
+
+def add_meal_foods(meal_id, foods_data, foods):
+    """Insere as linhas MealFood de uma refeição em lote; retorna os ids dos alimentos usados"""
+    rows = meal_food_rows(meal_id, foods_data, foods)
+    if rows:
+        db.session.execute(MealFood.__table__.insert(), rows)
+    return [row['food_id'] for row in rows]
+
+def backfill_normalized_names(chunk_size=1000):
+    """
+    Preenche Food.normalized_name em bancos criados antes da coluna existir.
+    Duplicatas pelo nome normalizado são mescladas no alimento de menor id
+    (as linhas de refeição passam a apontar para ele). Retorna (preenchidos, mesclados).
+    """
+    table = Food.__table__
+    columns = {column['name'] for column in db.inspect(db.engine).get_columns(table.name)}
+    if 'normalized_name' not in columns:
+        db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN normalized_name VARCHAR(200)'))
+
+    canonical = dict(
+        db.session.query(Food.normalized_name, Food.id).filter(Food.normalized_name.isnot(None))
+    )
+    rows = db.session.query(Food.id, Food.name).filter(Food.normalized_name.is_(None)).order_by(Food.id).all()
+
+    filled = []
+    duplicates = {}
+    for food_id, name in rows:
+        normalized = normalize_food_name(name)
+        if normalized in canonical:
+            duplicates[food_id] = canonical[normalized]
+        else:
+            canonical[normalized] = food_id
+            filled.append({'food_id': food_id, 'normalized': normalized})
+
+    update = table.update().where(table.c.id == db.bindparam('food_id')).values(normalized_name=db.bindparam('normalized'))
+    for start in range(0, len(filled), chunk_size):
+        db.session.execute(update, filled[start:start + chunk_size])
+
+    repoint = MealFood.__table__.update().where(
+        MealFood.__table__.c.food_id == db.bindparam('duplicate_id')
+    ).values(food_id=db.bindparam('canonical_id'))
+    merges = [{'duplicate_id': duplicate, 'canonical_id': kept} for duplicate, kept in duplicates.items()]
+    for start in range(0, len(merges), chunk_size):
+        chunk = merges[start:start + chunk_size]
+        db.session.execute(repoint, chunk)
+        db.session.execute(table.delete().where(table.c.id.in_([merge['duplicate_id'] for merge in chunk])))
+
+    for index in table.indexes:
+        if index.name == 'uq_foods_normalized_name':
+            index.create(db.session.connection(), checkfirst=True)
+    return len(filled), len(duplicates)
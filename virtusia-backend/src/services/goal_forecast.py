@@ -0,0 +1,126 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from scipy.special import ndtr
+
+from src.models.goal import Goal, GoalStatus
+from src.services.goal_progress import GOAL_DIRECTIONS, measurement_field, measurement_version, progress_cache
+from src.services.measurement_trends import FIELDS, load_series, latest_smoothed, linear_fit
+
+HISTORY_DAYS = 90            # tendência ajustada sobre as medidas recentes
+MAX_FORECAST_DAYS = 3650     # projeções além disso não são informadas
+MAINTENANCE_TOLERANCE = 0.02  # manutenção: dentro de ±2% do alvo
+ON_TRACK_PROBABILITY = 0.5
+LEGACY_ON_TRACK_PERCENTAGE = 50  # metas sem medida corporal seguem a regra antiga
+
+def _goal_key(goal):
+    return (goal.id, goal.goal_type, goal.unit, goal.target_value, goal.target_date, goal.current_value)
+
+def _probability(numerator, spread):
+    """Φ(numerador / desvio), tratando desvio zero (ajuste perfeito) pelo sinal"""
+    safe = np.where(spread > 0, spread, 1.0)
+    z = np.where(spread > 0, numerator / safe, np.where(numerator >= 0, np.inf, -np.inf))
+    return ndtr(z)
+
+def _round(value, digits=3):
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+def _project(goals, user_id, today):
+    """
+    Ajusta a reta de tendência de todas as metas numa passada sobre a matriz
+    medidas x metas e projeta conclusão, ritmo necessário e probabilidade.
+    O nível atual é a EWMA na última leitura (não a reta estendida até hoje); a
+    reta só projeta daí em diante. Sem reta confiável (ver linear_fit) a meta
+    fica como insufficient_data.
+    """
+    forecasts = [{
+        'goal_id': goal.id,
+        'title': goal.title,
+        'goal_type': goal.goal_type.value,
+        'measurement_field': measurement_field(goal.goal_type, goal.unit),
+        'target_value': goal.target_value,
+        'target_date': goal.target_date.isoformat() if goal.target_date else None,
+        'status': 'no_measurement',
+        'on_track': goal.calculate_progress_percentage() >= LEGACY_ON_TRACK_PERCENTAGE
+    } for goal in goals]
+    tracked = [index for index, forecast in enumerate(forecasts) if forecast['measurement_field']]
+    if not tracked:
+        return forecasts
+
+    now = datetime.now(timezone.utc)
+    times, values = load_series(user_id, now - timedelta(days=HISTORY_DAYS))
+    if len(times) == 0:
+        for index in tracked:
+            forecasts[index].update(status='insufficient_data', on_track=None)
+        return forecasts
+
+    columns = list(FIELDS)
+    series = values[:, [columns.index(forecasts[index]['measurement_field']) for index in tracked]]
+    valid = ~np.isnan(series)
+    filled = np.where(valid, series, 0.0)
+    count = valid.sum(axis=0)
+    days = (times - times[0]) / np.timedelta64(1, 'D')
+    now_day = (np.datetime64(now.replace(tzinfo=None), 'us') - times[0]) / np.timedelta64(1, 'D')
+
+    tracked_goals = [goals[index] for index in tracked]
+    target = np.array([np.nan if goal.target_value is None else goal.target_value for goal in tracked_goals])
+    direction = np.array([GOAL_DIRECTIONS.get(goal.goal_type, 0) for goal in tracked_goals])
+    days_left = np.array([np.nan if goal.target_date is None else (goal.target_date - today).days for goal in tracked_goals], dtype=float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope, mean_t, mean_y, sxx, variance = linear_fit(days, filled, valid)
+        level = latest_smoothed(days, filled, valid)
+        last_day = np.where(valid, days[:, None], -np.inf).max(axis=0)
+        horizon = np.where(days_left > 0, days_left, 0.0)
+        predicted = level + slope * (now_day - last_day + horizon)
+        # Incerteza da reta na data-alvo (inclui a incerteza da inclinação)
+        spread = np.sqrt(variance * (1.0 / count + (now_day + horizon - mean_t) ** 2 / sxx))
+
+        gap = direction * (target - level)        # > 0: ainda falta chegar ao alvo
+        speed = direction * slope                 # > 0: andando na direção do alvo
+        days_to_target = np.where((gap > 0) & (speed > 0), gap / speed, np.nan)
+        required_weekly = np.where(days_left > 0, (target - level) / days_left * 7, np.nan)
+
+        dated = _probability(direction * (predicted - target), spread)
+        # Sem data-alvo: probabilidade de a tendência apontar para o alvo
+        undated = _probability(speed, np.sqrt(variance / sxx))
+        band = MAINTENANCE_TOLERANCE * np.abs(target)
+        maintenance = _probability(target + band - predicted, spread) - _probability(target - band - predicted, spread)
+        probability = np.where(direction == 0, maintenance, np.where(np.isnan(days_left), undated, dated))
+        probability = np.where(np.isnan(target) | (count < 3), np.nan, probability)
+
+    for column, index in enumerate(tracked):
+        forecast = forecasts[index]
+        if not np.isfinite(slope[column]):
+            forecast.update(status='insufficient_data', on_track=None, data_points=int(count[column]))
+            continue
+        completion = None
+        if np.isfinite(days_to_target[column]) and days_to_target[column] <= MAX_FORECAST_DAYS:
+            completion = (today + timedelta(days=int(round(days_to_target[column])))).isoformat()
+        reached = bool(direction[column] != 0 and np.isfinite(gap[column]) and gap[column] <= 0)
+        chance = _round(probability[column])
+        forecast.update(
+            status='reached' if reached else 'ok',
+            data_points=int(count[column]),
+            current_level=_round(level[column], 2),
+            weekly_rate=_round(slope[column] * 7),
+            required_weekly_rate=_round(required_weekly[column]),
+            projected_completion_date=completion,
+            on_track_probability=chance,
+            on_track=reached or (chance is not None and chance >= ON_TRACK_PROBABILITY)
+        )
+    return forecasts
+
+def forecast_goals(user_id, today=None, goals=None, measurements=None):
+    """
+    Previsões de todas as metas ativas do usuário. Ficam em cache até chegar uma
+    medida nova, a meta mudar ou o dia virar. Quem já carregou as metas ativas e a
+    versão das medidas (ex.: o dashboard) pode passá-las e evitar as consultas.
+    """
+    today = today or date.today()
+    if goals is None:
+        goals = Goal.query.filter_by(user_id=user_id, status=GoalStatus.ACTIVE).order_by(Goal.id).all()
+    if measurements is None:
+        measurements = measurement_version(user_id)
+    version = (tuple(measurements), today, tuple(_goal_key(goal) for goal in goals))
+    return progress_cache.get(('forecast', int(user_id)), version, lambda: _project(goals, user_id, today))
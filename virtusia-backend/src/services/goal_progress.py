@@ -0,0 +1,167 @@
+from datetime import date, datetime, timezone
+
+from src.models.user import db
+from src.models.goal import Goal, BodyMeasurement, GoalType, GoalStatus
+from src.services.sql import date_bucket
+from src.services.cache import VersionedCache
+
+GRANULARITIES = ('day', 'week', 'month')
+DEFAULT_GRANULARITY = 'week'
+
+# Campo de medida acompanhado por tipo de meta
+GOAL_MEASUREMENT_FIELDS = {
+    GoalType.WEIGHT_LOSS: 'weight',
+    GoalType.MUSCLE_GAIN: 'muscle_mass',
+    GoalType.MAINTENANCE: 'weight',
+}
+# Metas de perda de peso ou manutenção em % acompanham o percentual de gordura
+BODY_FAT_UNITS = ('%',)
+BODY_FAT_GOAL_TYPES = (GoalType.WEIGHT_LOSS, GoalType.MAINTENANCE)
+# Sentido em que a meta é concluída; manutenção não se conclui por medida
+GOAL_DIRECTIONS = {GoalType.WEIGHT_LOSS: -1, GoalType.MUSCLE_GAIN: 1}
+
+class InvalidGranularity(ValueError):
+    """Granularidade de histórico desconhecida"""
+
+def measurement_field(goal_type, unit=None):
+    """Coluna de BodyMeasurement que mede a meta (None se o tipo não tem medida corporal)"""
+    if goal_type in BODY_FAT_GOAL_TYPES and unit and unit.strip() in BODY_FAT_UNITS:
+        return 'body_fat_percentage'
+    return GOAL_MEASUREMENT_FIELDS.get(goal_type)
+
+def measurement_field_clauses():
+    """Versão SQL de measurement_field: [(condição sobre a meta, coluna de medida)]"""
+    body_fat = db.and_(
+        Goal.goal_type.in_(BODY_FAT_GOAL_TYPES),
+        db.func.coalesce(db.func.trim(Goal.unit), '').in_(BODY_FAT_UNITS)
+    )
+    clauses = [(body_fat, 'body_fat_percentage')]
+    for goal_type, field in GOAL_MEASUREMENT_FIELDS.items():
+        condition = Goal.goal_type == goal_type
+        if goal_type in BODY_FAT_GOAL_TYPES:
+            condition = db.and_(condition, db.not_(body_fat))
+        clauses.append((condition, field))
+    return clauses
+
+def apply_measurement(user_id, values, now=None):
+    """
+    Atualiza num único UPDATE o valor atual de todas as metas ativas do usuário
+    medidas por algum campo presente em `values` e, no mesmo comando, conclui as
+    que atingiram o alvo. Retorna as metas concluídas (dicionários) para os eventos.
+    """
+    now = now or datetime.now(timezone.utc)
+    branches = [
+        (condition, db.literal(values[field], db.Float))
+        for condition, field in measurement_field_clauses() if values.get(field) is not None
+    ]
+    if not branches:
+        return []
+
+    new_value = db.case(*branches)
+    reached = db.or_(*[
+        db.and_(Goal.goal_type == goal_type, new_value <= Goal.target_value if direction < 0 else new_value >= Goal.target_value)
+        for goal_type, direction in GOAL_DIRECTIONS.items()
+    ])
+    completed = db.literal(GoalStatus.COMPLETED, Goal.__table__.c.status.type)
+    stmt = db.update(Goal.__table__).where(
+        Goal.user_id == user_id,
+        Goal.status == GoalStatus.ACTIVE,
+        db.or_(*[condition for condition, _ in branches])
+    ).values(
+        current_value=new_value,
+        status=db.case((db.and_(Goal.target_value.isnot(None), reached), completed), else_=Goal.status),
+        updated_at=now
+    )
+    columns = (Goal.id, Goal.title, Goal.goal_type, Goal.target_value, Goal.current_value)
+
+    if db.session.get_bind().dialect.update_returning:
+        rows = [row for row in db.session.execute(stmt.returning(*columns, Goal.status)) if row.status == GoalStatus.COMPLETED]
+    else:
+        # Sem RETURNING: as concluídas agora são as marcadas com este updated_at
+        db.session.execute(stmt)
+        rows = db.session.execute(db.select(*columns).where(
+            Goal.user_id == user_id, Goal.status == GoalStatus.COMPLETED, Goal.updated_at == now
+        ))
+    return [
+        {
+            'id': row.id,
+            'title': row.title,
+            'goal_type': row.goal_type.value,
+            'target_value': row.target_value,
+            'current_value': row.current_value
+        }
+        for row in rows
+    ]
+
+def measurement_version(user_id):
+    """Versão barata das medidas do usuário (contagem e maior id): muda a cada nova medida"""
+    return tuple(db.session.query(
+        db.func.count(BodyMeasurement.id), db.func.max(BodyMeasurement.id)
+    ).filter(BodyMeasurement.user_id == user_id).one())
+
+# Histórico e previsões por meta, versionados pelas medidas do usuário
+progress_cache = VersionedCache()
+
+def _as_date(value):
+    # SQLite devolve o início do período como texto; o PostgreSQL, como timestamp
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+def bucketed_history(user_id, field, since=None, granularity=DEFAULT_GRANULARITY):
+    """
+    Mínimo, média, último valor e contagem por período, agregados no banco:
+    funções de janela particionadas pelo início do período e uma linha por período.
+    """
+    column = getattr(BodyMeasurement, field)
+    bucket = date_bucket(BodyMeasurement.measured_at, granularity)
+    conditions = [BodyMeasurement.user_id == user_id, column.isnot(None)]
+    if since is not None:
+        conditions.append(BodyMeasurement.measured_at >= since)
+
+    ranked = db.select(
+        bucket.label('bucket'),
+        db.func.min(column).over(partition_by=bucket).label('min'),
+        db.func.avg(column).over(partition_by=bucket).label('avg'),
+        db.func.count(column).over(partition_by=bucket).label('count'),
+        column.label('last'),
+        db.func.row_number().over(
+            partition_by=bucket, order_by=(BodyMeasurement.measured_at.desc(), BodyMeasurement.id.desc())
+        ).label('position')
+    ).where(*conditions).subquery()
+    rows = db.session.execute(
+        db.select(ranked.c.bucket, ranked.c.min, ranked.c.avg, ranked.c.last, ranked.c['count'])
+        .where(ranked.c.position == 1).order_by(ranked.c.bucket)
+    )
+    return [
+        {
+            'date': _as_date(bucket_start).isoformat(),
+            'value': round(last, 2),
+            'min': round(minimum, 2),
+            'avg': round(float(average), 2),
+            'last': round(last, 2),
+            'count': count
+        }
+        for bucket_start, minimum, average, last, count in rows
+    ]
+
+def goal_progress_history(goal, granularity=None):
+    """
+    Histórico real da meta a partir das medidas desde a sua criação, agrupado por
+    período. Fica em cache por meta até o usuário registrar uma medida nova.
+    """
+    granularity = granularity or DEFAULT_GRANULARITY
+    if granularity not in GRANULARITIES:
+        raise InvalidGranularity(f'Granularidade inválida. Use: {", ".join(GRANULARITIES)}')
+    field = measurement_field(goal.goal_type, goal.unit)
+    if field is None:
+        return None, []
+
+    key = ('history', goal.id, field, granularity, goal.created_at)
+    history = progress_cache.get(
+        key, measurement_version(goal.user_id),
+        lambda: bucketed_history(goal.user_id, field, goal.created_at, granularity)
+    )
+    return field, history
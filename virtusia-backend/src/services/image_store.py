@@ -0,0 +1,101 @@
+import hashlib
+import os
+import re
+import tempfile
+
+from flask import current_app, send_file
+from PIL import Image
+
+from src.services import images
+
+# Renditions geradas uma única vez na ingestão: lado máximo em pixels
+RENDITIONS = {
+    'thumb': 256,
+    'medium': 1024,
+}
+RENDITION_QUALITY = 82
+# O conteúdo de uma URL nunca muda (endereçada pelo hash), então pode ficar em cache para sempre
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+_DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+class ImageNotFound(LookupError):
+    """Hash ou rendition inexistente no armazenamento"""
+
+def store_root():
+    return current_app.config['IMAGE_STORE_DIR']
+
+def _directory(digest):
+    # Dois níveis evitam diretórios com milhões de entradas
+    return os.path.join(store_root(), digest[:2], digest)
+
+def rendition_path(digest, rendition):
+    """Caminho do arquivo de uma rendition; ImageNotFound se o pedido é inválido"""
+    if rendition not in RENDITIONS or not _DIGEST_PATTERN.match(digest):
+        raise ImageNotFound(digest)
+    return os.path.join(_directory(digest), f'{rendition}.jpg')
+
+def image_urls(digest):
+    """URLs públicas de cada rendition"""
+    return {rendition: f'/api/meals/images/{digest}/{rendition}' for rendition in RENDITIONS}
+
+def _write_jpeg(image, path):
+    # Grava em arquivo temporário e renomeia: leitores nunca veem um JPEG pela metade
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            image.save(target, 'JPEG', quality=RENDITION_QUALITY, optimize=True, progressive=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+def store_upload(fileobj):
+    """
+    Guarda uma foto pelo SHA-256 do arquivo enviado e gera as renditions.
+    Se o mesmo arquivo já foi enviado antes, nada é decodificado de novo.
+    Retorna (hash, criada) e fecha o arquivo.
+    """
+    try:
+        digest = hashlib.file_digest(fileobj, 'sha256').hexdigest()
+        fileobj.seek(0)
+    except BaseException:
+        fileobj.close()
+        raise
+
+    # A maior rendition é gravada por último e marca o conjunto como completo
+    largest = max(RENDITIONS, key=RENDITIONS.get)
+    if os.path.exists(rendition_path(digest, largest)):
+        fileobj.close()
+        return digest, False
+
+    # Decodifica uma vez já reduzido (draft) e deriva as menores a partir dele
+    image, _ = images.load_for_model(fileobj, size=RENDITIONS[largest])
+    os.makedirs(_directory(digest), exist_ok=True)
+    for rendition, size in sorted(RENDITIONS.items(), key=lambda item: item[1]):
+        if rendition == largest:
+            continue
+        smaller = image.copy()
+        smaller.thumbnail((size, size), Image.Resampling.LANCZOS)
+        _write_jpeg(smaller, rendition_path(digest, rendition))
+    _write_jpeg(image, rendition_path(digest, largest))
+    return digest, True
+
+def send_rendition(digest, rendition):
+    """
+    Resposta com ETag forte, Cache-Control imutável, 304 para If-None-Match e
+    suporte a Range (via send_file condicional do Werkzeug).
+    """
+    path = rendition_path(digest, rendition)
+    try:
+        response = send_file(
+            path,
+            mimetype='image/jpeg',
+            etag=f'{digest}-{rendition}',
+            max_age=IMMUTABLE_MAX_AGE,
+            conditional=True
+        )
+    except FileNotFoundError as e:
+        raise ImageNotFound(digest) from e
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,151 @@
+import base64
+import binascii
+import os
+import tempfile
+import threading
+
+import psutil
+from PIL import Image, ImageOps
+
+MODEL_INPUT_SIZE = 512            # lado máximo da imagem entregue ao modelo
+SPOOL_MAX_MEMORY = 512 * 1024     # acima disso o upload vai para disco
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+MAX_SOURCE_PIXELS = 40_000_000    # ~40 MP: limite antes de qualquer decodificação
+MAX_DECODE_PIXELS = 16_000_000    # o que de fato é decodificado (após draft): ~64 MB em RGBA
+MAX_CONCURRENT_DECODES = 2        # decodificações simultâneas por worker
+COPY_CHUNK_SIZE = 64 * 1024
+
+RAW_CONTENT_TYPES = ('image/', 'application/octet-stream')
+
+# Evita que o Pillow aceite bombas de descompressão acima do nosso próprio limite
+Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+
+_decode_slots = threading.BoundedSemaphore(MAX_CONCURRENT_DECODES)
+
+class InvalidImage(ValueError):
+    """Upload ausente, grande demais ou que não é uma imagem legível"""
+
+class ImageBusy(RuntimeError):
+    """Todas as vagas de decodificação deste worker estão ocupadas"""
+
+def _spool():
+    return tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+
+def _copy_limited(source, target, max_bytes):
+    total = 0
+    while True:
+        chunk = source.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if total > max_bytes:
+            raise InvalidImage('Imagem excede o tamanho máximo permitido')
+        target.write(chunk)
+    if not total:
+        raise InvalidImage('Imagem é obrigatória')
+    target.seek(0)
+    return target
+
+def _decode_base64(data, max_bytes):
+    if ',' in data[:100] and data.startswith('data:'):
+        data = data.split(',', 1)[1]
+    if len(data) * 3 // 4 > max_bytes:
+        raise InvalidImage('Imagem excede o tamanho máximo permitido')
+    try:
+        raw = base64.b64decode(data, validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidImage('Imagem em base64 inválida') from e
+    spool = _spool()
+    spool.write(raw)
+    spool.seek(0)
+    return spool
+
+def read_upload(request, max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Obtém a imagem da requisição como arquivo (em memória até 512 KB, depois em disco).
+    Aceita multipart (campo `image`), corpo binário (image/* ou octet-stream) e,
+    para clientes antigos, JSON com `image` em base64.
+    Retorna (arquivo, campos) onde `campos` traz os demais parâmetros (ex.: meal_type).
+    """
+    content_type = request.mimetype or ''
+
+    if content_type == 'multipart/form-data':
+        upload = request.files.get('image')
+        if upload is None:
+            raise InvalidImage('Imagem é obrigatória')
+        # O Werkzeug já gravou a parte em arquivo temporário durante o parse
+        stream = upload.stream
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        if size > max_bytes:
+            raise InvalidImage('Imagem excede o tamanho máximo permitido')
+        if not size:
+            raise InvalidImage('Imagem é obrigatória')
+        stream.seek(0)
+        return stream, request.form
+
+    if content_type.startswith(RAW_CONTENT_TYPES):
+        return _copy_limited(request.stream, _spool(), max_bytes), request.args
+
+    data = request.get_json(silent=True) or {}
+    if not data.get('image'):
+        raise InvalidImage('Imagem é obrigatória')
+    return _decode_base64(data['image'], max_bytes), data
+
+def rss_bytes():
+    """
+    Memória residente atual do processo. Não é o ru_maxrss: esse é o pico da vida
+    do processo e, depois da primeira imagem grande, não muda mais por requisição.
+    """
+    return psutil.Process().memory_info().rss
+
+def load_for_model(fileobj, size=MODEL_INPUT_SIZE):
+    """
+    Decodifica a imagem já na resolução de trabalho do modelo.
+    Para JPEG, draft() faz o decodificador reduzir em 1/2, 1/4 ou 1/8 durante a
+    leitura, então a imagem completa nunca é materializada; depois aplica a
+    orientação EXIF uma única vez e reduz ao tamanho final.
+    Retorna (imagem RGB, estatísticas do processamento).
+    """
+    if not _decode_slots.acquire(blocking=False):
+        raise ImageBusy('Muitas análises simultâneas; tente novamente')
+    try:
+        rss_before = rss_bytes()
+        try:
+            image = Image.open(fileobj)
+        except (Image.DecompressionBombError, OSError) as e:
+            raise InvalidImage('Arquivo não é uma imagem válida') from e
+
+        source_size = image.size
+        if source_size[0] * source_size[1] > MAX_SOURCE_PIXELS:
+            raise InvalidImage('Resolução da imagem excede o limite')
+
+        try:
+            image.draft('RGB', (size, size))
+            # Com as vagas limitadas, o pico por worker fica em ~MAX_CONCURRENT_DECODES x 64 MB
+            if image.width * image.height > MAX_DECODE_PIXELS:
+                raise InvalidImage('Resolução da imagem excede o limite')
+            if image.width > 2 * size or image.height > 2 * size:
+                # Formatos sem draft: reduce() faz média por blocos sem reamostrar tudo
+                factor = max(1, min(image.width, image.height) // (2 * size))
+                if factor > 1:
+                    image = image.reduce(factor)
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)
+            image = image.convert('RGB')
+        except (Image.DecompressionBombError, OSError, SyntaxError) as e:
+            raise InvalidImage('Não foi possível decodificar a imagem') from e
+
+        rss_after = rss_bytes()
+        stats = {
+            'source_size': list(source_size),
+            'working_size': list(image.size),
+            # Memória que a decodificação deixou retida (amostras antes e depois;
+            # os buffers temporários do Pillow já foram liberados aqui)
+            'rss_bytes': rss_after,
+            'rss_growth_bytes': rss_after - rss_before
+        }
+        return image, stats
+    finally:
+        _decode_slots.release()
+        fileobj.close()
@@ -0,0 +1,65 @@
+import io
+
+from PIL import Image
+
+def analyze_meal_image(image):
+    """
+    Simula análise de imagem de refeição por IA
+    Recebe a imagem RGB já na resolução de trabalho (images.MODEL_INPUT_SIZE);
+    em uma implementação real, aqui seria integrado com modelos de ML
+    """
+    # Simulação de análise de IA
+    mock_analysis = {
+        'detected_foods': [
+            {
+                'name': 'Frango Grelhado',
+                'confidence': 0.92,
+                'quantity': 150,
+                'unit': 'g',
+                'calories_per_100g': 165,
+                'protein_per_100g': 31,
+                'carbs_per_100g': 0,
+                'fat_per_100g': 3.6
+            },
+            {
+                'name': 'Arroz Branco',
+                'confidence': 0.88,
+                'quantity': 100,
+                'unit': 'g',
+                'calories_per_100g': 130,
+                'protein_per_100g': 2.7,
+                'carbs_per_100g': 28,
+                'fat_per_100g': 0.3
+            },
+            {
+                'name': 'Brócolis',
+                'confidence': 0.85,
+                'quantity': 80,
+                'unit': 'g',
+                'calories_per_100g': 34,
+                'protein_per_100g': 2.8,
+                'carbs_per_100g': 7,
+                'fat_per_100g': 0.4
+            }
+        ],
+        'total_calories': 295,
+        'total_protein': 52.5,
+        'total_carbs': 33.6,
+        'total_fat': 5.7,
+        'health_score': 85,
+        'recommendations': [
+            'Excelente fonte de proteína magra!',
+            'Adicione mais vegetais coloridos para aumentar a variedade de nutrientes',
+            'Considere trocar o arroz branco por integral para mais fibras'
+        ]
+    }
+    
+    return mock_analysis
+
+def analyze_image_bytes(data):
+    """
+    Ponto de entrada dos processos do pool de análise: recebe a imagem de trabalho
+    já codificada (JPEG) e não depende de banco nem do contexto da aplicação
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        return analyze_meal_image(image.convert('RGB'))
@@ -0,0 +1,136 @@
+import json
+import numbers
+from datetime import datetime, timezone
+
+from src.models.user import db
+from src.models.meal import Meal, MealFood, MealType, normalize_food_name
+from src.services import daily_stats
+from src.services.foods import resolve_foods, meal_food_rows
+from src.services.sql import copy_rows
+
+MAX_BATCH_MEALS = 5000
+MAX_FOODS_PER_MEAL = 100
+INSERT_CHUNK_SIZE = 1000
+MEAL_FOOD_COLUMNS = ('meal_id', 'food_id', 'quantity', 'unit')
+
+NUMERIC_FIELDS = ('total_calories', 'total_protein', 'total_carbs', 'total_fat', 'total_fiber', 'health_score')
+# Tamanhos das colunas de texto (Meal.image_url, MealFood.unit)
+MAX_IMAGE_URL_LENGTH = 255
+MAX_UNIT_LENGTH = 20
+
+class InvalidMeal(ValueError):
+    """Item do lote com dados inválidos; vai para o relatório e não é inserido"""
+
+def _number(data, field):
+    value = data.get(field)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, numbers.Real):
+        raise InvalidMeal(f'Campo {field} deve ser numérico')
+    return float(value)
+
+def _text(data, field, max_length):
+    value = data.get(field)
+    if value is None:
+        return None
+    if not isinstance(value, str) or len(value) > max_length:
+        raise InvalidMeal(f'Campo {field} deve ser texto (máximo {max_length} caracteres)')
+    return value
+
+def _created_at(value, now):
+    if value is None:
+        return now
+    try:
+        created_at = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidMeal('Data da refeição inválida. Use formato ISO 8601')
+    if created_at.tzinfo is None:
+        return created_at.replace(tzinfo=timezone.utc)
+    return created_at.astimezone(timezone.utc)
+
+def validate_meal(user_id, data, now):
+    """
+    Valida um item do lote e devolve (linha da tabela meals, alimentos).
+    `created_at` é opcional: clientes offline enviam o horário em que a refeição ocorreu.
+    """
+    if not isinstance(data, dict):
+        raise InvalidMeal('Refeição deve ser um objeto')
+    try:
+        meal_type = MealType(data.get('meal_type'))
+    except ValueError:
+        raise InvalidMeal('Tipo de refeição inválido')
+
+    foods_data = data.get('foods') or []
+    if not isinstance(foods_data, list) or len(foods_data) > MAX_FOODS_PER_MEAL:
+        raise InvalidMeal(f'Lista de alimentos inválida (máximo {MAX_FOODS_PER_MEAL})')
+    for food_data in foods_data:
+        if not isinstance(food_data, dict) or not isinstance(food_data.get('name'), str) \
+                or not normalize_food_name(food_data['name']):
+            raise InvalidMeal('Nome do alimento é obrigatório')
+        _number(food_data, 'quantity')
+        _text(food_data, 'unit', MAX_UNIT_LENGTH)
+
+    try:
+        ai_analysis_result = json.dumps(data.get('ai_analysis_result', {}))
+    except (TypeError, ValueError):
+        raise InvalidMeal('Campo ai_analysis_result deve ser serializável em JSON')
+
+    row = {field: _number(data, field) for field in NUMERIC_FIELDS}
+    row.update({
+        'user_id': user_id,
+        'meal_type': meal_type,
+        'image_url': _text(data, 'image_url', MAX_IMAGE_URL_LENGTH),
+        'ai_analysis_result': ai_analysis_result,
+        'created_at': _created_at(data.get('created_at'), now)
+    })
+    return row, foods_data
+
+def _insert_meals(rows):
+    # executemany com RETURNING (insertmanyvalues): ids na mesma ordem das linhas
+    stmt = Meal.__table__.insert().returning(Meal.__table__.c.id, sort_by_parameter_order=True)
+    ids = []
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        ids.extend(db.session.execute(stmt, rows[start:start + INSERT_CHUNK_SIZE]).scalars())
+    return ids
+
+def _insert_meal_foods(rows):
+    table = MealFood.__table__
+    # No PostgreSQL os itens vão num único COPY, sem o custo por linha do executemany
+    if copy_rows(table, rows, MEAL_FOOD_COLUMNS):
+        return
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        db.session.execute(table.insert(), rows[start:start + INSERT_CHUNK_SIZE])
+
+def import_meals(user_id, items):
+    """
+    Importa um lote de refeições de um usuário numa única transação.
+    Todos os itens são validados antes de qualquer escrita; os inválidos entram no
+    relatório e os demais são inseridos em lote (alimentos resolvidos de uma vez,
+    refeições e itens via executemany em blocos, consolidado diário por dia).
+    Retorna (relatório por item, novos alimentos, ids de alimentos usados); não faz commit.
+    """
+    now = datetime.now(timezone.utc)
+    results = [None] * len(items)
+    valid = []
+    for index, data in enumerate(items):
+        try:
+            row, foods_data = validate_meal(user_id, data, now)
+        except InvalidMeal as e:
+            results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+            continue
+        valid.append((index, row, foods_data))
+
+    if not valid:
+        return results, [], []
+
+    foods, new_foods = resolve_foods([food_data for _, _, foods_data in valid for food_data in foods_data])
+    meal_ids = _insert_meals([row for _, row, _ in valid])
+
+    item_rows = []
+    for (index, _, foods_data), meal_id in zip(valid, meal_ids):
+        item_rows.extend(meal_food_rows(meal_id, foods_data, foods))
+        results[index] = {'index': index, 'status': 'created', 'id': meal_id}
+    _insert_meal_foods(item_rows)
+
+    daily_stats.record_meal_rows([row for _, row, _ in valid])
+    return results, new_foods, [row['food_id'] for row in item_rows]
@@ -0,0 +1,233 @@
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from src.models.user import db
+from src.models.goal import BodyMeasurement
+
+# Coluna -> chave na resposta (as três primeiras mantêm os nomes antigos da API)
+FIELDS = {
+    'weight': 'weight',
+    'body_fat_percentage': 'body_fat',
+    'muscle_mass': 'muscle_mass',
+    'waist_circumference': 'waist_circumference',
+    'chest_circumference': 'chest_circumference',
+    'arm_circumference': 'arm_circumference',
+    'hip_circumference': 'hip_circumference',
+}
+WINDOWS = {'30d': 30, '90d': 90, '180d': 180, '1y': 365, '2y': 730, 'all': None}
+DEFAULT_WINDOW = '90d'
+EWMA_HALF_LIFE_DAYS = 7.0
+ROLLING_DAYS = (7, 30)
+MIN_POINTS = 3
+# A reta só é ajustada com leituras suficientes e espalhadas no tempo: duas
+# pesagens com minutos de diferença dariam inclinações absurdas
+MIN_FIT_POINTS = 3
+MIN_FIT_SPAN_DAYS = 7.0
+MAX_POINTS = 2000
+STABLE_WEEKLY_SHARE = 0.0005  # |inclinação| abaixo de 0,05% da média por semana conta como estável
+MAX_EXPONENT = 600.0         # limite do expoente dos pesos da EWMA (exp(±600) cabe em float64)
+
+class InvalidTrendRequest(ValueError):
+    """Janela ou número de pontos inválidos"""
+
+def resolve_request(window=None, points=None):
+    """Valida janela e pontos pedidos; devolve (janela, dias ou None, pontos ou None)"""
+    window = window or DEFAULT_WINDOW
+    if window not in WINDOWS:
+        raise InvalidTrendRequest(f'Janela inválida. Use: {", ".join(WINDOWS)}')
+    if points is not None:
+        try:
+            points = int(points)
+        except (TypeError, ValueError):
+            raise InvalidTrendRequest('points deve ser um número inteiro')
+        if not MIN_POINTS <= points <= MAX_POINTS:
+            raise InvalidTrendRequest(f'points deve estar entre {MIN_POINTS} e {MAX_POINTS}')
+    return window, WINDOWS[window], points
+
+def load_series(user_id, since=None):
+    """
+    Uma consulta só com as colunas de medida, em ordem cronológica.
+    Retorna (instantes datetime64, matriz n x campos com NaN onde não houve medida).
+    """
+    query = db.session.query(
+        BodyMeasurement.measured_at, *(getattr(BodyMeasurement, column) for column in FIELDS)
+    ).filter(BodyMeasurement.user_id == user_id)
+    if since is not None:
+        query = query.filter(BodyMeasurement.measured_at >= since)
+    rows = query.order_by(BodyMeasurement.measured_at, BodyMeasurement.id).all()
+    if not rows:
+        return np.zeros(0, dtype='datetime64[us]'), np.zeros((0, len(FIELDS)))
+    columns = list(zip(*rows))
+    times = np.array([
+        value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value for value in columns[0]
+    ], dtype='datetime64[us]')
+    return times, np.array(columns[1:], dtype=np.float64).T
+
+def _ewma(days, filled, valid):
+    # EWMA em tempo irregular na forma normalizada: soma(w·x) / soma(w) com
+    # w = exp(t / tau); acumulada para todos os campos de uma vez
+    tau = EWMA_HALF_LIFE_DAYS / math.log(2)
+    exponent = np.clip((days - days[-1]) / tau + MAX_EXPONENT, -MAX_EXPONENT, MAX_EXPONENT)
+    weights = np.exp(exponent)[:, None] * valid
+    return np.cumsum(weights * filled, axis=0) / np.cumsum(weights, axis=0)
+
+def _rolling(days, sums, counts, at, window_days):
+    """
+    Média móvel por tempo em `at` (uma leitura por campo): janela de window_days
+    terminando na leitura, a partir das somas prefixadas
+    """
+    fields = np.arange(sums.shape[1])
+    start = np.searchsorted(days, days[at] - window_days, side='right')
+    return (sums[at + 1, fields] - sums[start, fields]) / (counts[at + 1, fields] - counts[start, fields])
+
+def latest_smoothed(days, filled, valid):
+    """EWMA de cada coluna na sua última leitura (NaN se a coluna não tem leituras)"""
+    last = len(days) - 1 - valid[::-1].argmax(axis=0)
+    return _ewma(days, filled, valid)[last, np.arange(valid.shape[1])]
+
+def linear_fit(days, filled, valid):
+    """
+    Mínimos quadrados por coluna, ignorando lacunas. Retorna arrays por coluna:
+    (inclinação por dia, média do tempo, média do valor, soma dos quadrados do
+    tempo centrado, variância residual). A inclinação é NaN com menos de
+    MIN_FIT_POINTS leituras ou se elas cobrem menos de MIN_FIT_SPAN_DAYS.
+    """
+    count = valid.sum(axis=0)
+    span = np.where(valid, days[:, None], -np.inf).max(axis=0) - np.where(valid, days[:, None], np.inf).min(axis=0)
+    mean_t = (valid * days[:, None]).sum(axis=0) / count
+    mean_y = filled.sum(axis=0) / count
+    centered = (days[:, None] - mean_t) * valid
+    sxx = (centered ** 2).sum(axis=0)
+    slope = (centered * (filled - mean_y) * valid).sum(axis=0) / sxx
+    slope = np.where((count >= MIN_FIT_POINTS) & (span >= MIN_FIT_SPAN_DAYS), slope, np.nan)
+    residuals = (filled - mean_y - slope * centered) * valid
+    variance = (residuals ** 2).sum(axis=0) / (count - 2)
+    return slope, mean_t, mean_y, sxx, variance
+
+def _lttb(days, values, valid, sums, counts, first, last, points):
+    """
+    Largest-Triangle-Three-Buckets: índices escolhidos (points x campos, -1 onde o
+    campo não tem leitura no balde). As médias dos baldes saem das somas prefixadas;
+    o laço é sobre os baldes e, em cada um, todos os campos são tratados de uma vez.
+    """
+    n, width = values.shape
+    fields = np.arange(width)
+    selected = np.full((points, width), -1, dtype=np.intp)
+    selected[0] = first
+    selected[-1] = last
+
+    # Baldes [edges[b], edges[b + 1]) entre a primeira e a última leitura; o "próximo"
+    # do último balde é a última leitura do campo
+    edges = np.linspace(1, n - 1, points - 1).astype(np.intp)
+    time_sums = np.vstack([np.zeros(width), np.cumsum(valid * days[:, None], axis=0)])
+    bucket_counts = counts[edges[1:]] - counts[edges[:-1]]
+    empty = bucket_counts == 0
+    mean_t = np.where(empty, days[last], (time_sums[edges[1:]] - time_sums[edges[:-1]]) / bucket_counts)
+    mean_y = np.where(empty, values[last, fields], (sums[edges[1:]] - sums[edges[:-1]]) / bucket_counts)
+    next_t = np.vstack([mean_t[1:], days[last]])
+    next_y = np.vstack([mean_y[1:], values[last, fields]])
+
+    anchor_t = days[first]
+    anchor_y = values[first, fields]
+    for bucket in range(points - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        if high <= low:
+            continue
+        area = np.abs(
+            (anchor_t - next_t[bucket]) * (values[low:high] - anchor_y)
+            - (anchor_t - days[low:high, None]) * (next_y[bucket] - anchor_y)
+        )
+        area = np.where(valid[low:high], area, -1.0)
+        chosen = low + area.argmax(axis=0)
+        present = ~empty[bucket]
+        selected[bucket + 1] = np.where(present, chosen, -1)
+        anchor_t = np.where(present, days[chosen], anchor_t)
+        anchor_y = np.where(present, values[chosen, fields], anchor_y)
+    return selected
+
+def _round(value, digits=3):
+    return None if not np.isfinite(value) else round(float(value), digits)
+
+def compute_trends(times, values, points=None):
+    """
+    Tendências de todos os campos numa passada vetorizada sobre a matriz n x campos:
+    EWMA (meia-vida de 7 dias), inclinação de mínimos quadrados (por semana; None
+    sem pontos ou período suficientes para a reta), médias móveis de 7 e 30 dias e, se `points` for dado, a série reduzida por LTTB.
+    Campos com menos de duas leituras ficam de fora.
+    """
+    if len(times) == 0:
+        return {}
+    days = (times - times[0]) / np.timedelta64(1, 'D')
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    count = valid.sum(axis=0)
+    rows = np.arange(len(times))
+    first = valid.argmax(axis=0)
+    last = len(times) - 1 - valid[::-1].argmax(axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smoothed = _ewma(days, filled, valid)
+        sums = np.vstack([np.zeros(values.shape[1]), np.cumsum(filled, axis=0)])
+        counts = np.vstack([np.zeros(values.shape[1]), np.cumsum(valid, axis=0)])
+        rolling = {window: _rolling(days, sums, counts, last, window) for window in ROLLING_DAYS}
+        weekly = linear_fit(days, filled, valid)[0] * 7
+        mean = sums[-1] / count
+        low = np.where(valid, values, np.inf).min(axis=0)
+        high = np.where(valid, values, -np.inf).max(axis=0)
+        selected = _lttb(days, values, valid, sums, counts, first, last, points) if points and len(times) > points else None
+
+    fields = np.arange(values.shape[1])
+    current = values[last, fields]
+    initial = values[first, fields]
+
+    trends = {}
+    for index, (column, key) in enumerate(FIELDS.items()):
+        if count[index] < 2:
+            continue
+        slope = weekly[index]
+        change = float(current[index] - initial[index])
+        if not np.isfinite(slope):
+            # Sem reta confiável (poucas leituras ou período curto): regra antiga, pela variação
+            direction = 'decreasing' if change < 0 else 'increasing' if change > 0 else 'stable'
+        elif abs(slope) < STABLE_WEEKLY_SHARE * abs(mean[index]):
+            direction = 'stable'
+        else:
+            direction = 'increasing' if slope > 0 else 'decreasing'
+        trend = {
+            'current': float(current[index]),
+            'initial': float(initial[index]),
+            'change': change,
+            'trend': direction,
+            'data_points': int(count[index]),
+            'smoothed': _round(smoothed[last[index], index]),
+            'slope_per_week': _round(slope, 4),
+            'min': float(low[index]),
+            'max': float(high[index]),
+        }
+        for window in ROLLING_DAYS:
+            trend[f'rolling_{window}d'] = _round(rolling[window][index])
+
+        if points:
+            if selected is None:
+                chosen = rows[valid[:, index]]
+            else:
+                column_selected = selected[:, index]
+                chosen = np.unique(column_selected[column_selected >= 0])
+            stamps = np.datetime_as_string(times[chosen], unit='s')
+            trend['series'] = [
+                {'measured_at': stamp, 'value': float(values[row, index]), 'smoothed': _round(smoothed[row, index])}
+                for stamp, row in zip(stamps.tolist(), chosen.tolist())
+            ]
+        trends[key] = trend
+    return trends
+
+def measurement_trends(user_id, window=None, points=None, now=None):
+    """Retorna (janela, total de leituras, tendências) do usuário na janela pedida"""
+    window, days, points = resolve_request(window, points)
+    since = None
+    if days is not None:
+        since = (now or datetime.now(timezone.utc)) - timedelta(days=days)
+    times, values = load_series(user_id, since)
+    return window, len(times), compute_trends(times, values, points)
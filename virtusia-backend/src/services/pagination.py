@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from src.models.user import db
+from src.services.sql import dialect_name
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+COUNT_BOUND = 1000  # sem EXPLAIN, conta no máximo isso e informa o total como estimativa
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação malformado ou adulterado"""
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN de uma consulta, usado para estimar totais sem COUNT(*)"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(_Explain, 'postgresql')
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) ' + compiler.process(element.statement, **kw)
+
+def encode_cursor(timestamp, row_id):
+    """Gera um token opaco a partir da chave (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat(), row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """Decodifica um token gerado por encode_cursor"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursor('Cursor inválido') from e
+
+def estimate_count(query):
+    """
+    Total aproximado sem COUNT(*) completo. No PostgreSQL usa a estimativa do
+    planejador; nos demais bancos conta até COUNT_BOUND linhas (COUNT sobre uma
+    subconsulta com LIMIT). Retorna (total, é_estimativa): abaixo do limite a
+    contagem é exata, acima o total é o próprio COUNT_BOUND.
+    """
+    query = query.order_by(None)
+    if dialect_name() == 'postgresql':
+        plan = db.session.execute(_Explain(query.statement)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    bounded = query.with_entities(db.literal(1)).limit(COUNT_BOUND + 1).subquery()
+    total = db.session.query(db.func.count()).select_from(bounded).scalar()
+    if total > COUNT_BOUND:
+        return COUNT_BOUND, True
+    return total, False
+
+class Page:
+    """Página de resultados com cursor para a próxima"""
+
+    def __init__(self, items, limit, offset, next_cursor, total, total_is_estimate):
+        self.items = items
+        self.limit = limit
+        self.offset = offset
+        self.next_cursor = next_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    def meta(self):
+        return {
+            'total': self.total,
+            'total_is_estimate': self.total_is_estimate,
+            'limit': self.limit,
+            'offset': self.offset,
+            'next_cursor': self.next_cursor,
+            'has_more': self.next_cursor is not None
+        }
+
+def paginate(query, timestamp_column, id_column, args):
+    """
+    Pagina por keyset em (timestamp, id) decrescente.
+    Aceita `cursor` (preferido), `offset` (legado), `limit` e `exact_total=1`.
+    """
+    limit = min(max(int(args.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    cursor = args.get('cursor')
+    offset = 0 if cursor else int(args.get('offset', 0))
+    exact_total = args.get('exact_total', '').lower() in ('1', 'true', 'yes')
+
+    base_query = query
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(timestamp_column, id_column) < tuple_(timestamp, row_id))
+
+    query = query.order_by(timestamp_column.desc(), id_column.desc())
+    if offset:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+
+    if exact_total:
+        total, total_is_estimate = base_query.order_by(None).count(), False
+    else:
+        total, total_is_estimate = estimate_count(base_query)
+
+    return Page(rows, limit, offset, next_cursor, total, total_is_estimate)
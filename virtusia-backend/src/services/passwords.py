@@ -0,0 +1,240 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHashError, VerificationError, VerifyMismatchError
+
+# Esquema usado nos hashes novos; hashes de outros esquemas são trocados no login
+DEFAULT_SCHEME = os.getenv('PASSWORD_SCHEME', 'argon2')
+ARGON2_TIME_COST = int(os.getenv('ARGON2_TIME_COST', 3))
+ARGON2_MEMORY_COST = int(os.getenv('ARGON2_MEMORY_COST', 64 * 1024))  # KiB
+ARGON2_PARALLELISM = int(os.getenv('ARGON2_PARALLELISM', 1))  # o paralelismo vem do pool
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+BCRYPT_MAX_BYTES = 72  # o bcrypt só considera os primeiros 72 bytes
+
+HASH_WORKER_PROCESSES = int(os.getenv('HASH_WORKER_PROCESSES', 2))  # por worker do gunicorn; 0 calcula na thread
+HASH_MAX_PENDING = int(os.getenv('HASH_MAX_PENDING', 8))            # em execução + na fila, por worker
+HASH_TIMEOUT_SECONDS = 10
+RETRY_AFTER_SECONDS = 2
+METRICS_WINDOW = 1000  # amostras recentes usadas nos percentis
+
+class HashingBusy(RuntimeError):
+    """Fila de hashing cheia (ou lenta demais); o cliente deve tentar de novo"""
+
+    def __init__(self, message, retry_after=RETRY_AFTER_SECONDS):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class Argon2Scheme:
+    """Argon2id com custos ajustáveis (argon2-cffi)"""
+    name = 'argon2'
+
+    def __init__(self, time_cost, memory_cost, parallelism):
+        self.hasher = PasswordHasher(
+            time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism, type=Type.ID
+        )
+
+    def identify(self, stored):
+        return stored.startswith('$argon2')
+
+    def hash(self, password):
+        return self.hasher.hash(password)
+
+    def verify(self, stored, password):
+        try:
+            return self.hasher.verify(stored, password)
+        except (VerifyMismatchError, VerificationError, InvalidHashError):
+            return False
+
+    def needs_rehash(self, stored):
+        return self.hasher.check_needs_rehash(stored)
+
+class BcryptScheme:
+    """bcrypt, compatível com os hashes gerados pelo Flask-Bcrypt"""
+    name = 'bcrypt'
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+
+    def identify(self, stored):
+        return stored.startswith(('$2a$', '$2b$', '$2y$'))
+
+    def hash(self, password):
+        secret = password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+        return bcrypt.hashpw(secret, bcrypt.gensalt(self.rounds)).decode('utf-8')
+
+    def verify(self, stored, password):
+        try:
+            return bcrypt.checkpw(password.encode('utf-8')[:BCRYPT_MAX_BYTES], stored.encode('utf-8'))
+        except ValueError:
+            return False
+
+    def needs_rehash(self, stored):
+        return int(stored.split('$')[2]) != self.rounds
+
+# Esquemas conhecidos. Para adicionar um, basta uma classe com name, identify, hash,
+# verify e needs_rehash registrada aqui (os processos do pool reimportam este módulo)
+SCHEMES = {
+    scheme.name: scheme for scheme in (
+        Argon2Scheme(ARGON2_TIME_COST, ARGON2_MEMORY_COST, ARGON2_PARALLELISM),
+        BcryptScheme(BCRYPT_ROUNDS),
+    )
+}
+
+def identify(stored):
+    """Esquema que gerou o hash (None se desconhecido)"""
+    for scheme in SCHEMES.values():
+        if stored and scheme.identify(stored):
+            return scheme
+    return None
+
+def needs_rehash(stored):
+    """Hash de outro esquema ou com parâmetros diferentes dos atuais"""
+    scheme = identify(stored)
+    return scheme is None or scheme.name != DEFAULT_SCHEME or scheme.needs_rehash(stored)
+
+def _timed(operation, *args):
+    # Executado no processo do pool: devolve também o instante de início (relógio
+    # de parede, comparável entre processos) e a duração da operação
+    started = time.time()
+    counter = time.perf_counter()
+    result = operation(*args)
+    return result, started, time.perf_counter() - counter
+
+def _hash(password):
+    return SCHEMES[DEFAULT_SCHEME].hash(password)
+
+def _check(stored, password):
+    """(válida, novo hash ou None): o rehash sai na mesma tarefa da verificação"""
+    scheme = identify(stored)
+    if scheme is None or not scheme.verify(stored, password):
+        return False, None
+    if needs_rehash(stored):
+        return True, _hash(password)
+    return True, None
+
+def _hash_task(password):
+    return _timed(_hash, password)
+
+def _check_task(stored, password):
+    return _timed(_check, stored, password)
+
+def _summary(samples):
+    if not samples:
+        return {'p50': None, 'p95': None, 'max': None}
+    ordered = sorted(samples)
+
+    def milliseconds(fraction):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 2)
+
+    return {'p50': milliseconds(0.5), 'p95': milliseconds(0.95), 'max': milliseconds(1.0)}
+
+class HashPool:
+    """
+    Pool de processos para hashing de senha com controle de admissão: no máximo
+    `max_pending` operações em execução ou na fila por worker; acima disso falha na
+    hora com HashingBusy em vez de enfileirar. O pool é criado no primeiro uso
+    (e recriado após fork ou se um filho morrer).
+    """
+
+    def __init__(self, processes=HASH_WORKER_PROCESSES, max_pending=HASH_MAX_PENDING, timeout=HASH_TIMEOUT_SECONDS):
+        self.processes = processes
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._in_flight = 0
+        self._counters = Counter()
+        self._queue_wait = deque(maxlen=METRICS_WINDOW)
+        self._hash_time = deque(maxlen=METRICS_WINDOW)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _track(self, counter, delta=0, samples=None):
+        with self._lock:
+            self._counters[counter] += 1
+            self._in_flight += delta
+            if samples:
+                self._queue_wait.append(samples[0])
+                self._hash_time.append(samples[1])
+
+    def run(self, task, *args):
+        """Executa a tarefa no pool e devolve o seu resultado"""
+        if not self._slots.acquire(blocking=False):
+            self._track('rejected')
+            raise HashingBusy('Muitas autenticações simultâneas; tente novamente em instantes')
+        self._track('submitted', 1)
+        try:
+            submitted = time.time()
+            if self.processes <= 0:
+                result, started, elapsed = task(*args)
+            else:
+                future = self._get_executor().submit(task, *args)
+                try:
+                    result, started, elapsed = future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    future.cancel()
+                    raise HashingBusy('Autenticação demorou demais; tente novamente')
+                except BrokenProcessPool:
+                    self._reset()
+                    raise
+        except Exception:
+            self._track('failed', -1)
+            raise
+        finally:
+            self._slots.release()
+        self._track('completed', -1, (max(started - submitted, 0.0), elapsed))
+        return result
+
+    def metrics(self):
+        """Contadores e percentis (ms) de espera na fila e de tempo de hash"""
+        with self._lock:
+            return {
+                'scheme': DEFAULT_SCHEME,
+                'processes': self.processes,
+                'max_pending': self.max_pending,
+                'in_flight': self._in_flight,
+                'submitted': self._counters['submitted'],
+                'completed': self._counters['completed'],
+                'rejected': self._counters['rejected'],
+                'failed': self._counters['failed'],
+                'queue_wait_ms': _summary(self._queue_wait),
+                'hash_time_ms': _summary(self._hash_time)
+            }
+
+pool = HashPool()
+
+def hash_password(password):
+    """Hash da senha no esquema atual, calculado no pool (pode levantar HashingBusy)"""
+    return pool.run(_hash_task, password)
+
+def verify_password(stored, password):
+    """
+    Verifica a senha no pool. Retorna (válida, novo hash ou None); o novo hash vem
+    quando o armazenado é de outro esquema ou tem parâmetros desatualizados.
+    """
+    return pool.run(_check_task, stored or '', password)
+
+def metrics():
+    return pool.metrics()
@@ -0,0 +1,167 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import tempfile
+import threading
+import time
+
+from flask import current_app, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+SLOTS = int(os.getenv('RATE_LIMIT_SLOTS', 65536))  # baldes no segmento (24 bytes cada)
+PROBE_SLOTS = 8    # baldes examinados por chave; cheio, reaproveita o mais antigo
+LOCK_STRIPES = 64  # travas por faixa de bytes: workers em chaves diferentes não se esperam
+SEGMENT_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+SEGMENT_PATH = os.getenv('RATE_LIMIT_FILE', os.path.join(SEGMENT_DIR, 'virtusia-rate-limit'))
+
+# Limites por blueprint: chave -> (requisições, janela em segundos), num balde de
+# fichas com capacidade = requisições. `endpoints` restringe a parte do blueprint.
+DEFAULT_LIMITS = {
+    'auth': {
+        'endpoints': ('auth.login', 'auth.register'),
+        'limits': {'ip': (20, 60), 'email': (5, 60)}
+    },
+    'ai': {
+        'limits': {'ip': (60, 60), 'user': (20, 60)}
+    },
+}
+
+class SharedRateLimiter:
+    """
+    Baldes de fichas num arquivo mapeado em memória (MAP_SHARED), compartilhado por
+    todos os workers do gunicorn na máquina. Cada balde guarda o hash da chave, as
+    fichas e o instante da última recarga; o acesso é serializado por uma trava
+    da thread e por travas de faixa de bytes (lockf) entre processos.
+    """
+
+    def __init__(self, path=SEGMENT_PATH, slots=SLOTS):
+        self.path = path
+        self.slots = slots - slots % PROBE_SLOTS
+        self.groups = self.slots // PROBE_SLOTS
+        self._lock = threading.Lock()
+        self._map = None
+        self._pid = None
+
+    def _open(self):
+        size = self.slots * 24
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size, mmap.MAP_SHARED)
+        self._keys = memoryview(self._map)[:self.slots * 8].cast('Q')
+        self._tokens = memoryview(self._map)[self.slots * 8:self.slots * 16].cast('d')
+        self._updated = memoryview(self._map)[self.slots * 16:size].cast('d')
+        self._pid = os.getpid()
+
+    def hit(self, key, capacity, window, now=None):
+        """
+        Consome uma ficha da chave. Retorna 0 se a requisição passa, senão os
+        segundos até haver ficha de novo.
+        """
+        digest = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+        group = digest % self.groups
+        start = group * PROBE_SLOTS
+        rate = capacity / window
+        stripe = group % LOCK_STRIPES
+
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            keys, tokens, updated = self._keys, self._tokens, self._updated
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                now = now or time.time()
+                slot = -1
+                oldest = start
+                for index in range(start, start + PROBE_SLOTS):
+                    if keys[index] == digest:
+                        slot = index
+                        break
+                    if updated[index] < updated[oldest]:
+                        oldest = index
+                if slot < 0:
+                    # Chave nova: ocupa o balde vazio (ou parado há mais tempo) do grupo
+                    slot = oldest
+                    keys[slot] = digest
+                    available = float(capacity)
+                else:
+                    available = min(float(capacity), tokens[slot] + (now - updated[slot]) * rate)
+                updated[slot] = now
+                if available >= 1:
+                    tokens[slot] = available - 1
+                    return 0
+                tokens[slot] = available
+                return (1 - available) / rate
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, stripe)
+
+    def reset(self):
+        """Zera todos os baldes (uso em manutenção e benchmarks)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            self._map[:] = bytes(len(self._map))
+
+limiter = SharedRateLimiter()
+
+def _email():
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    return email.lower().strip() if isinstance(email, str) and email.strip() else None
+
+def _user():
+    verify_jwt_in_request(optional=True)
+    return get_jwt_identity()
+
+# Como obter o valor de cada tipo de chave; as mais baratas são verificadas antes.
+# O IP é o do cliente porque main.py aplica o ProxyFix (TRUSTED_PROXY_HOPS)
+KEY_SOURCES = {
+    'ip': lambda: request.remote_addr,
+    'email': _email,
+    'user': _user,
+}
+
+REJECTION_MESSAGE = 'Muitas requisições; tente novamente em instantes'
+
+def _rejection(retry_after):
+    # Resposta montada direto, sem passar pelo jsonify: a recusa precisa ser barata
+    retry_after = max(1, math.ceil(retry_after))
+    body = '{"message": "%s", "retry_after": %d}' % (REJECTION_MESSAGE, retry_after)
+    return current_app.response_class(
+        body, status=429, mimetype='application/json', headers={'Retry-After': str(retry_after)}
+    )
+
+def _check(blueprint, rule):
+    endpoints = rule.get('endpoints')
+    if endpoints and request.endpoint not in endpoints:
+        return None
+    for kind in KEY_SOURCES:
+        if kind not in rule['limits']:
+            continue
+        value = KEY_SOURCES[kind]()
+        if value is None:
+            continue
+        requests, window = rule['limits'][kind]
+        retry_after = limiter.hit(f'{blueprint}:{kind}:{value}', requests, window)
+        if retry_after:
+            return _rejection(retry_after)
+    return None
+
+def init_app(app):
+    """
+    Aplica os limites de app.config['RATE_LIMITS'] (padrão: DEFAULT_LIMITS) antes
+    das rotas de cada blueprint. RATE_LIMIT_ENABLED=0 desativa.
+    """
+    app.config.setdefault('RATE_LIMIT_ENABLED', os.getenv('RATE_LIMIT_ENABLED', '1') != '0')
+    app.config.setdefault('RATE_LIMITS', DEFAULT_LIMITS)
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+
+    for blueprint, rule in app.config['RATE_LIMITS'].items():
+        def check(blueprint=blueprint, rule=rule):
+            if current_app.config['RATE_LIMIT_ENABLED']:
+                return _check(blueprint, rule)
+        app.before_request_funcs.setdefault(blueprint, []).append(check)
@@ -0,0 +1,223 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize
+
+from src.models.user import db
+from src.models.meal import Meal, MealFood, Food
+from src.models.exercise import Exercise, UserExercise
+from src.models.recommendation import Recommendation, RecommendationType, RecommendationStatus
+
+HISTORY_DAYS = 180
+MIN_ITEM_USERS = 2          # itens usados por menos usuários não entram no modelo
+DEFAULT_COMPONENTS = 64
+DEFAULT_TOP_K = 10
+DEFAULT_TTL_HOURS = 48      # o job roda diariamente; a folga cobre uma execução perdida
+SCORE_CHUNK_CELLS = 4_000_000  # usuários por bloco x itens: limita a matriz densa de pontuações
+DELETE_CHUNK_SIZE = 1000       # ids por DELETE ... IN na renovação
+MODEL_SOURCE = 'collaborative'
+
+ITEM_TYPES = {
+    'exercise': RecommendationType.EXERCISE,
+    'food': RecommendationType.MEAL,
+}
+
+def _interactions(since):
+    """Contagens (usuário, item) agregadas no banco, sem carregar linhas individuais"""
+    exercises = db.session.query(
+        UserExercise.user_id, UserExercise.exercise_id, db.func.count(UserExercise.id)
+    ).filter(UserExercise.completed_at >= since).group_by(UserExercise.user_id, UserExercise.exercise_id).all()
+    foods = db.session.query(
+        Meal.user_id, MealFood.food_id, db.func.count(MealFood.id)
+    ).join(Meal, Meal.id == MealFood.meal_id).filter(
+        Meal.created_at >= since
+    ).group_by(Meal.user_id, MealFood.food_id).all()
+    return {'exercise': exercises, 'food': foods}
+
+def _block(rows, user_index):
+    """
+    Matriz esparsa usuários x itens de um tipo, com peso log(1 + contagem) e
+    linhas normalizadas (um usuário com muitas refeições não domina o modelo).
+    Itens usados por poucos usuários são descartados.
+    """
+    if not rows:
+        return sparse.csr_matrix((len(user_index), 0), dtype=np.float32), np.zeros(0, dtype=np.int64)
+    users, items, counts = (np.array(column) for column in zip(*rows))
+    item_ids, columns = np.unique(items, return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.log1p(counts).astype(np.float32), (np.searchsorted(user_index, users), columns)),
+        shape=(len(user_index), len(item_ids))
+    )
+    keep = np.flatnonzero(matrix.getnnz(axis=0) >= MIN_ITEM_USERS)
+    return normalize(matrix[:, keep]), item_ids[keep]
+
+def _top_k(scores, k):
+    k = min(k, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1)
+
+def _names(item_type, item_ids):
+    model = Exercise if item_type == 'exercise' else Food
+    if not item_ids:
+        return {}
+    return dict(db.session.query(model.id, model.name).filter(model.id.in_(item_ids)))
+
+def _model_extra(extra_data):
+    """extra_data de uma recomendação gravada por este job (None se de outra origem)"""
+    try:
+        extra = json.loads(extra_data or '{}')
+    except ValueError:
+        return None
+    return extra if isinstance(extra, dict) and extra.get('source') == MODEL_SOURCE else None
+
+def _rejected(user_ids):
+    """Itens que o usuário já rejeitou não voltam a ser recomendados"""
+    rejected = set()
+    rows = db.session.query(Recommendation.user_id, Recommendation.extra_data).filter(
+        Recommendation.user_id.in_(user_ids),
+        Recommendation.status == RecommendationStatus.REJECTED,
+        Recommendation.recommendation_type.in_(ITEM_TYPES.values())
+    )
+    for user_id, extra_data in rows:
+        extra = _model_extra(extra_data)
+        if extra is not None:
+            rejected.add((user_id, extra.get('item_type'), extra.get('item_id')))
+    return rejected
+
+def _previous_ids(user_ids):
+    """
+    Recomendações pendentes gravadas por execuções anteriores deste job; as de
+    outras origens (regras, administradores) não são tocadas na renovação.
+    """
+    rows = db.session.query(Recommendation.id, Recommendation.extra_data).filter(
+        Recommendation.user_id.in_(user_ids),
+        Recommendation.recommendation_type.in_(ITEM_TYPES.values()),
+        Recommendation.status == RecommendationStatus.PENDING
+    )
+    return [recommendation_id for recommendation_id, extra_data in rows if _model_extra(extra_data) is not None]
+
+def _content(item_type, name):
+    if item_type == 'exercise':
+        return f'Pessoas com uma rotina parecida com a sua também fazem {name}.'
+    return f'Pessoas com hábitos alimentares parecidos com os seus também consomem {name}.'
+
+def ensure_indexes():
+    """Cria o índice de leitura das recomendações em bancos criados antes dele"""
+    for index in Recommendation.__table__.indexes:
+        index.create(db.session.connection(), checkfirst=True)
+
+def train_recommendations(components=DEFAULT_COMPONENTS, top_k=DEFAULT_TOP_K, ttl_hours=DEFAULT_TTL_HOURS, log=print):
+    """
+    Treina um SVD truncado sobre a coocorrência usuário x (exercícios | alimentos)
+    e grava as top-k recomendações de cada tipo por usuário como Recommendation
+    pendentes, com ai_confidence_score e expires_at. As pendentes anteriores do
+    modelo são substituídas; aceitas e rejeitadas ficam. Retorna estatísticas.
+    """
+    now = datetime.now(timezone.utc)
+    interactions = _interactions(now - timedelta(days=HISTORY_DAYS))
+    user_index = np.unique([row[0] for rows in interactions.values() for row in rows]).astype(np.int64)
+
+    blocks = {item_type: _block(rows, user_index) for item_type, rows in interactions.items()}
+    matrix = sparse.hstack([blocks[item_type][0] for item_type in ITEM_TYPES], format='csr')
+    stats = {
+        'users': len(user_index),
+        'exercises': len(blocks['exercise'][1]),
+        'foods': len(blocks['food'][1]),
+        'written': 0
+    }
+    components = min(components, min(matrix.shape) - 1)
+    if components < 1:
+        log('Dados insuficientes para treinar o modelo')
+        return stats
+
+    svd = TruncatedSVD(n_components=components, algorithm='randomized', random_state=0)
+    user_factors = svd.fit_transform(matrix).astype(np.float32)
+    item_factors = svd.components_.astype(np.float32)
+    stats['components'] = components
+    stats['explained_variance'] = round(float(svd.explained_variance_ratio_.sum()), 4)
+    log(f'SVD com {components} componentes sobre {matrix.shape[0]} usuários x {matrix.shape[1]} itens '
+        f'(variância explicada {stats["explained_variance"]:.2%})')
+
+    ensure_indexes()
+    model_version = now.strftime('%Y%m%d%H%M%S')
+    expires_at = now + timedelta(hours=ttl_hours)
+    table = Recommendation.__table__
+    chunk_size = max(1, SCORE_CHUNK_CELLS // max(matrix.shape[1], 1))
+
+    offset = 0
+    spans = {}
+    for item_type in ITEM_TYPES:
+        width = len(blocks[item_type][1])
+        spans[item_type] = (offset, offset + width)
+        offset += width
+
+    for start in range(0, len(user_index), chunk_size):
+        stop = min(start + chunk_size, len(user_index))
+        chunk_users = user_index[start:stop].tolist()
+        scores = user_factors[start:stop] @ item_factors
+        seen = matrix[start:stop]
+        rejected = _rejected(chunk_users)
+
+        rows = []
+        for item_type, (first, last) in spans.items():
+            if first == last:
+                continue
+            item_ids = blocks[item_type][1]
+            block_scores = scores[:, first:last]
+            # Confiança relativa ao melhor item do próprio usuário (incluindo os já usados)
+            ceiling = np.maximum(block_scores.max(axis=1, keepdims=True), 1e-6)
+            candidates = block_scores.copy()
+            candidates[seen[:, first:last].toarray() > 0] = -np.inf
+            best = _top_k(candidates, top_k)
+
+            names = _names(item_type, {int(item_ids[column]) for column in np.unique(best)})
+            for row_index, user_id in enumerate(chunk_users):
+                for rank, column in enumerate(best[row_index].tolist()):
+                    score = candidates[row_index, column]
+                    item_id = int(item_ids[column])
+                    if not np.isfinite(score) or score <= 0 or (user_id, item_type, item_id) in rejected:
+                        continue
+                    rows.append({
+                        'user_id': user_id,
+                        'recommendation_type': ITEM_TYPES[item_type],
+                        'title': names.get(item_id, ''),
+                        'content': _content(item_type, names.get(item_id, '')),
+                        'ai_confidence_score': round(float(min(score / ceiling[row_index, 0], 1.0)), 4),
+                        'status': RecommendationStatus.PENDING,
+                        'extra_data': json.dumps({
+                            'source': MODEL_SOURCE,
+                            'item_type': item_type,
+                            'item_id': item_id,
+                            'rank': rank + 1,
+                            'model_version': model_version
+                        }),
+                        'created_at': now,
+                        'expires_at': expires_at
+                    })
+
+        previous = _previous_ids(chunk_users)
+        for first_id in range(0, len(previous), DELETE_CHUNK_SIZE):
+            Recommendation.query.filter(
+                Recommendation.id.in_(previous[first_id:first_id + DELETE_CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(table.insert(), rows)
+        db.session.commit()
+        stats['written'] += len(rows)
+
+    return stats
+
+def stored_recommendations(user_id, recommendation_types=None, limit=10):
+    """Recomendações pré-calculadas ainda válidas, da mais confiável para a menos (consulta indexada)"""
+    query = Recommendation.query.filter(
+        Recommendation.user_id == user_id,
+        Recommendation.status == RecommendationStatus.PENDING,
+        Recommendation.expires_at > datetime.now(timezone.utc)
+    )
+    if recommendation_types:
+        query = query.filter(Recommendation.recommendation_type.in_(recommendation_types))
+    return query.order_by(Recommendation.ai_confidence_score.desc()).limit(limit).all()
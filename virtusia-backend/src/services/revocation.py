@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from src.models.user import db
+from src.models.token import RevokedToken
+from src.services.sql import insert_ignore_conflicts
+
+REFRESH_INTERVAL_SECONDS = float(os.getenv('TOKEN_REVOCATION_REFRESH_SECONDS', 2))
+PRUNE_INTERVAL_SECONDS = 60
+# Ids de transações ainda abertas podem ser confirmados depois de ids maiores:
+# cada atualização relê esta folga abaixo da marca d'água
+HIGH_WATER_LOOKBACK = 100
+
+def _epoch(value):
+    # SQLite devolve datetime sem fuso; gravamos sempre em UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+class RevocationStore:
+    """
+    Espelho em memória, por worker, da tabela de tokens revogados: jti -> expiração.
+    A verificação por requisição é uma consulta ao dicionário. A carga inicial é
+    feita na primeira verificação do processo; depois, uma thread daemon busca a
+    cada REFRESH_INTERVAL_SECONDS só as linhas acima da marca d'água (chave
+    primária), fora das requisições.
+    """
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._revoked = {}
+        self._high_water = None
+        self._next_prune = 0.0
+        self._pid = None  # processo em que o espelho foi carregado
+        self._app = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def init_app(self, app):
+        self._app = app
+
+    def is_revoked(self, jti):
+        if self._pid != os.getpid():
+            self._start()
+        return jti in self._revoked
+
+    def add(self, jti, expires):
+        """Registra localmente uma revogação já gravada (visível neste worker na hora)"""
+        with self._lock:
+            self._revoked[jti] = expires
+
+    def _start(self):
+        # Processo novo (fork do gunicorn): carrega tudo na requisição corrente e
+        # inicia a thread de atualização deste processo
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._revoked = {}
+            self._high_water = None
+            self._load()
+            self._pid = os.getpid()
+        if self._app is not None:
+            threading.Thread(
+                target=self._run, args=(self._app, self._pid), name='token-revocation-refresh', daemon=True
+            ).start()
+
+    def _run(self, app, pid):
+        while self._pid == pid:
+            time.sleep(self.refresh_interval)
+            try:
+                with app.app_context():
+                    self.refresh()
+            except Exception:
+                app.logger.exception('Falha ao atualizar tokens revogados')
+
+    def refresh(self):
+        """Carrega as revogações novas desde a última atualização"""
+        with self._lock:
+            self._load()
+
+    def _load(self):
+        query = db.session.query(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+        if self._high_water is None:
+            high_water = db.session.query(db.func.max(RevokedToken.id)).scalar() or 0
+            query = query.filter(RevokedToken.expires_at > datetime.now(timezone.utc))
+        else:
+            high_water = self._high_water
+            query = query.filter(RevokedToken.id > self._high_water - HIGH_WATER_LOOKBACK)
+        for row_id, jti, expires_at in query:
+            self._revoked[jti] = _epoch(expires_at)
+            high_water = max(high_water, row_id)
+        self._high_water = high_water
+
+        now = time.monotonic()
+        if now >= self._next_prune:
+            current = time.time()
+            self._revoked = {jti: expires for jti, expires in self._revoked.items() if expires > current}
+            self._next_prune = now + PRUNE_INTERVAL_SECONDS
+
+store = RevocationStore()
+
+def init_app(app):
+    """Aplicação usada pela thread de atualização de cada worker"""
+    store.init_app(app)
+
+def is_revoked(jti):
+    return store.is_revoked(jti)
+
+def revoke_tokens(payloads, user_id=None):
+    """
+    Grava a revogação dos tokens (payloads decodificados) na transação corrente,
+    com validade até a expiração de cada um. Depois do commit, chame remember().
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            'jti': payload['jti'],
+            'token_type': payload.get('type', 'access'),
+            'user_id': user_id,
+            'expires_at': datetime.fromtimestamp(payload['exp'], timezone.utc),
+            'revoked_at': now
+        }
+        for payload in payloads
+    ]
+    insert_ignore_conflicts(RevokedToken.__table__, rows, ['jti'])
+
+def remember(payloads):
+    """Torna as revogações já confirmadas visíveis neste worker imediatamente"""
+    for payload in payloads:
+        store.add(payload['jti'], payload['exp'])
+
+def purge_expired_tokens():
+    """Remove revogações de tokens já expirados; retorna quantas"""
+    return RevokedToken.query.filter(
+        RevokedToken.expires_at <= datetime.now(timezone.utc)
+    ).delete(synchronize_session=False)
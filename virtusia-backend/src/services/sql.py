@@ -0,0 +1,114 @@
+import io
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.models.user import db
+
+def dialect_name():
+    """Retorna o nome do dialeto do banco configurado"""
+    return db.session.get_bind().dialect.name
+
+def dialect_insert(table):
+    """Cria um INSERT com suporte a ON CONFLICT para o dialeto atual"""
+    name = dialect_name()
+    if name == 'postgresql':
+        return postgresql.insert(table)
+    if name == 'sqlite':
+        return sqlite.insert(table)
+    return None
+
+def upsert_increment(table, keys, increments, extra=None):
+    """
+    Soma incrementos numa linha identificada por `keys`, criando-a se não existir.
+    Usa INSERT ... ON CONFLICT DO UPDATE para ser atômico sob concorrência.
+    """
+    extra = extra or {}
+    stmt = dialect_insert(table)
+    if stmt is not None:
+        stmt = stmt.values(**keys, **increments, **extra)
+        set_ = {column: table.c[column] + stmt.excluded[column] for column in increments}
+        set_.update({column: stmt.excluded[column] for column in extra})
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c[key] for key in keys], set_=set_)
+        db.session.execute(stmt)
+        return
+
+    # Fallback genérico: UPDATE e, se nenhuma linha existir, INSERT
+    if not update_increment(table, keys, increments, extra):
+        db.session.execute(table.insert().values(**keys, **increments, **extra))
+
+def update_increment(table, keys, increments, extra=None):
+    """Soma incrementos numa linha existente; retorna False se ela não existir"""
+    values = {column: table.c[column] + value for column, value in increments.items()}
+    values.update(extra or {})
+    stmt = table.update().where(*[table.c[key] == value for key, value in keys.items()]).values(**values)
+    return db.session.execute(stmt).rowcount > 0
+
+def insert_ignore_conflicts(table, rows, index_elements):
+    """
+    Insere várias linhas num único INSERT, ignorando as que violam a chave única
+    `index_elements` (ex.: criadas por outra transação concorrente).
+    """
+    if not rows:
+        return
+    stmt = dialect_insert(table)
+    if stmt is not None:
+        stmt = stmt.values(rows).on_conflict_do_nothing(index_elements=[table.c[key] for key in index_elements])
+        db.session.execute(stmt)
+        return
+
+    # Fallback genérico: sem ON CONFLICT, a unicidade fica a cargo do banco
+    db.session.execute(table.insert(), rows)
+
+def _csv_field(value):
+    # No CSV do COPY, campo vazio sem aspas é NULL; textos vão entre aspas para que '' continue ''
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    return str(value)
+
+def copy_rows(table, rows, columns):
+    """
+    Insere linhas (dicionários) com COPY ... FROM STDIN na conexão da sessão, na
+    mesma transação. Só no PostgreSQL com psycopg2; retorna False nos demais, para
+    o chamador cair no executemany.
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql' or connection.dialect.driver != 'psycopg2':
+        return False
+    if not rows:
+        return True
+
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(','.join(_csv_field(row.get(column)) for column in columns))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    with connection.connection.driver_connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+    return True
+
+def transaction_lock(key):
+    """
+    Trava exclusiva identificada por `key` até o fim da transação corrente, para
+    sequências consultar-e-inserir que não podem intercalar entre workers.
+    No PostgreSQL usa pg_advisory_xact_lock; no SQLite não é preciso, porque as
+    transações de escrita já são serializadas (a concorrente falha em vez de intercalar).
+    """
+    if dialect_name() == 'postgresql':
+        db.session.execute(db.select(db.func.pg_advisory_xact_lock(key)))
+
+def date_bucket(column, unit):
+    """
+    Início do período ('day', 'week' ou 'month') de uma coluna de data/hora,
+    calculado no banco. Semanas começam na segunda-feira, como no date_trunc.
+    """
+    if dialect_name() == 'sqlite':
+        if unit == 'week':
+            return db.func.date(column, 'weekday 0', '-6 days')
+        if unit == 'month':
+            return db.func.date(column, 'start of month')
+        return db.func.date(column)
+    return db.func.date_trunc(unit, column)
@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+# A aplicação é criada na importação de src.main: o ambiente precisa vir antes
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['HASH_WORKER_PROCESSES'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ['RATE_LIMIT_FILE'] = os.path.join(tempfile.mkdtemp(), 'rate-limit')
+os.environ['TOKEN_REVOCATION_REFRESH_SECONDS'] = '3600'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from src.main import app as flask_app  # noqa: E402
+from src.models.user import db, User  # noqa: E402
+
+@pytest.fixture
+def app():
+    with flask_app.app_context():
+        yield flask_app
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def user(app):
+    user = User(email=f'{uuid.uuid4().hex}@virtusia.app', first_name='Teste', last_name='Virtusia', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+@pytest.fixture
+def auth_headers(user):
+    return {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+@pytest.fixture
+def count_queries(app):
+    """Conta os comandos SQL executados no bloco: `with count_queries() as statements:`"""
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return counter
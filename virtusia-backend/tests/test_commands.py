@@ -0,0 +1,22 @@
+from src.models.user import db
+from src.models.meal import Meal, MealType
+from src.models.stats import UserDailyStats
+
+def test_upgrade_db_backfills_an_empty_daily_stats_table(app, user):
+    db.session.add(Meal(user_id=user.id, meal_type=MealType.LUNCH, total_calories=450, health_score=8))
+    UserDailyStats.query.delete()
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['upgrade-db'])
+    assert result.exit_code == 0, result.output
+    assert 'linhas diárias reconstruídas' in result.output
+
+    stats = UserDailyStats.query.filter_by(user_id=user.id).one()
+    assert stats.total_calories == 450
+    assert stats.meals_count == 1
+
+    # Idempotente: com o consolidado preenchido, o próximo deploy não reconstrói
+    result = runner.invoke(args=['upgrade-db'])
+    assert result.exit_code == 0, result.output
+    assert 'reconstruídas' not in result.output
@@ -0,0 +1,18 @@
+from src.services.diet_plans import MEAL_TIMING, generate_diet_plan
+
+def test_calorie_fields_use_the_exact_target():
+    plan = generate_diet_plan(2024.6, 'weight_loss')
+    assert plan['daily_calories'] == 2025
+    assert plan['macronutrients'] == {'protein': round(2024.6 * 0.30 / 4), 'carbohydrates': round(2024.6 * 0.35 / 4), 'fat': round(2024.6 * 0.35 / 9)}
+    assert plan['hydration_goal'] == round(2024.6 * 0.035)
+
+def test_meals_are_shared_within_a_bucket_but_plans_are_not():
+    first = generate_diet_plan(2010, 'maintenance', 'vegan')
+    second = generate_diet_plan(2020, 'maintenance', 'vegan')
+    assert first['meals'] == second['meals']
+    assert first['daily_calories'] != second['daily_calories']
+
+    first['meals']['lunch'] = 'alterado'
+    first['meal_timing']['lunch'] = 'alterado'
+    assert generate_diet_plan(2010, 'maintenance', 'vegan')['meals']['lunch'] != 'alterado'
+    assert MEAL_TIMING['lunch'] == '12:00-14:00'
@@ -0,0 +1,14 @@
+from src.models.user import db
+from src.models.meal import Food
+from src.services import food_search
+
+def test_index_is_built_on_the_first_search(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(food_search, 'food_index', food_search.FoodSearchIndex())
+    db.session.add(Food(name='Pão de Queijo Mineiro', calories_per_100g=330, protein_per_100g=5, carbs_per_100g=34, fat_per_100g=18))
+    db.session.commit()
+    assert not food_search.food_index.loaded
+
+    response = client.get('/api/meals/foods/search?q=pao de queijo', headers=auth_headers)
+    assert response.status_code == 200
+    assert [food['name'] for food in response.get_json()['foods']] == ['Pão de Queijo Mineiro']
+    assert food_search.food_index.loaded
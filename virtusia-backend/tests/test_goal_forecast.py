@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+from src.models.user import db
+from src.models.goal import BodyMeasurement, Goal, GoalType
+
+def _today_at(hour, minute=0):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now.replace(hour=hour, minute=minute, second=0, microsecond=0) - timedelta(days=1)
+
+def _weigh_ins(user, readings):
+    db.session.add_all(BodyMeasurement(user_id=user.id, weight=weight, measured_at=at) for at, weight in readings)
+    db.session.add(Goal(user_id=user.id, goal_type=GoalType.WEIGHT_LOSS, title='Perder peso', target_value=70, unit='kg'))
+    db.session.commit()
+
+def _forecast(client, auth_headers):
+    response = client.get('/api/goals/forecast', headers=auth_headers)
+    assert response.status_code == 200
+    return response.get_json()['forecasts'][0]
+
+def test_same_day_readings_do_not_produce_a_forecast(client, user, auth_headers):
+    """Duas pesagens com 5 minutos de diferença não viram -806 kg/semana nem meta atingida"""
+    _weigh_ins(user, [(_today_at(8), 80.0), (_today_at(8, 5), 79.6)])
+
+    forecast = _forecast(client, auth_headers)
+    assert forecast['status'] == 'insufficient_data'
+    assert forecast['on_track'] is None
+    assert 'weekly_rate' not in forecast
+
+    trend = client.get('/api/goals/measurements/trends', headers=auth_headers).get_json()['trends']['weight']
+    assert trend['slope_per_week'] is None
+    assert trend['trend'] == 'decreasing'
+
+def test_three_readings_within_a_day_are_still_insufficient(client, user, auth_headers):
+    _weigh_ins(user, [(_today_at(7), 80.0), (_today_at(12), 79.8), (_today_at(20), 79.5)])
+
+    assert _forecast(client, auth_headers)['status'] == 'insufficient_data'
+
+def test_weekly_readings_forecast_from_the_latest_level(client, user, auth_headers):
+    start = _today_at(8) - timedelta(days=21)
+    _weigh_ins(user, [(start + timedelta(days=7 * week), 80.0 - 0.5 * week) for week in range(4)])
+
+    forecast = _forecast(client, auth_headers)
+    assert forecast['status'] == 'ok'
+    assert forecast['weekly_rate'] == -0.5
+    # Nível atual ancorado nas leituras (EWMA), não na reta estendida até hoje
+    assert 78.5 <= forecast['current_level'] <= 80.0
+    assert forecast['projected_completion_date'] is not None
@@ -0,0 +1,41 @@
+from src.models.user import db
+from src.models.meal import Food, Meal, MealFood, MealType
+
+FOODS_PER_MEAL = 3
+
+def _foods(user):
+    foods = [
+        Food(name=f'Alimento {user.id}-{index}', calories_per_100g=100, protein_per_100g=5,
+             carbs_per_100g=15, fat_per_100g=2)
+        for index in range(FOODS_PER_MEAL)
+    ]
+    db.session.add_all(foods)
+    db.session.commit()
+    return foods
+
+def _add_meals(user, foods, count):
+    for _ in range(count):
+        meal = Meal(user_id=user.id, meal_type=MealType.LUNCH, total_calories=450)
+        db.session.add(meal)
+        db.session.flush()
+        db.session.add_all(MealFood(meal_id=meal.id, food_id=food.id, quantity=100) for food in foods)
+    db.session.commit()
+
+def test_meal_list_query_count_does_not_grow_with_meals(client, user, auth_headers, count_queries):
+    """GET /api/meals/ carrega os alimentos de toda a página de uma vez (sem N+1)"""
+    client.get('/api/meals/?limit=100', headers=auth_headers)  # aquece caches do usuário
+
+    foods = _foods(user)
+    counts = {}
+    total = 0
+    for meals in (1, 5, 20):
+        _add_meals(user, foods, meals - total)
+        total = meals
+        with count_queries() as statements:
+            response = client.get('/api/meals/?limit=100', headers=auth_headers)
+        assert response.status_code == 200
+        assert len(response.get_json()['meals']) == meals
+        assert all(len(meal['foods']) == FOODS_PER_MEAL for meal in response.get_json()['meals'])
+        counts[meals] = len(statements)
+
+    assert counts[1] == counts[5] == counts[20], counts
@@ -0,0 +1,23 @@
+import pytest
+
+@pytest.fixture
+def metrics_token(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'segredo-de-teste')
+    return 'segredo-de-teste'
+
+def test_health_does_not_expose_metrics(client):
+    body = client.get('/api/health').get_json()
+    assert body['status'] == 'healthy'
+    assert 'password_hashing' not in body
+    assert 'diet_plan_cache' not in body
+
+def test_metrics_are_hidden_without_a_configured_token(client):
+    assert client.get('/api/metrics').status_code == 404
+
+def test_metrics_require_the_token(client, metrics_token):
+    assert client.get('/api/metrics').status_code == 401
+    assert client.get('/api/metrics', headers={'X-Metrics-Token': 'outro'}).status_code == 401
+
+    response = client.get('/api/metrics', headers={'X-Metrics-Token': metrics_token})
+    assert response.status_code == 200
+    assert {'password_hashing', 'diet_plan_cache'} <= set(response.get_json())
@@ -0,0 +1,68 @@
+import base64
+from datetime import datetime
+
+import pytest
+
+from src.models.user import db
+from src.models.meal import Meal, MealType
+from src.services import pagination
+
+@pytest.fixture
+def meals(user):
+    """Sete refeições, cinco delas no mesmo instante (empate no timestamp)"""
+    tied = datetime(2026, 5, 1, 12, 0)
+    created = [datetime(2026, 5, 2, 8, 0), datetime(2026, 4, 30, 20, 0)] + [tied] * 5
+    rows = [Meal(user_id=user.id, meal_type=MealType.LUNCH, total_calories=300, created_at=at) for at in created]
+    db.session.add_all(rows)
+    db.session.commit()
+    return sorted(rows, key=lambda meal: (meal.created_at, meal.id), reverse=True)
+
+def _list(client, auth_headers, **params):
+    response = client.get('/api/meals/', query_string=params, headers=auth_headers)
+    return response.status_code, response.get_json()
+
+def test_cursor_round_trip():
+    timestamp = datetime(2026, 5, 1, 12, 0, 30, 123456)
+    assert pagination.decode_cursor(pagination.encode_cursor(timestamp, 42)) == (timestamp, 42)
+
+def test_cursor_walks_ties_on_the_timestamp_without_gaps(client, auth_headers, meals):
+    seen = []
+    cursor = None
+    while True:
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        status, body = _list(client, auth_headers, **params)
+        assert status == 200
+        seen.extend(meal['id'] for meal in body['meals'])
+        cursor = body['next_cursor']
+        if not body['has_more']:
+            break
+    assert seen == [meal.id for meal in meals]
+
+@pytest.mark.parametrize('cursor', [
+    'nao-e-um-cursor',
+    base64.urlsafe_b64encode(b'{"a":1}').decode('ascii'),
+    base64.urlsafe_b64encode(b'["2026-05-01T12:00:00","x"]').decode('ascii'),
+    base64.urlsafe_b64encode(b'[1,2]').decode('ascii'),
+    'ção',
+])
+def test_tampered_cursor_is_rejected(client, auth_headers, cursor):
+    status, body = _list(client, auth_headers, cursor=cursor)
+    assert status == 400
+    assert body['message'] == 'Cursor de paginação inválido'
+
+def test_exact_total(client, auth_headers, meals):
+    status, body = _list(client, auth_headers, limit=2, exact_total=1)
+    assert status == 200
+    assert body['total'] == len(meals)
+    assert body['total_is_estimate'] is False
+
+def test_total_without_explain_is_a_bounded_count(client, auth_headers, meals, monkeypatch):
+    status, body = _list(client, auth_headers, limit=2)
+    assert (body['total'], body['total_is_estimate']) == (len(meals), False)
+
+    monkeypatch.setattr(pagination, 'COUNT_BOUND', 3)
+    status, body = _list(client, auth_headers, limit=2)
+    assert status == 200
+    assert (body['total'], body['total_is_estimate']) == (3, True)
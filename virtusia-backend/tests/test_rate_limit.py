@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from src.services import rate_limit
+
+@pytest.fixture
+def limiter(tmp_path, monkeypatch):
+    limiter = rate_limit.SharedRateLimiter(str(tmp_path / 'rate-limit'), slots=64)
+    monkeypatch.setattr(rate_limit, 'limiter', limiter)
+    return limiter
+
+def _check(app, blueprint, rule, path='/api/auth/login', **kwargs):
+    with app.test_request_context(path, method='POST', **kwargs):
+        return rate_limit._check(blueprint, rule)
+
+def test_rejection_is_429_with_retry_after(app, limiter):
+    rule = {'limits': {'ip': (2, 60)}}
+    client = {'environ_base': {'REMOTE_ADDR': '203.0.113.7'}}
+    assert _check(app, 'auth', rule, **client) is None
+    assert _check(app, 'auth', rule, **client) is None
+
+    response = _check(app, 'auth', rule, **client)
+    assert response.status_code == 429
+    retry_after = int(response.headers['Retry-After'])
+    assert 1 <= retry_after <= 30
+    body = json.loads(response.get_data(as_text=True))
+    assert body == {'message': rate_limit.REJECTION_MESSAGE, 'retry_after': retry_after}
+
+def test_email_key_is_normalized_and_limited_per_address(app, limiter):
+    rule = {'endpoints': ('auth.login',), 'limits': {'email': (1, 60)}}
+    assert _check(app, 'auth', rule, json={'email': 'Ana@Virtusia.app '}) is None
+    assert _check(app, 'auth', rule, json={'email': 'ana@virtusia.app'}).status_code == 429
+    assert _check(app, 'auth', rule, json={'email': 'bia@virtusia.app'}) is None
+    # Sem e-mail no corpo a chave não se aplica; fora de `endpoints` nada é limitado
+    assert _check(app, 'auth', rule, json={}) is None
+    assert _check(app, 'auth', rule, path='/api/auth/refresh', json={'email': 'ana@virtusia.app'}) is None
+
+def test_user_key_comes_from_the_token(app, limiter, user):
+    rule = {'limits': {'user': (1, 60)}}
+    headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+    assert _check(app, 'ai', rule, path='/api/ai/suggest-diet', headers=headers) is None
+    assert _check(app, 'ai', rule, path='/api/ai/suggest-diet', headers=headers).status_code == 429
+    # Requisições anônimas não têm chave de usuário
+    assert _check(app, 'ai', rule, path='/api/ai/suggest-diet') is None
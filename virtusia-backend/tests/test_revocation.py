@@ -0,0 +1,69 @@
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask_jwt_extended import create_access_token, create_refresh_token, decode_token
+
+from src.models.user import db
+from src.models.token import RevokedToken
+from src.services import revocation
+
+def _revoke(expires_in=3600, row_id=None):
+    """Grava uma revogação como outro worker faria; retorna o jti"""
+    jti = uuid.uuid4().hex
+    db.session.add(RevokedToken(
+        id=row_id, jti=jti, token_type='access',
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    ))
+    db.session.commit()
+    return jti
+
+def test_initial_load_skips_expired_revocations(app):
+    active, expired = _revoke(), _revoke(expires_in=-60)
+    store = revocation.RevocationStore()
+
+    assert store.is_revoked(active)
+    assert not store.is_revoked(expired)
+    assert not store.is_revoked(uuid.uuid4().hex)
+
+def test_refresh_loads_rows_above_the_high_water_mark(app):
+    store = revocation.RevocationStore()
+    store.is_revoked('carga-inicial')
+    newer = _revoke()
+    assert not store.is_revoked(newer)  # só aparece na próxima atualização
+
+    store.refresh()
+    assert store.is_revoked(newer)
+
+    # Transação que confirma depois de ids maiores: relida pela folga abaixo da marca
+    late_id = db.session.query(db.func.max(RevokedToken.id)).scalar() - 1
+    while db.session.get(RevokedToken, late_id) is not None:
+        late_id -= 1
+    late = _revoke(row_id=late_id)
+    store.refresh()
+    assert store.is_revoked(late)
+
+def test_refresh_prunes_expired_entries(app, monkeypatch):
+    monkeypatch.setattr(revocation, 'PRUNE_INTERVAL_SECONDS', 0)
+    store = revocation.RevocationStore()
+    store.is_revoked('carga-inicial')
+    store.add('expirado', time.time() - 1)
+    store.add('valido', time.time() + 3600)
+
+    store.refresh()
+    assert not store.is_revoked('expirado')
+    assert store.is_revoked('valido')
+
+def test_revoked_refresh_token_is_rejected(client, user):
+    identity = str(user.id)
+    access_token = create_access_token(identity=identity)
+    refresh_token = create_refresh_token(identity=identity)
+
+    response = client.post('/api/auth/logout', json={'refresh_token': refresh_token},
+                           headers={'Authorization': f'Bearer {access_token}'})
+    assert response.status_code == 200
+    assert RevokedToken.query.filter_by(jti=decode_token(refresh_token)['jti']).one().token_type == 'refresh'
+
+    response = client.post('/api/auth/refresh', headers={'Authorization': f'Bearer {refresh_token}'})
+    assert response.status_code == 401
+    assert response.get_json()['message'] == 'Token revogado'